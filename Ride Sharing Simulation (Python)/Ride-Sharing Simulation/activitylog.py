@@ -0,0 +1,187 @@
+"""Activity logs on disk
+
+A CSVActivitySink writes the activities a monitor is notified of to a CSV
+file, with one column for each field of an activity, a few rows at a time.
+Given to an IncrementalMonitor that does not retain its activities, it keeps
+every activity of a simulation without holding them in memory:
+
+    sink = CSVActivitySink("activities.csv")
+    Simulation(monitor=IncrementalMonitor(retain=False, sink=sink)).run(...)
+    sink.close()
+
+The report of a simulation can then be computed again from its log, e.g.
+
+    python activitylog.py activities.csv
+
+Only an IncrementalMonitor takes a sink: a Monitor computes its report from
+the activities it keeps in memory, so it has to keep every one of them
+whether or not they are also written to disk.
+
+A sink that is copied or pickled, e.g. in a simulation checkpoint, does not
+touch its log. The copy is detached: it keeps the activities it has not
+written yet, but it cannot write to a file until reopen is called with the
+name of a new log, which starts as a copy of the log at the time the sink
+was copied. Simulation.resume does this when it is given a new log.
+"""
+
+import argparse
+import csv
+import json
+import os
+from typing import Dict, List, Optional
+from event import ENCODING
+from location import Location
+from monitor import IncrementalMonitor
+
+# The columns of an activity log.
+COLUMNS = ("time", "category", "description", "id", "row", "column")
+
+
+class CSVActivitySink:
+    """A sink that writes activities to a CSV file.
+
+    Activities are buffered, and written to the file every flush_rows
+    activities, when the sink is flushed, and when it is closed.
+
+    === Attributes ===
+    filename: The name of the CSV file.
+    flush_rows: The number of buffered activities that are written to the
+        file at once.
+    """
+
+    filename: str
+    flush_rows: int
+
+    # === Private Attributes ===
+    _file: Optional[object]
+    #     The open CSV file, or None if this sink is a detached copy.
+    _writer: Optional[object]
+    #     The CSV writer of the file, or None if this sink is a detached
+    #     copy.
+    _rows: List[tuple]
+    #     The activities that have not been written to the file yet.
+    _size: int
+    #     The size of the file when this sink was copied, if it is a
+    #     detached copy.
+
+    def __init__(self, filename: str, flush_rows: int = 4096) -> None:
+        """Initialize a CSVActivitySink that writes to a new file
+        <filename>, replacing any file with that name.
+
+        Precondition: flush_rows > 0
+        """
+        self.filename = filename
+        self.flush_rows = flush_rows
+        self._rows = []
+        self._size = 0
+        self._file = open(filename, "w", encoding=ENCODING, newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+        self._file.flush()
+
+    def __getstate__(self) -> Dict[str, object]:
+        """Return the state of this sink to be pickled or copied, e.g. as
+        part of a simulation checkpoint, without changing the file.
+
+        """
+        if self._file is None:
+            size = self._size
+        else:
+            # Activities are only written by flush, which flushes the file,
+            # so its position is its size.
+            size = self._file.tell()
+        return {"filename": self.filename, "flush_rows": self.flush_rows,
+                "rows": list(self._rows), "size": size}
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        """Restore a detached copy of a sink from its <state>.
+
+        The copy does not open the file of the sink; reopen must be called
+        before it writes any activities.
+        """
+        self.filename = state["filename"]
+        self.flush_rows = state["flush_rows"]
+        self._rows = state["rows"]
+        self._size = state["size"]
+        self._file = None
+        self._writer = None
+
+    def reopen(self, filename: str) -> None:
+        """Write the activities of this detached copy to the new file
+        <filename>, which starts with the activities that were in the file
+        of the sink when it was copied.
+
+        Raise ValueError if this sink is not a detached copy, or if
+        <filename> is the file of the sink that was copied.
+        """
+        if self._file is not None:
+            raise ValueError("only a copy of a sink can be reopened")
+        if os.path.abspath(filename) == os.path.abspath(self.filename):
+            raise ValueError(f"{filename} is the log of the copied sink; "
+                             f"a copy must write to a new log")
+        with open(self.filename, "rb") as source, \
+                open(filename, "wb") as target:
+            remaining = self._size
+            while remaining > 0:
+                data = source.read(min(remaining, 1 << 20))
+                if not data:
+                    raise ValueError(f"{self.filename} is shorter than when "
+                                     f"the sink was copied")
+                target.write(data)
+                remaining -= len(data)
+        self.filename = filename
+        self._file = open(filename, "a", encoding=ENCODING, newline="")
+        self._writer = csv.writer(self._file)
+
+    def write(self, timestamp: int, category: str, description: str,
+              identifier: str, location: Location) -> None:
+        """Write the activity to the file, once enough activities are
+        buffered.
+
+        """
+        self._rows.append((timestamp, category, description, identifier,
+                           location.row, location.column))
+        if len(self._rows) >= self.flush_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered activities to the file.
+
+        Raise ValueError if this sink is a detached copy.
+        """
+        if self._file is None:
+            raise ValueError("this sink is a copy; call reopen with a new "
+                             "log before writing to it")
+        self._writer.writerows(self._rows)
+        self._rows = []
+        self._file.flush()
+
+    def close(self) -> None:
+        """Write the buffered activities and close the file.
+
+        """
+        self.flush()
+        self._file.close()
+
+
+def report_from_file(filename: str) -> Dict[str, float]:
+    """Return the report of the activities in the activity log <filename>,
+    as an IncrementalMonitor notified of them would return it.
+
+    The log is read one row at a time.
+    """
+    monitor = IncrementalMonitor(retain=False)
+    with open(filename, "r", encoding=ENCODING, newline="") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        for timestamp, category, description, identifier, row, column \
+                in reader:
+            monitor.notify(int(timestamp), category, description, identifier,
+                           Location(int(row), int(column)))
+    return monitor.report()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("log", help="the activity log to report on")
+    print(json.dumps(report_from_file(parser.parse_args().log), indent=2))
@@ -0,0 +1,155 @@
+"""Run many scenarios of the simulation in parallel
+
+A scenario is a variation of the same event file, e.g. with fewer drivers or
+with more patient riders. The event file is parsed once and compiled into a
+temporary binary event file (see eventfile), which every process of a pool
+of worker processes memory-maps, so the records are shared through the
+operating system's page cache instead of being copied into each worker.
+Each worker turns the records into new events for its scenario and runs its
+own Simulation, so the scenarios are independent of each other.
+"""
+
+import multiprocessing
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional
+from dispatcher import Dispatcher
+from event import event_from_record, iter_records
+from eventfile import CompiledEvents, compile_events
+from monitor import IncrementalMonitor
+from simulation import Simulation
+from spatial import GridIndex
+
+# The compiled event file opened by a worker process, shared by every
+# scenario it runs.
+_EVENTS = None
+
+
+class Scenario:
+    """A variation of an event file.
+
+    === Attributes ===
+    name: The name of the scenario.
+    drivers: The number of drivers to keep from the event file, in file
+        order, or None to keep them all.
+    patience: The patience of every rider, or None to keep the patience
+        given in the event file.
+    """
+
+    name: str
+    drivers: Optional[int]
+    patience: Optional[int]
+
+    def __init__(self, name: str, drivers: Optional[int] = None,
+                 patience: Optional[int] = None) -> None:
+        """Initialize a Scenario.
+
+        """
+        self.name = name
+        self.drivers = drivers
+        self.patience = patience
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        return f"{self.name}: {self.drivers} drivers, {self.patience} patience"
+
+    def apply(self, records: Iterable[tuple]) -> List[tuple]:
+        """Return the records of this scenario, given the records of the
+        event file.
+
+        >>> records = [(0, "DriverRequest", "a", 1, 1, 2),
+        ...            (0, "DriverRequest", "b", 2, 2, 2),
+        ...            (1, "RiderRequest", "c", 1, 1, 3, 3, 10)]
+        >>> [record[2] for record in Scenario("one driver", 1).apply(records)]
+        ['a', 'c']
+        >>> Scenario("patient", patience=20).apply(records)[2]
+        (1, 'RiderRequest', 'c', 1, 1, 3, 3, 20)
+        """
+        result = []
+        drivers = 0
+        for record in records:
+            if record[1] == "DriverRequest":
+                drivers += 1
+                if self.drivers is not None and drivers > self.drivers:
+                    continue
+            elif self.patience is not None:
+                record = record[:7] + (self.patience,)
+            result.append(record)
+        return result
+
+
+def read_records(filename: str) -> List[tuple]:
+    """Return the records of the events in <filename>, as returned by
+    event.parse_record.
+
+    """
+    return list(iter_records(filename))
+
+
+def run_scenario(records: Iterable[tuple],
+                 scenario: Scenario) -> Dict[str, object]:
+    """Return the row of the results table for running <scenario> on the
+    <records> of an event file.
+
+    """
+    events = [event_from_record(record) for record in scenario.apply(records)]
+    simulation = Simulation(Dispatcher(GridIndex()),
+                            IncrementalMonitor(retain=False))
+    row = {"scenario": scenario.name}
+    row.update(simulation.run(events))
+    return row
+
+
+def run_scenarios(filename: str, scenarios: List[Scenario],
+                  processes: Optional[int] = None) -> List[Dict[str, object]]:
+    """Return a table with one row for each of the <scenarios> run on the
+    events in <filename>, in the same order as <scenarios>.
+
+    Each row has the name of the scenario and the keys of the simulation's
+    report. The scenarios are run by a pool of <processes> processes, or
+    one per CPU if <processes> is None, or one after the other in this
+    process if <processes> is 1.
+
+    Precondition: every coordinate, speed and patience in <filename> fits in
+    a signed 32-bit integer, as eventfile.compile_events requires.
+    """
+    if processes == 1:
+        records = read_records(filename)
+        return [run_scenario(records, scenario) for scenario in scenarios]
+
+    with tempfile.TemporaryDirectory() as directory:
+        compiled = os.path.join(directory, "events.bin")
+        compile_events(filename, compiled)
+        with multiprocessing.Pool(processes, _init_worker,
+                                  (compiled,)) as pool:
+            return pool.map(_run_worker, scenarios, chunksize=1)
+
+
+def _init_worker(compiled: str) -> None:
+    """Open the compiled event file <compiled> for every scenario this
+    worker process runs.
+
+    The file is memory-mapped, so its pages are shared by all the workers,
+    and each record is only unpacked when a scenario reads it.
+    """
+    global _EVENTS
+    _EVENTS = CompiledEvents(compiled)
+
+
+def _run_worker(scenario: Scenario) -> Dict[str, object]:
+    """Return the row of the results table for <scenario>, in a worker
+    process.
+
+    """
+    return run_scenario(_EVENTS.records(), scenario)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={
+            'extra-imports': ['multiprocessing', 'os', 'tempfile', 'typing',
+                              'dispatcher', 'event', 'eventfile', 'monitor',
+                              'simulation', 'spatial']})
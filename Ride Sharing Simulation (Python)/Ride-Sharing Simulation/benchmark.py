@@ -0,0 +1,469 @@
+"""Benchmarks for the simulation
+
+This module generates synthetic event files in the format read by
+event.create_event_list, and times the simulation on them. Run it to time
+the simulation across a range of sizes and write the results as JSON, e.g.
+
+    python benchmark.py --sizes 1000 10000 --output results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+from dispatcher import Dispatcher
+from driver import Driver, TRAVEL_TIMES
+from container import BucketQueue, HeapPriorityQueue
+from event import Event, Pickup, create_event_list, iter_records
+from eventfile import CompiledEvents, compile_events, read_records_parallel
+from location import Location, RoadNetworkOracle, clear_locations, \
+    deserialize_location, get_distance_oracle, set_distance_oracle
+from monitor import Activity, Monitor, PICKUP
+from rider import Rider
+from simulation import Simulation
+from spatial import GridIndex
+
+
+class _DictObject:
+    """An object that keeps its attributes in a __dict__, as the objects of
+    the simulation did before their classes had __slots__.
+
+    """
+
+    def __init__(self, attributes: Dict[str, object]) -> None:
+        """Initialize a _DictObject with <attributes>.
+
+        """
+        self.__dict__.update(attributes)
+
+
+def _dict_equivalent(obj: object) -> _DictObject:
+    """Return a dict-backed copy of the slotted <obj>, whose locations are
+    copied as well, as they were before locations were shared.
+
+    Other slotted objects that <obj> refers to are shared with it.
+    """
+    attributes = {}
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            value = getattr(obj, name)
+            if isinstance(value, Location):
+                value = _DictObject({"row": value.row,
+                                     "column": value.column})
+            attributes[name] = value
+    return _DictObject(attributes)
+
+
+def measure_memory(build: Callable[[], List[object]]) -> int:
+    """Return the number of bytes allocated by <build>, while the objects it
+    returns are still alive.
+
+    """
+    tracemalloc.start()
+    try:
+        objects = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del objects
+    return size
+
+
+def object_memory(count: int, grid_size: int = 50,
+                  seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """Return the average number of bytes used by each Rider, Driver,
+    Activity and Pickup event, over <count> objects of each kind placed on a
+    grid of <grid_size> by <grid_size> intersections.
+
+    The locations are created with deserialize_location, as they are when an
+    event file is read, starting with no locations shared from earlier runs.
+    For each kind, "bytes" is the size of the slotted objects and
+    "baseline_bytes" the size of dict-backed objects with the same
+    attributes, each with its own copy of its locations. "reduction" is the
+    fraction of the baseline that the slotted objects save.
+    """
+    rand = random.Random(seed)
+
+    def location_str() -> str:
+        return f"{rand.randrange(grid_size)},{rand.randrange(grid_size)}"
+
+    def riders() -> List[object]:
+        return [Rider(str(i), 10, deserialize_location(location_str()),
+                      deserialize_location(location_str()))
+                for i in range(count)]
+
+    def drivers() -> List[object]:
+        return [Driver(str(i), deserialize_location(location_str()), 2)
+                for i in range(count)]
+
+    def activities() -> List[object]:
+        return [Activity(i, PICKUP, str(i),
+                         deserialize_location(location_str()))
+                for i in range(count)]
+
+    def pickups() -> List[object]:
+        origin = deserialize_location(location_str())
+        rider = Rider("rider", 10, origin, origin)
+        driver = Driver("driver", origin, 2)
+        return [Pickup(i, rider, driver) for i in range(count)]
+
+    def baseline(build: Callable[[], List[object]]) -> List[object]:
+        objects = [_dict_equivalent(obj) for obj in build()]
+        clear_locations()
+        return objects
+
+    sizes = {}
+    for kind, build in [("rider", riders), ("driver", drivers),
+                        ("activity", activities), ("pickup", pickups)]:
+        clear_locations()
+        size = measure_memory(build) / count
+        rand.seed(seed)
+        clear_locations()
+        baseline_size = measure_memory(lambda: baseline(build)) / count
+        sizes[kind] = {"bytes": size, "baseline_bytes": baseline_size,
+                       "reduction": 1 - size / baseline_size}
+    clear_locations()
+    return sizes
+
+
+def generate_events(filename: str, drivers: int, riders: int,
+                    grid_size: int = 50, speeds: Tuple[int, int] = (1, 4),
+                    patience: Tuple[int, int] = (5, 30),
+                    arrival_rate: float = 1.0, seed: int = 0) -> None:
+    """Write a synthetic event file to <filename>.
+
+    The <drivers> drivers all request a rider at time 0, from locations
+    spread uniformly over a grid of <grid_size> by <grid_size>
+    intersections. The <riders> riders arrive as a Poisson process with
+    <arrival_rate> riders per unit of time, with uniformly random origins and
+    destinations. Speeds and patience are drawn uniformly from the inclusive
+    ranges <speeds> and <patience>. The file is sorted by timestamp.
+    """
+    rand = random.Random(seed)
+
+    def location_str() -> str:
+        return f"{rand.randrange(grid_size)},{rand.randrange(grid_size)}"
+
+    with open(filename, "w") as file:
+        for i in range(drivers):
+            file.write(f"0 DriverRequest driver{i} {location_str()} "
+                       f"{rand.randint(*speeds)}\n")
+
+        now = 0.0
+        for i in range(riders):
+            now += rand.expovariate(arrival_rate)
+            file.write(f"{math.floor(now)} RiderRequest rider{i} "
+                       f"{location_str()} {location_str()} "
+                       f"{rand.randint(*patience)}\n")
+
+
+def generate_road_network(filename: str, grid_size: int = 50,
+                          detour: float = 0.5, seed: int = 0) -> None:
+    """Write an edge list of the roads between neighbouring intersections of
+    a <grid_size> by <grid_size> grid to <filename>, for
+    RoadNetworkOracle.from_edge_list.
+
+    Each road is 1 long, plus up to <detour> times as long again, chosen at
+    random.
+    """
+    rand = random.Random(seed)
+    with open(filename, "w") as file:
+        for row in range(grid_size):
+            for column in range(grid_size):
+                for other_row, other_column in [(row + 1, column),
+                                                (row, column + 1)]:
+                    if other_row < grid_size and other_column < grid_size:
+                        length = 1 + int(rand.random() * detour + 0.5)
+                        file.write(f"{row},{column} {other_row},"
+                                   f"{other_column} {length}\n")
+
+
+def time_distance_oracle(filename: str, roads: str,
+                         cache_size: int = 65536) -> Dict[str, float]:
+    """Return the number of seconds taken to run a Simulation on the events
+    in <filename> with Manhattan distances, and with the distances of the
+    road network in the edge list <roads>, computed as they are needed and
+    looked up in the precomputed tables of its zones.
+
+    The road network runs use a travel time cache of <cache_size>. The
+    distance oracle and the cache are left as they were.
+    """
+    results = {}
+    previous = TRAVEL_TIMES.size
+    previous_oracle = get_distance_oracle()
+    try:
+        set_distance_oracle(None)
+        results["manhattan"] = time_simulation(filename)["run"]
+        TRAVEL_TIMES.resize(cache_size)
+
+        start = time.perf_counter()
+        oracle = RoadNetworkOracle.from_edge_list(roads)
+        results["road_network_load"] = time.perf_counter() - start
+        set_distance_oracle(oracle)
+        results["road_network"] = time_simulation(filename)["run"]
+
+        start = time.perf_counter()
+        oracle.precompute()
+        results["road_network_precompute"] = time.perf_counter() - start
+        set_distance_oracle(oracle)
+        results["road_network_table"] = time_simulation(filename)["run"]
+    finally:
+        set_distance_oracle(previous_oracle)
+        TRAVEL_TIMES.resize(previous)
+    return results
+
+
+def time_simulation(filename: str,
+                    dispatcher: Optional[Dispatcher] = None,
+                    monitor: Optional[Monitor] = None,
+                    queue: str = "heap") -> Dict[str, float]:
+    """Return the number of seconds taken to read <filename>, to run a
+    Simulation on its events with the <queue> kind of event queue, and to
+    generate the report of the run.
+
+    """
+    start = time.perf_counter()
+    events = create_event_list(filename)
+    parsed = time.perf_counter()
+
+    if monitor is None:
+        monitor = Monitor()
+    Simulation(dispatcher, monitor, queue=queue).run(events)
+    simulated = time.perf_counter()
+
+    monitor.report()
+    reported = time.perf_counter()
+    return {"parse": parsed - start,
+            "run": simulated - parsed,
+            "report": reported - simulated}
+
+
+def time_loading(filename: str) -> Dict[str, float]:
+    """Return the number of seconds taken to parse the events in the text
+    event file <filename>, to compile it, and to load the events from the
+    compiled file.
+
+    """
+    start = time.perf_counter()
+    create_event_list(filename)
+    parsed = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as directory:
+        compiled = os.path.join(directory, "events.bin")
+        compiled_start = time.perf_counter()
+        compile_events(filename, compiled)
+        loaded_start = time.perf_counter()
+        with CompiledEvents(compiled) as events:
+            list(events)
+        loaded = time.perf_counter()
+    return {"parse": parsed - start,
+            "compile": loaded_start - compiled_start,
+            "load": loaded - loaded_start}
+
+
+def time_parsing(filename: str,
+                 processes: Optional[int] = None,
+                 chunk_size: int = 1 << 24) -> Dict[str, float]:
+    """Return the number of megabytes of the text event file <filename>
+    parsed into records per second by a single loop, and by
+    eventfile.read_records_parallel with <processes> processes.
+
+    """
+    megabytes = os.path.getsize(filename) / (1 << 20)
+    start = time.perf_counter()
+    for _ in iter_records(filename):
+        pass
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    read_records_parallel(filename, processes, chunk_size)
+    parallel = time.perf_counter() - start
+    return {"sequential": megabytes / sequential,
+            "parallel": megabytes / parallel}
+
+
+def time_travel_time_cache(filename: str,
+                           size: int = 65536) -> Dict[str, float]:
+    """Return the number of seconds taken to run a Simulation on the events
+    in <filename> without the travel time cache, and with a cache of <size>
+    travel times, and the fraction of travel times found in the cache.
+
+    The cache is left as it was.
+    """
+    previous = TRAVEL_TIMES.size
+    results = {}
+    try:
+        for name, cache_size in [("uncached", 0), ("cached", size)]:
+            TRAVEL_TIMES.clear()
+            TRAVEL_TIMES.resize(cache_size)
+            results[name] = time_simulation(filename)["run"]
+        lookups = TRAVEL_TIMES.hits + TRAVEL_TIMES.misses
+        results["hit_rate"] = TRAVEL_TIMES.hits / lookups if lookups else 0.0
+    finally:
+        TRAVEL_TIMES.clear()
+        TRAVEL_TIMES.resize(previous)
+    return results
+
+
+def time_request_driver(drivers: int, requests: int, grid_size: int = 50,
+                        index: Optional[object] = None,
+                        seed: int = 0) -> float:
+    """Return the average number of seconds taken by
+    Dispatcher.request_driver, with <drivers> idle drivers on a grid of
+    <grid_size> by <grid_size> intersections.
+
+    Each assigned driver becomes idle again at the same location, so every
+    request is made with the same number of idle drivers.
+    """
+    rand = random.Random(seed)
+    dispatcher = Dispatcher(index)
+    for i in range(drivers):
+        location_ = Location(rand.randrange(grid_size),
+                             rand.randrange(grid_size))
+        dispatcher.request_rider(Driver(str(i), location_,
+                                        rand.randint(1, 4)))
+
+    origins = [Location(rand.randrange(grid_size), rand.randrange(grid_size))
+               for _ in range(requests)]
+    elapsed = 0.0
+    for i, origin in enumerate(origins):
+        rider = Rider(str(i), 10, origin, origin)
+        start = time.perf_counter()
+        driver = dispatcher.request_driver(rider)
+        elapsed += time.perf_counter() - start
+        dispatcher.request_rider(driver)
+    return elapsed / requests
+
+
+def time_queues(operations: int, size: int = 1000, horizon: int = 30,
+                seed: int = 0) -> Dict[str, float]:
+    """Return the number of seconds that a HeapPriorityQueue and a
+    BucketQueue each take for <operations> hold operations on a queue of
+    <size> events.
+
+    A hold operation removes the next event and adds a new one, scheduled
+    up to <horizon> after the removed event, as the simulation does.
+    """
+    rand = random.Random(seed)
+    delays = [rand.randrange(horizon) for _ in range(size + operations)]
+    results = {}
+    for name, queue_class in [("heap", HeapPriorityQueue),
+                              ("bucket", BucketQueue)]:
+        queue = queue_class()
+        for delay in delays[:size]:
+            queue.add(Event(delay))
+
+        start = time.perf_counter()
+        for delay in delays[size:]:
+            now = queue.remove().timestamp
+            queue.add(Event(now + delay))
+        results[name] = time.perf_counter() - start
+    return results
+
+
+def compare_batching(filename: str, windows: List[int],
+                     method: str = "greedy") -> List[Dict[str, object]]:
+    """Return the run time and the report of a simulation of <filename> that
+    matches each request as it is made, and of one that matches requests in
+    batches, for each batch window in <windows>.
+
+    """
+    results = []
+    for window in [None] + windows:
+        events = create_event_list(filename)
+        start = time.perf_counter()
+        report = Simulation(Dispatcher(batch_window=window,
+                                       batch_method=method)).run(events)
+        results.append({"batch_window": window,
+                        "run": time.perf_counter() - start,
+                        "report": report})
+    return results
+
+
+def run_benchmarks(sizes: List[int], grid_size: int = 50,
+                   seed: int = 0) -> List[Dict[str, object]]:
+    """Return the timings for workloads of each size in <sizes>.
+
+    A workload of size n has n riders and n // 10 drivers.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            drivers = max(1, size // 10)
+            filename = os.path.join(directory, f"events{size}.txt")
+            generate_events(filename, drivers, size, grid_size=grid_size,
+                            seed=seed)
+            result = {"riders": size, "drivers": drivers,
+                      "grid_size": grid_size}
+            result["simulation"] = time_simulation(filename)
+            result["loading"] = time_loading(filename)
+            result["parsing_mb_per_second"] = time_parsing(
+                filename, chunk_size=max(1, os.path.getsize(filename) // 8))
+            result["simulation_bucket_queue"] = time_simulation(
+                filename, queue="bucket")
+            result["queues"] = time_queues(size * 10, size)
+            result["travel_time_cache"] = time_travel_time_cache(filename)
+            roads = os.path.join(directory, "roads.txt")
+            generate_road_network(roads, grid_size, seed=seed)
+            result["distance_oracle"] = time_distance_oracle(filename, roads)
+            result["batching"] = compare_batching(filename, [2, 5])
+            result["request_driver"] = compare_indexes(drivers, grid_size,
+                                                       seed)
+            results.append(result)
+    return results
+
+
+def compare_indexes(drivers: int, grid_size: int = 50,
+                    seed: int = 0) -> Dict[str, float]:
+    """Return the average time taken by Dispatcher.request_driver with
+    <drivers> idle drivers, for the list of idle drivers and for each
+    driver index.
+
+    The ArrayIndex is left out if NumPy is not installed.
+    """
+    timings = {
+        "list": time_request_driver(drivers, 100, grid_size, seed=seed),
+        "grid": time_request_driver(drivers, 100, grid_size, GridIndex(),
+                                    seed)}
+    try:
+        from vectorized import ArrayIndex
+    except ImportError:
+        return timings
+    timings["array"] = time_request_driver(drivers, 100, grid_size,
+                                           ArrayIndex(), seed)
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000])
+    parser.add_argument("--grid-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="the JSON file to write")
+    parser.add_argument("--memory", action="store_true",
+                        help="also measure the memory used by each object")
+    parser.add_argument("--parse", metavar="FILE",
+                        help="also measure the parsing throughput of FILE")
+    parser.add_argument("--processes", type=int,
+                        help="the number of processes that parse FILE")
+    args = parser.parse_args()
+
+    report = {"timings": run_benchmarks(args.sizes, args.grid_size,
+                                        args.seed)}
+    if args.memory:
+        report["bytes_per_object"] = object_memory(100000, args.grid_size)
+    if args.parse is not None:
+        report["parsing_mb_per_second"] = time_parsing(args.parse,
+                                                       args.processes)
+
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
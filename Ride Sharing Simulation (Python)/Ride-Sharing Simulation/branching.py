@@ -0,0 +1,166 @@
+"""Branch many scenarios from one simulation part-way through its run
+
+What-if scenarios often share the events of an event file up to some time,
+and only differ in the events they add after it. run_branches runs the
+shared events once, up to the branch time, and then finishes a copy of the
+simulation for each Branch, with the extra events of that branch.
+
+Each branch runs in its own worker process. Where processes can be forked,
+each worker is forked from the simulation at the branch time, so its state
+(the event queue, the dispatcher and the monitor) is shared with the parent
+process until the branch changes it, rather than copied. Elsewhere, the
+state is pickled once and each worker unpickles its own copy.
+
+If the monitor writes its activities to a sink, such as an
+activitylog.CSVActivitySink, every branch needs its own activity log, which
+starts with the activities logged before the branch time.
+"""
+
+import multiprocessing
+import pickle
+from typing import Dict, List, Optional
+from dispatcher import Dispatcher
+from event import Event, event_from_record
+from monitor import Monitor
+from simulation import Simulation
+
+# The simulation at the branch time, or its pickled state, shared by the
+# worker processes.
+_BRANCH_POINT = None
+
+
+class Branch:
+    """A scenario that adds events to a simulation after the branch time.
+
+    === Attributes ===
+    name: The name of the branch.
+    records: The records of the events added by the branch, as returned by
+        event.parse_record.
+    activity_log: The new log the monitor of the branch writes its
+        activities to, or None if the monitor has no sink.
+    """
+
+    name: str
+    records: List[tuple]
+    activity_log: Optional[str]
+
+    def __init__(self, name: str, records: Optional[List[tuple]] = None,
+                 activity_log: Optional[str] = None) -> None:
+        """Initialize a Branch that adds the events of <records>, or no
+        events if <records> is None, and logs its activities to
+        <activity_log>.
+
+        """
+        self.name = name
+        self.records = [] if records is None else records
+        self.activity_log = activity_log
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        return f"{self.name}: {len(self.records)} events"
+
+
+def run_branches(initial_events: List[Event], branch_time: int,
+                 branches: List[Branch],
+                 dispatcher: Optional[Dispatcher] = None,
+                 monitor: Optional[Monitor] = None,
+                 processes: Optional[int] = None) -> List[Dict[str, object]]:
+    """Return a table with one row for each of the <branches>, in the same
+    order as <branches>.
+
+    A Simulation with <dispatcher> and <monitor> does the <initial_events>
+    before <branch_time>. Each branch then finishes a copy of it, with the
+    rest of the initial events and the events of the branch. Each row has
+    the name of the branch and the keys of the simulation's report. The
+    branches are run by <processes> worker processes, or one per CPU if
+    <processes> is None, or one after the other in this process if
+    <processes> is 1.
+
+    Precondition: the events of every branch are at or after <branch_time>.
+    """
+    simulation = Simulation(dispatcher, monitor)
+    simulation.run_until(initial_events, branch_time)
+    return fork_branches(simulation, branches, processes)
+
+
+def fork_branches(simulation: Simulation, branches: List[Branch],
+                  processes: Optional[int] = None
+                  ) -> List[Dict[str, object]]:
+    """Return a table with one row for each of the <branches>, each finishing
+    a copy of <simulation> with the events of the branch, as run_branches
+    does.
+
+    <simulation> itself is not changed, and neither is its activity log.
+
+    Raise ValueError if the monitor of <simulation> writes its activities to
+    a sink and any of the <branches> has no activity_log.
+    """
+    global _BRANCH_POINT
+    if simulation.logs_activities():
+        missing = [branch.name for branch in branches
+                   if branch.activity_log is None]
+        if missing:
+            raise ValueError(f"the monitor logs its activities, so every "
+                             f"branch needs its own activity_log; "
+                             f"{', '.join(missing)} has none")
+    if processes == 1:
+        state = pickle.dumps(simulation, pickle.HIGHEST_PROTOCOL)
+        return [_run_branch(pickle.loads(state), branch)
+                for branch in branches]
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Each worker runs one branch and exits, so that every branch starts
+        # from a fresh fork of the simulation at the branch time.
+        _BRANCH_POINT = simulation
+        try:
+            with multiprocessing.get_context("fork").Pool(
+                    processes, maxtasksperchild=1) as pool:
+                return pool.map(_run_worker, branches, chunksize=1)
+        finally:
+            _BRANCH_POINT = None
+
+    state = pickle.dumps(simulation, pickle.HIGHEST_PROTOCOL)
+    with multiprocessing.Pool(processes, _init_worker, (state,)) as pool:
+        return pool.map(_run_worker, branches, chunksize=1)
+
+
+def _run_branch(simulation: Simulation, branch: Branch) -> Dict[str, object]:
+    """Return the row of the results table for finishing <simulation> with
+    the events of <branch>.
+
+    """
+    if branch.activity_log is not None:
+        simulation.reopen_activity_log(branch.activity_log)
+    row = {"branch": branch.name}
+    row.update(simulation.run([event_from_record(record)
+                               for record in branch.records]))
+    return row
+
+
+def _init_worker(state: bytes) -> None:
+    """Keep the pickled <state> of the simulation at the branch time for
+    every branch this worker process runs.
+
+    """
+    global _BRANCH_POINT
+    _BRANCH_POINT = state
+
+
+def _run_worker(branch: Branch) -> Dict[str, object]:
+    """Return the row of the results table for <branch>, in a worker
+    process.
+
+    """
+    if isinstance(_BRANCH_POINT, bytes):
+        return _run_branch(pickle.loads(_BRANCH_POINT), branch)
+    return _run_branch(_BRANCH_POINT, branch)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['multiprocessing', 'pickle', 'typing',
+                                  'dispatcher', 'event', 'monitor',
+                                  'simulation']})
@@ -0,0 +1,195 @@
+"""A columnar Monitor backend
+
+The ColumnarMonitor records each activity as one row of six compact columns
+instead of as an Activity object, and computes its report with NumPy, so it
+can hold and report on millions of activities quickly. It requires NumPy,
+unlike the rest of the simulation. When a distance oracle is set, the
+distances are measured one at a time by the oracle instead.
+"""
+
+from array import array
+from typing import Dict, Tuple
+import numpy as np
+from location import Location, distance, get_distance_oracle
+from monitor import Monitor, RIDER, DRIVER, REQUEST, CANCEL, PICKUP, DROPOFF
+
+# The codes stored in the category and description columns.
+CATEGORY_CODES = {RIDER: 0, DRIVER: 1}
+DESCRIPTION_CODES = {REQUEST: 0, CANCEL: 1, PICKUP: 2, DROPOFF: 3}
+
+
+class ColumnarMonitor(Monitor):
+    """A monitor that keeps its record of activities in columns.
+
+    Its report is the same as that of a Monitor notified of the same
+    activities, except that the average wait time is 0.0 rather than an
+    error when no rider has finished waiting.
+    """
+
+    # === Private Attributes ===
+    _time: array
+    #     The time of each activity.
+    _category: array
+    #     The category code of each activity.
+    _description: array
+    #     The description code of each activity.
+    _actor: array
+    #     The index of the rider or driver who did each activity.
+    _row: array
+    #     The row of the location of each activity.
+    _column: array
+    #     The column of the location of each activity.
+    _actors: Dict[str, Dict[str, int]]
+    #     A dictionary whose key is a category, and value is another
+    #     dictionary. The key of the second dictionary is an identifier
+    #     and its value is the index used for that identifier in _actor.
+
+    def __init__(self) -> None:
+        """Initialize a ColumnarMonitor.
+
+        """
+        # Monitor.__init__ is not called: the activities are kept in the
+        # columns, so there is no _activities, and every method of Monitor
+        # that uses it is overridden.
+        self._time = array('q')
+        self._category = array('b')
+        self._description = array('b')
+        self._actor = array('q')
+        self._row = array('q')
+        self._column = array('q')
+        self._actors = {RIDER: {}, DRIVER: {}}
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        return "ColumnarMonitor ({} drivers, {} riders)".format(
+            len(self._actors[DRIVER]), len(self._actors[RIDER]))
+
+    def __len__(self) -> int:
+        """Return the number of activities recorded by this monitor.
+
+        """
+        return len(self._time)
+
+    def notify(self, timestamp: int, category: str, description: str,
+               identifier: str, location: Location) -> None:
+        """Notify the monitor of the activity.
+
+        timestamp: The time of the activity.
+        category: The category (DRIVER or RIDER) for the activity.
+        description: A description (REQUEST | CANCEL | PICKUP | DROP_OFF)
+            of the activity.
+        identifier: The identifier for the actor.
+        location: The location of the activity.
+        """
+        actors = self._actors[category]
+        actor = actors.get(identifier)
+        if actor is None:
+            actor = len(actors)
+            actors[identifier] = actor
+
+        self._time.append(timestamp)
+        self._category.append(CATEGORY_CODES[category])
+        self._description.append(DESCRIPTION_CODES[description])
+        self._actor.append(actor)
+        self._row.append(location.row)
+        self._column.append(location.column)
+
+    def report(self) -> Dict[str, float]:
+        """Return a report of the activities that have occurred.
+
+        """
+        category = np.frombuffer(self._category, dtype=np.int8)
+        time = np.frombuffer(self._time, dtype=np.int64)
+        actor = np.frombuffer(self._actor, dtype=np.int64)
+        row = np.frombuffer(self._row, dtype=np.int64)
+        column = np.frombuffer(self._column, dtype=np.int64)
+        description = np.frombuffer(self._description, dtype=np.int8)
+
+        riders = category == CATEGORY_CODES[RIDER]
+        drivers = ~riders
+        wait_time = _average_wait_time(actor[riders], time[riders])
+        total, ride = _average_distances(
+            actor[drivers], row[drivers], column[drivers],
+            description[drivers])
+
+        return {"rider_wait_time": wait_time,
+                "driver_total_distance": total,
+                "driver_ride_distance": ride}
+
+
+def _group(actor: np.ndarray) -> np.ndarray:
+    """Return the order that sorts <actor> while keeping the activities of
+    each actor in the order they occurred.
+
+    """
+    return np.argsort(actor, kind='stable')
+
+
+def _average_wait_time(actor: np.ndarray, time: np.ndarray) -> float:
+    """Return the average wait time of the riders that have either been
+    picked up or have cancelled their ride, given the actor and time columns
+    of all rider activities.
+
+    """
+    order = _group(actor)
+    actor = actor[order]
+    time = time[order]
+
+    # The first activity of each rider is REQUEST, and the second (if there
+    # is one) is PICKUP or CANCEL.
+    first = np.flatnonzero(np.r_[True, actor[1:] != actor[:-1]])
+    first = first[first + 1 < len(actor)]
+    first = first[actor[first + 1] == actor[first]]
+
+    if len(first) == 0:
+        return 0.0
+    return int((time[first + 1] - time[first]).sum()) / len(first)
+
+
+def _average_distances(actor: np.ndarray, row: np.ndarray,
+                       column: np.ndarray,
+                       description: np.ndarray) -> Tuple[float, float]:
+    """Return the average total distance and the average ride distance
+    driven by the drivers, given the columns of all driver activities.
+
+    """
+    if len(actor) == 0:
+        return 0.0, 0.0
+
+    order = _group(actor)
+    actor = actor[order]
+    row = row[order]
+    column = column[order]
+    description = description[order]
+
+    first = np.flatnonzero(np.r_[True, actor[1:] != actor[:-1]])
+    sizes = np.diff(np.r_[first, len(actor)])
+
+    # The distance between each activity and the next one by the same driver.
+    same_driver = actor[1:] == actor[:-1]
+    if get_distance_oracle() is None:
+        step = np.abs(np.diff(row)) + np.abs(np.diff(column))
+    else:
+        step = np.zeros(len(same_driver), dtype=np.int64)
+        for i in np.flatnonzero(same_driver):
+            step[i] = distance(Location(int(row[i]), int(column[i])),
+                               Location(int(row[i + 1]), int(column[i + 1])))
+    total = int(step[same_driver].sum())
+
+    # As in Monitor, drivers with two or fewer activities have no rides.
+    has_rides = np.repeat(sizes > 2, sizes)[:-1]
+    on_ride = description[:-1] == DESCRIPTION_CODES[PICKUP]
+    ride = int(step[same_driver & on_ride & has_rides].sum())
+
+    return total / len(first), ride / len(first)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={
+            'max-args': 6,
+            'extra-imports': ['array', 'typing', 'numpy', 'location',
+                              'monitor']})
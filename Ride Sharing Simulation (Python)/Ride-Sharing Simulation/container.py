@@ -1,5 +1,9 @@
 """Containers of objects"""
 
+import heapq
+from collections import deque
+from typing import Callable
+
 
 class Container:
     """A container that holds objects.
@@ -25,6 +29,13 @@ class Container:
         """
         raise NotImplementedError("Implemented in a subclass")
 
+    def compact(self, keep: Callable[[object], bool]) -> int:
+        """Remove every item for which <keep> returns False, keeping the
+        order of the other items, and return the number of items removed.
+
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
 
 def helper(item_lst: list, item: object, item_num: int) -> bool:
     """
@@ -85,6 +96,16 @@ class PriorityQueue(Container):
         """
         self._items = []
 
+    def __len__(self) -> int:
+        """Return the number of items in this PriorityQueue.
+
+        >>> pq = PriorityQueue()
+        >>> pq.add("red")
+        >>> len(pq)
+        1
+        """
+        return len(self._items)
+
     def remove(self) -> object:
         """Remove and return the next item from this PriorityQueue.
 
@@ -106,6 +127,19 @@ class PriorityQueue(Container):
         """
         return self._items.pop(0)
 
+    def peek(self) -> object:
+        """Return the next item from this PriorityQueue without removing it.
+
+        Precondition: <self> should not be empty.
+
+        >>> pq = PriorityQueue()
+        >>> pq.add("red")
+        >>> pq.add("blue")
+        >>> pq.peek()
+        'blue'
+        """
+        return self._items[0]
+
     def is_empty(self) -> bool:
         """
         Return true iff this PriorityQueue is empty.
@@ -119,6 +153,22 @@ class PriorityQueue(Container):
         """
         return len(self._items) == 0
 
+    def compact(self, keep: Callable[[object], bool]) -> int:
+        """Remove every item for which <keep> returns False, and return the
+        number of items removed.
+
+        >>> pq = PriorityQueue()
+        >>> for word in ["red", "blue", "yellow", "green"]:
+        ...     pq.add(word)
+        >>> pq.compact(lambda word: "e" in word and len(word) > 3)
+        1
+        >>> pq._items
+        ['blue', 'green', 'yellow']
+        """
+        size = len(self._items)
+        self._items = [item for item in self._items if keep(item)]
+        return size - len(self._items)
+
     def add(self, item: object) -> None:
         """Add <item> to this PriorityQueue.
 
@@ -139,6 +189,235 @@ class PriorityQueue(Container):
                 helper1(self._items, item)
 
 
+class HeapPriorityQueue(Container):
+    """A queue of items that operates in priority order, backed by a binary
+    heap.
+
+    Items are removed in the same order as a PriorityQueue: the item with the
+    highest priority is removed first, and ties are resolved in FIFO order.
+    Unlike PriorityQueue, both add and remove take O(log n) time.
+
+    Priority is defined by the rich comparison methods for the objects in the
+    container (__lt__, __le__, __gt__, __ge__).
+
+    If x < y, then x has a *HIGHER* priority than y.
+
+    All objects in the container must be of the same type.
+    """
+
+    # === Private Attributes ===
+    _heap: list
+    #     The heap of (item, sequence) entries in the priority queue.
+    _counter: int
+    #     The sequence number given to the next item added to the queue.
+    #
+    # === Representation Invariants ===
+    # _heap satisfies the heap invariant. Entries compare by item and then by
+    # sequence number, so the first entry holds the item with the highest
+    # priority that was inserted earliest.
+
+    def __init__(self) -> None:
+        """Initialize an empty HeapPriorityQueue.
+
+        """
+        self._heap = []
+        self._counter = 0
+
+    def __len__(self) -> int:
+        """Return the number of items in this HeapPriorityQueue.
+
+        >>> pq = HeapPriorityQueue()
+        >>> pq.add("red")
+        >>> len(pq)
+        1
+        """
+        return len(self._heap)
+
+    def remove(self) -> object:
+        """Remove and return the next item from this HeapPriorityQueue.
+
+        Precondition: <self> should not be empty.
+
+        >>> pq = HeapPriorityQueue()
+        >>> pq.add("red")
+        >>> pq.add("blue")
+        >>> pq.add("yellow")
+        >>> pq.add("green")
+        >>> pq.remove()
+        'blue'
+        >>> pq.remove()
+        'green'
+        >>> pq.remove()
+        'red'
+        >>> pq.remove()
+        'yellow'
+        """
+        return heapq.heappop(self._heap)[0]
+
+    def peek(self) -> object:
+        """Return the next item from this HeapPriorityQueue without removing
+        it.
+
+        Precondition: <self> should not be empty.
+
+        >>> pq = HeapPriorityQueue()
+        >>> pq.add("red")
+        >>> pq.add("blue")
+        >>> pq.peek()
+        'blue'
+        """
+        return self._heap[0][0]
+
+    def is_empty(self) -> bool:
+        """
+        Return true iff this HeapPriorityQueue is empty.
+
+        >>> pq = HeapPriorityQueue()
+        >>> pq.is_empty()
+        True
+        >>> pq.add("thing")
+        >>> pq.is_empty()
+        False
+        """
+        return len(self._heap) == 0
+
+    def compact(self, keep: Callable[[object], bool]) -> int:
+        """Remove every item for which <keep> returns False, and return the
+        number of items removed.
+
+        The heap is rebuilt in O(n) time. The other items keep their
+        sequence numbers, so ties are still resolved in FIFO order.
+
+        >>> pq = HeapPriorityQueue()
+        >>> for word in ["red", "blue", "yellow", "green"]:
+        ...     pq.add(word)
+        >>> pq.compact(lambda word: word != "blue")
+        1
+        >>> pq.remove()
+        'green'
+        """
+        size = len(self._heap)
+        self._heap = [entry for entry in self._heap if keep(entry[0])]
+        heapq.heapify(self._heap)
+        return size - len(self._heap)
+
+    def add(self, item: object) -> None:
+        """Add <item> to this HeapPriorityQueue.
+
+        >>> pq = HeapPriorityQueue()
+        >>> pq.add("yellow")
+        >>> pq.add("blue")
+        >>> pq.remove()
+        'blue'
+        """
+        heapq.heappush(self._heap, (item, self._counter))
+        self._counter += 1
+
+
+class BucketQueue(Container):
+    """A queue of items with integer timestamps that operates in timestamp
+    order.
+
+    Items are removed in order of their <timestamp> attribute, oldest first.
+    Ties are resolved in FIFO order, as in a PriorityQueue of Events.
+
+    Each timestamp has a bucket holding its items in insertion order, so
+    adding an item to an existing bucket, and removing an item that leaves
+    its bucket non-empty, both take constant time. Only the first item added
+    with a new timestamp and the last item removed with it pay the O(log k)
+    cost of pushing or popping it among the k timestamps in the queue.
+
+    All objects in the container must have an int <timestamp> attribute,
+    which must not change while they are in the container.
+    """
+
+    # === Private Attributes ===
+    _buckets: dict
+    #     The items stored in the queue, in insertion order, keyed by their
+    #     timestamp.
+    _times: list
+    #     A heap of the timestamps of the non-empty buckets.
+    _size: int
+    #     The number of items in the queue.
+    #
+    # === Representation Invariants ===
+    # Every bucket in _buckets is non-empty, and _times holds exactly the
+    # keys of _buckets.
+
+    def __init__(self) -> None:
+        """Initialize an empty BucketQueue.
+
+        """
+        self._buckets = {}
+        self._times = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Return the number of items in this BucketQueue.
+
+        """
+        return self._size
+
+    def remove(self) -> object:
+        """Remove and return the item with the oldest timestamp from this
+        BucketQueue.
+
+        Precondition: <self> should not be empty.
+        """
+        timestamp = self._times[0]
+        bucket = self._buckets[timestamp]
+        item = bucket.popleft()
+        if not bucket:
+            del self._buckets[timestamp]
+            heapq.heappop(self._times)
+        self._size -= 1
+        return item
+
+    def peek(self) -> object:
+        """Return the next item from this BucketQueue without removing it.
+
+        Precondition: <self> should not be empty.
+        """
+        return self._buckets[self._times[0]][0]
+
+    def is_empty(self) -> bool:
+        """Return true iff this BucketQueue is empty.
+
+        """
+        return self._size == 0
+
+    def compact(self, keep: Callable[[object], bool]) -> int:
+        """Remove every item for which <keep> returns False, and return the
+        number of items removed.
+
+        """
+        size = self._size
+        for timestamp in list(self._buckets):
+            bucket = deque(item for item in self._buckets[timestamp]
+                           if keep(item))
+            if bucket:
+                self._buckets[timestamp] = bucket
+            else:
+                del self._buckets[timestamp]
+        self._times = list(self._buckets)
+        heapq.heapify(self._times)
+        self._size = sum(len(bucket) for bucket in self._buckets.values())
+        return size - self._size
+
+    def add(self, item: object) -> None:
+        """Add <item> to this BucketQueue.
+
+        """
+        timestamp = item.timestamp
+        bucket = self._buckets.get(timestamp)
+        if bucket is None:
+            bucket = deque()
+            self._buckets[timestamp] = bucket
+            heapq.heappush(self._times, timestamp)
+        bucket.append(item)
+        self._size += 1
+
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all()
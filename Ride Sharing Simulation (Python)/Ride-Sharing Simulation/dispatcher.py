@@ -2,9 +2,12 @@
 
 """Dispatcher for the simulation"""
 
-from typing import Optional
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
 from driver import Driver
+from matching import METHODS, greedy_assignment, optimal_assignment
 from rider import Rider
+from spatial import DriverIndex
 
 
 class Dispatcher:
@@ -21,22 +24,86 @@ class Dispatcher:
     the dispatcher does nothing. Once a driver requests a rider, the driver
     is registered with the dispatcher, and will be used to fulfill future
     rider requests.
+
+    If the dispatcher is given an index, such as a spatial.GridIndex or a
+    vectorized.ArrayIndex, the drivers waiting for a rider are kept in the
+    index instead of _driver_lst, so that the fastest driver for a rider is
+    found without computing the travel time of every waiting driver in
+    Python. The same driver is chosen either way.
+
+    If the dispatcher is given a batch window, it does not assign drivers
+    when requests are made. Instead, riders and drivers wait until the end
+    of the current window, when all of them are assigned at once by
+    match_batch, using the travel time of every driver to every rider.
     """
     # === Private Attributes ===
-    #     _rider_list: A list of riders waiting for a ride
+    #     _rider_list: The riders waiting for a ride, keyed by id(rider),
+    #         in the order they started waiting. Riders are told apart by
+    #         identity rather than by rider id, so two requests with the
+    #         same rider id can wait at once, as they could in a list
+    #     _rider_queue: The riders waiting for a ride in FIFO order. Riders
+    #         who cancelled are left in the queue, and skipped when they
+    #         reach the front.
     #     _driver_list: A list of drivers waiting for a rider
-    #     _registered_driver: A list of registered driver in this dispatcher
-    _rider_lst: list
+    #     _registered_driver: The ids of the drivers registered in this
+    #         dispatcher
+    #     _index: The spatial index of drivers waiting for a rider, or None
+    #         if the waiting drivers are kept in _driver_lst
+    #     _batch_window: The length of the time windows in which requests
+    #         are matched together, or None to match each request as it is
+    #         made
+    #     _batch_method: The name of the assignment method used to match a
+    #         batch, from matching.METHODS
+    #     _batch_scheduled: True iff a batch has been scheduled and not
+    #         matched yet
+    _rider_lst: Dict[int, Rider]
+    _rider_queue: Deque[Rider]
     _driver_lst: list
-    _registered_driver: list
+    _registered_driver: Set[str]
+    _index: Optional[DriverIndex]
+    _batch_window: Optional[int]
+    _batch_method: str
+    _batch_scheduled: bool
 
-    def __init__(self) -> None:
+    def __init__(self, index: Optional[DriverIndex] = None,
+                 batch_window: Optional[int] = None,
+                 batch_method: str = "greedy") -> None:
         """Initialize a Dispatcher.
 
+        index: An empty index for the waiting drivers, or None to keep them
+            in a list.
+        batch_window: The length of the time windows in which requests are
+            matched together, or None to match each request as it is made.
+        batch_method: "greedy" to match the closest rider and driver first,
+            or "optimal" to minimize the total travel time of each batch.
         """
-        self._rider_lst = []
+        if batch_window is not None:
+            if index is not None:
+                raise ValueError("a batch dispatcher cannot use an index")
+            if batch_window <= 0:
+                raise ValueError("the batch window must be positive")
+        if batch_method not in METHODS:
+            raise ValueError(f"unknown batch method {batch_method!r}, "
+                             f"expected one of {list(METHODS)}")
+        self._rider_lst = {}
+        self._rider_queue = deque()
         self._driver_lst = []
-        self._registered_driver = []
+        self._registered_driver = set()
+        self._index = index
+        self._batch_window = batch_window
+        self._batch_method = batch_method
+        self._batch_scheduled = False
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        """Restore a copy of a dispatcher from its <state>, e.g. from a
+        simulation checkpoint.
+
+        The waiting riders are keyed by id(rider), which differs for the
+        copies of the riders, so they are keyed again.
+        """
+        self.__dict__.update(state)
+        self._rider_lst = {id(rider): rider
+                           for rider in self._rider_lst.values()}
 
     def __str__(self) -> str:
         """Return a string representation.
@@ -44,8 +111,12 @@ class Dispatcher:
         """
         rider_list = []
         driver_list = []
-        for rider in range(len(self._rider_lst)):
-            rider_list.append(self._rider_lst[rider].id)
+        for rider in self._rider_lst.values():
+            rider_list.append(rider.id)
+
+        if self._index is not None:
+            for driver in self._index.drivers():
+                driver_list.append(driver.id)
 
         for driver in range(len(self._driver_lst)):
             driver_list.append(self._driver_lst[driver].id)
@@ -56,9 +127,20 @@ class Dispatcher:
         """Return a driver for the rider, or None if no driver is available.
 
         Add the rider to the waiting list if there is no available driver.
+        In batch mode, always add the rider to the waiting list.
         """
+        if self._batch_window is not None:
+            self._add_rider(rider)
+            return None
+
+        if self._index is not None:
+            found_driver = self._index.pop_nearest(rider.origin)
+            if found_driver is None:
+                self._add_rider(rider)
+            return found_driver
+
         if not self._driver_lst:
-            self._rider_lst.append(rider)
+            self._add_rider(rider)
             return None
         else:
             time_dict = {}
@@ -80,27 +162,103 @@ class Dispatcher:
         """Return a rider for the driver, or None if no rider is available.
 
         If this is a new driver, register the driver for future rider requests.
+        In batch mode, always add the driver to the list of waiting drivers.
 
         """
-        if not self._rider_lst:
-            self._driver_lst.append(driver)
+        if not self._rider_lst or self._batch_window is not None:
+            if self._index is not None:
+                self._index.add(driver)
+            else:
+                self._driver_lst.append(driver)
         else:
-            return self._rider_lst.pop(0)
+            return self._pop_rider()
 
-        if driver not in self._registered_driver:
-            self._registered_driver.append(driver)
+        self._registered_driver.add(driver.id)
 
         return None
 
     def cancel_ride(self, rider: Rider) -> None:
         """Cancel the ride for rider.
 
+        The rider stays in _rider_queue until it reaches the front of the
+        queue, or until the queue is mostly made up of cancelled riders.
         """
-        if rider in self._rider_lst:
-            self._rider_lst.remove(rider)
+        if self._rider_lst.get(id(rider)) is rider:
+            del self._rider_lst[id(rider)]
+            if len(self._rider_queue) > 2 * len(self._rider_lst) + 32:
+                self._rider_queue = deque(self._rider_lst.values())
         rider.cancel()
 
+    def schedule_batch(self, timestamp: int) -> Optional[int]:
+        """Return the time at which the requests made at <timestamp> will be
+        matched, if a batch needs to be scheduled for them, or None if no
+        batch needs to be scheduled.
+
+        A batch needs to be scheduled in batch mode, when no batch is
+        scheduled yet. Batches are matched at the end of each window.
+
+        >>> dispatcher = Dispatcher(batch_window=5)
+        >>> dispatcher.schedule_batch(7)
+        10
+        >>> dispatcher.schedule_batch(8) is None
+        True
+        """
+        if self._batch_window is None or self._batch_scheduled:
+            return None
+        self._batch_scheduled = True
+        return (timestamp // self._batch_window + 1) * self._batch_window
+
+    def match_batch(self) -> List[Tuple[Rider, Driver]]:
+        """Return the pairs of waiting riders and waiting drivers assigned to
+        each other, and remove them from the waiting lists.
+
+        The riders and drivers that are not assigned keep waiting.
+        """
+        self._batch_scheduled = False
+        riders = list(self._rider_lst.values())
+        drivers = self._driver_lst
+        if not riders or not drivers:
+            return []
+
+        cost = [[driver.get_travel_time(rider.origin) for driver in drivers]
+                for rider in riders]
+        if self._batch_method == "greedy":
+            assignment = greedy_assignment(cost)
+        else:
+            assignment = optimal_assignment(cost)
+
+        pairs = []
+        matched = set()
+        for rider, driver in assignment:
+            pairs.append((riders[rider], drivers[driver]))
+            del self._rider_lst[id(riders[rider])]
+            matched.add(driver)
+        self._rider_queue = deque(self._rider_lst.values())
+        self._driver_lst = [driver for i, driver in enumerate(drivers)
+                            if i not in matched]
+        return pairs
+
+    def _add_rider(self, rider: Rider) -> None:
+        """Add <rider> to the end of the waiting list.
+
+        """
+        self._rider_lst[id(rider)] = rider
+        self._rider_queue.append(rider)
+
+    def _pop_rider(self) -> Rider:
+        """Remove and return the rider who has been waiting the longest.
+
+        Precondition: self._rider_lst is not empty.
+        """
+        rider = self._rider_queue.popleft()
+        while self._rider_lst.get(id(rider)) is not rider:
+            rider = self._rider_queue.popleft()
+        del self._rider_lst[id(rider)]
+        return rider
+
 
 if __name__ == '__main__':
     import python_ta
-    python_ta.check_all(config={'extra-imports': ['typing', 'driver', 'rider']})
+    python_ta.check_all(
+        config={'extra-imports': ['collections', 'typing', 'driver',
+                                  'matching', 'rider', 'spatial']})
@@ -1,10 +1,117 @@
-"""Drivers for the simulation"""
+"""Drivers for the simulation
 
+The travel times of drivers are looked up in TRAVEL_TIMES, a cache shared
+by every driver. It is disabled unless it is given a size, e.g.
+
+    TRAVEL_TIMES.resize(65536)
+
+Distances are measured by location.distance, so the cache is worth enabling
+when a distance oracle such as a location.RoadNetworkOracle is set. The
+cache is cleared whenever the distance oracle changes. While it is disabled,
+drivers compute their travel times directly, without calling the cache.
+"""
+
+from collections import OrderedDict
 from typing import Optional
-from location import Location, manhattan_distance
+from location import Location, add_oracle_listener, distance
 from rider import Rider
 
 
+class TravelTimeCache:
+    """A bounded cache of travel times, keyed by the origin, destination and
+    speed, which forgets the least recently used travel time when it is
+    full.
+
+    === Attributes ===
+    size: The largest number of travel times kept, or 0 if the cache is
+        disabled.
+    hits: The number of travel times found in the cache.
+    misses: The number of travel times computed because they were not in
+        the cache.
+    """
+
+    size: int
+    hits: int
+    misses: int
+
+    # === Private Attributes ===
+    _times: OrderedDict
+    #     The cached travel times, keyed by the row and column of the origin,
+    #     the row and column of the destination, and the speed, from the
+    #     least to the most recently used.
+
+    def __init__(self, size: int = 0) -> None:
+        """Initialize an empty TravelTimeCache that keeps up to <size>
+        travel times, or none if <size> is 0.
+
+        Precondition: size >= 0
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._times = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of travel times in this cache.
+
+        """
+        return len(self._times)
+
+    def travel_time(self, origin: Location, destination: Location,
+                    speed: int) -> int:
+        """Return the time it takes to drive from <origin> to <destination>
+        at <speed>, rounded to the nearest integer.
+
+        >>> cache = TravelTimeCache(2)
+        >>> cache.travel_time(Location(0, 0), Location(3, 4), 2)
+        4
+        >>> cache.travel_time(Location(0, 0), Location(3, 4), 2)
+        4
+        >>> cache.hits, cache.misses
+        (1, 1)
+        """
+        if self.size == 0:
+            return round(distance(origin, destination) / speed)
+
+        key = (origin.row, origin.column, destination.row,
+               destination.column, speed)
+        time_taken = self._times.get(key)
+        if time_taken is not None:
+            self.hits += 1
+            self._times.move_to_end(key)
+            return time_taken
+
+        self.misses += 1
+        time_taken = round(distance(origin, destination) / speed)
+        self._times[key] = time_taken
+        if len(self._times) > self.size:
+            self._times.popitem(last=False)
+        return time_taken
+
+    def resize(self, size: int) -> None:
+        """Keep up to <size> travel times from now on, or none if <size> is
+        0, forgetting the least recently used ones that no longer fit.
+
+        Precondition: size >= 0
+        """
+        self.size = size
+        while len(self._times) > size:
+            self._times.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget every travel time, and reset the hit and miss counts.
+
+        """
+        self._times.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# The travel times shared by every driver.
+TRAVEL_TIMES = TravelTimeCache()
+add_oracle_listener(TRAVEL_TIMES.clear)
+
+
 class Driver:
     """A driver for a ride-sharing service.
 
@@ -15,6 +122,7 @@ class Driver:
     speed: The speed at which the driver drives.
     destination: The destination of the driver
     """
+    __slots__ = ('id', 'location', 'is_idle', 'speed', 'destination')
 
     id: str
     location: Location
@@ -53,9 +161,10 @@ class Driver:
         rounded to the nearest integer.
 
         """
-        distance = manhattan_distance(self.location, destination)
-        time_taken = round(distance / self.speed)
-        return time_taken
+        if TRAVEL_TIMES.size:
+            return TRAVEL_TIMES.travel_time(self.location, destination,
+                                            self.speed)
+        return round(distance(self.location, destination) / self.speed)
 
     def start_drive(self, location: Location) -> int:
         """Start driving to the location.
@@ -64,10 +173,7 @@ class Driver:
         """
         self.is_idle = False
         self.destination = location
-
-        distance = manhattan_distance(self.location, location)
-        time_taken = round(distance / self.speed)
-        return time_taken
+        return self.get_travel_time(location)
 
     def end_drive(self) -> None:
         """End the drive and arrive at the destination.
@@ -87,9 +193,7 @@ class Driver:
         self.is_idle = False
         self.destination = rider.destination
         rider.satisfy()
-        distance = manhattan_distance(self.location, self.destination)
-        time_taken = round(distance / self.speed)
-        return time_taken
+        return self.get_travel_time(self.destination)
 
     def end_ride(self) -> None:
         """End the current ride, and arrive at the rider's destination.
@@ -116,4 +220,5 @@ class Driver:
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(
-        config={'extra-imports': ['typing', 'location', 'rider']})
+        config={'extra-imports': ['collections', 'typing', 'location',
+                                  'rider']})
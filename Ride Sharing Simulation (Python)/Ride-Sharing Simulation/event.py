@@ -4,13 +4,16 @@ This file should contain all of the classes necessary to model the different
 kinds of events in the simulation.
 """
 from __future__ import annotations
-from typing import List
+from typing import Iterator, List, Optional
 from rider import Rider, WAITING, CANCELLED, SATISFIED
 from dispatcher import Dispatcher
 from driver import Driver
-from location import deserialize_location
+from location import location_at
 from monitor import Monitor, RIDER, DRIVER, REQUEST, CANCEL, PICKUP, DROPOFF
 
+# The encoding of event files, however they are read.
+ENCODING = "utf-8"
+
 
 class Event:
     """An event.
@@ -27,11 +30,22 @@ class Event:
 
     Document any such changes carefully!
 
+    Events use __slots__ to keep each instance small, so subclasses that add
+    attributes must list them in their own __slots__.
+
+    An event that is no longer needed can be invalidated instead of being
+    removed from the simulation's queue. The simulation skips invalidated
+    events rather than doing them, and drops them from its queue once they
+    make up most of it.
+
     === Attributes ===
     timestamp: A timestamp for this event.
+    invalidated: True iff this event should be skipped rather than done.
     """
+    __slots__ = ('timestamp', 'invalidated')
 
     timestamp: int
+    invalidated: bool
 
     def __init__(self, timestamp: int) -> None:
         """Initialize an Event with a given timestamp.
@@ -42,6 +56,17 @@ class Event:
         7
         """
         self.timestamp = timestamp
+        self.invalidated = False
+
+    def invalidate(self) -> None:
+        """Mark this event to be skipped by the simulation.
+
+        >>> event = Event(7)
+        >>> event.invalidate()
+        >>> event.invalidated
+        True
+        """
+        self.invalidated = True
 
     # The following six 'magic methods' are overridden to allow for easy
     # comparison of Event instances. All comparisons simply perform the
@@ -157,6 +182,7 @@ class RiderRequest(Event):
     === Attributes ===
     rider: The rider.
     """
+    __slots__ = ('rider',)
 
     rider: Rider
 
@@ -173,7 +199,10 @@ class RiderRequest(Event):
         the rider.
 
         Return a Cancellation event. If the rider is assigned to a driver,
-        also return a Pickup event.
+        also return a Pickup event, and if the dispatcher will assign them in
+        a batch, also return a BatchMatch event when one is needed. The
+        simulation invalidates the Cancellation if the rider is picked up
+        before it happens.
 
         """
         monitor.notify(self.timestamp, RIDER, REQUEST,
@@ -185,6 +214,10 @@ class RiderRequest(Event):
             travel_time = driver.start_drive(self.rider.origin)
             events.append(Pickup(self.timestamp + travel_time,
                                  self.rider, driver))
+        else:
+            batch_time = dispatcher.schedule_batch(self.timestamp)
+            if batch_time is not None:
+                events.append(BatchMatch(batch_time))
         events.append(Cancellation(self.timestamp + self.rider.patience,
                                    self.rider))
         return events
@@ -202,6 +235,7 @@ class DriverRequest(Event):
     === Attributes ===
     driver: The driver.
     """
+    __slots__ = ('driver',)
 
     driver: Driver
 
@@ -216,7 +250,9 @@ class DriverRequest(Event):
         """Register the driver, if this is the first request, and
         assign a rider to the driver, if one is available.
 
-        If a rider is available, return a Pickup event.
+        If a rider is available, return a Pickup event. If the dispatcher
+        will assign one in a batch, return a BatchMatch event when one is
+        needed.
 
         """
         # Notify the monitor about the request.
@@ -229,6 +265,10 @@ class DriverRequest(Event):
             travel_time = self.driver.start_drive(n_rider.origin)
             events.append(Pickup(self.timestamp + travel_time,
                                  n_rider, self.driver))
+        else:
+            batch_time = dispatcher.schedule_batch(self.timestamp)
+            if batch_time is not None:
+                events.append(BatchMatch(batch_time))
 
         return events
         # If there is one available, the driver starts driving towards the
@@ -248,6 +288,8 @@ class Cancellation(Event):
     === Attributes ===
     rider: The rider in this event
     """
+    __slots__ = ('rider',)
+
     rider: Rider
 
     def __init__(self, timestamp: int, rider: Rider) -> None:
@@ -283,6 +325,8 @@ class Pickup(Event):
     rider: The rider of this event
     driver: The driver of this event
     """
+    __slots__ = ('rider', 'driver')
+
     rider: Rider
     driver: Driver
 
@@ -303,7 +347,7 @@ class Pickup(Event):
     def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
         """
         Set <self.driver> location to <self.rider> location and return a list
-        of events
+        of events.
         """
         events = []
         self.driver.end_drive()
@@ -335,6 +379,8 @@ class Dropoff(Event):
     rider: The rider in this event
     driver: The driver in this event
     """
+    __slots__ = ('rider', 'driver')
+
     rider: Rider
     driver: Driver
 
@@ -365,6 +411,33 @@ class Dropoff(Event):
         return event
 
 
+class BatchMatch(Event):
+    """The dispatcher assigns the riders and drivers who have been waiting
+    during a batch window.
+
+    === Attributes ===
+    timestamp: The end of the batch window.
+    """
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of this event.
+        """
+        return f"{self.timestamp} -- Match a batch"
+
+    def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
+        """
+        Assign waiting riders to waiting drivers, who start driving to their
+        riders, and return a Pickup event for each assigned pair.
+        """
+        events = []
+        for rider, driver in dispatcher.match_batch():
+            travel_time = driver.start_drive(rider.origin)
+            events.append(Pickup(self.timestamp + travel_time, rider, driver))
+        return events
+
+
 def create_event_list(filename: str) -> List[Event]:
     """Return a list of Events based on raw list of events in <filename>.
 
@@ -373,47 +446,137 @@ def create_event_list(filename: str) -> List[Event]:
 
     filename: The name of a file that contains the list of events.
     """
-    events = []
-    with open(filename, "r") as file:
+    return list(iter_events(filename))
+
+
+def iter_events(filename: str) -> Iterator[Event]:
+    """Yield the Events in <filename> one at a time, in file order.
+
+    Unlike create_event_list, only one line of the file is held in memory at
+    a time.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout.
+
+    filename: The name of a file that contains the list of events.
+    """
+    for record in iter_records(filename):
+        yield event_from_record(record)
+
+
+def iter_records(filename: str) -> Iterator[tuple]:
+    """Yield the records of the events in <filename>, as returned by
+    parse_record, one at a time, in file order.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout.
+
+    filename: The name of a file that contains the list of events.
+    """
+    with open(filename, "r", encoding=ENCODING) as file:
         for line in file:
-            line = line.strip()
+            record = parse_record(line)
+            if record is not None:
+                yield record
+
+
+def event_from_line(line: str) -> Optional[Event]:
+    """Return the Event described by a single <line> of an event file, or
+    None if the line is blank, a comment, or not a known kind of event.
+
+    >>> event = event_from_line("10 RiderRequest Cerise 4,2 1,5 15")
+    >>> event.timestamp
+    10
+    >>> event.rider.patience
+    15
+    >>> event_from_line("# A comment") is None
+    True
+    """
+    record = parse_record(line)
+    if record is None:
+        return None
+    return event_from_record(record)
+
+
+def parse_record(line: str) -> Optional[tuple]:
+    """Return the record described by a single <line> of an event file, or
+    None if the line is blank, a comment, or not a known kind of event.
+
+    A record is a tuple of the fields of the line, with numbers and
+    locations converted to ints:
+        (timestamp, "DriverRequest", id, row, column, speed)
+        (timestamp, "RiderRequest", id, row, column, destination row,
+         destination column, patience)
+    Records are cheap to copy between processes, and event_from_record turns
+    them back into events.
+
+    >>> parse_record("0 DriverRequest Bob 1,1 2")
+    (0, 'DriverRequest', 'Bob', 1, 1, 2)
+    """
+    line = line.strip()
+
+    if not line or line.startswith("#"):
+        # Skip lines that are blank or start with #.
+        return None
+
+    # Create a list of words in the line, e.g.
+    # ['10', 'RiderRequest', 'Cerise', '4,2', '1,5', '15'].
+    # Note that these are strings, and you'll need to convert some
+    # of them to a different type.
+    tokens = line.split()
+    timestamp = int(tokens[0])
+    event_type = tokens[1]
 
-            if not line or line.startswith("#"):
-                # Skip lines that are blank or start with #.
-                continue
+    if event_type == "DriverRequest":
+        location = tokens[3].split(",")
+        return (timestamp, event_type, tokens[2], int(location[0]),
+                int(location[1]), int(tokens[4]))
 
-            # Create a list of words in the line, e.g.
-            # ['10', 'RiderRequest', 'Cerise', '4,2', '1,5', '15'].
-            # Note that these are strings, and you'll need to convert some
-            # of them to a different type.
-            tokens = line.split()
-            timestamp = int(tokens[0])
-            event_type = tokens[1]
+    elif event_type == "RiderRequest":
+        origin = tokens[3].split(",")
+        destination = tokens[4].split(",")
+        return (timestamp, event_type, tokens[2], int(origin[0]),
+                int(origin[1]), int(destination[0]), int(destination[1]),
+                int(tokens[5]))
 
-            # HINT: Use Location.deserialize to convert the location string to
-            # a location.
+    return None
 
-            if event_type == "DriverRequest":
-                loc = tokens[3]
-                location = deserialize_location(loc)
-                driver = Driver(tokens[2], location, int(tokens[4]))
-                event = DriverRequest(timestamp, driver)
 
-            elif event_type == "RiderRequest":
-                origin = deserialize_location(tokens[3])
-                destination = deserialize_location(tokens[4])
-                rider = Rider(tokens[2], int(tokens[5]), origin, destination)
-                event = RiderRequest(timestamp, rider)
+def parse_line(line: bytes) -> Optional[tuple]:
+    """Return the record described by a single <line> of an event file read
+    as bytes, as parse_record does for a line read as text.
 
-            events.append(event)
+    >>> parse_line(b"0 DriverRequest Bob 1,1 2")
+    (0, 'DriverRequest', 'Bob', 1, 1, 2)
+    """
+    return parse_record(line.decode(ENCODING))
+
+
+def event_from_record(record: tuple) -> Event:
+    """Return a new Event for <record>, as returned by parse_record.
+
+    Every call returns new Rider and Driver objects, so the same record can
+    be used in any number of simulations.
+
+    >>> event_from_record((0, "DriverRequest", "Bob", 1, 1, 2)).driver.speed
+    2
+    """
+    timestamp = record[0]
+    if record[1] == "DriverRequest":
+        location = location_at(record[3], record[4])
+        driver = Driver(record[2], location, record[5])
+        return DriverRequest(timestamp, driver)
 
-    return events
+    origin = location_at(record[3], record[4])
+    destination = location_at(record[5], record[6])
+    rider = Rider(record[2], record[7], origin, destination)
+    return RiderRequest(timestamp, rider)
 
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(
         config={
-            'allowed-io': ['create_event_list'],
+            'allowed-io': ['iter_records'],
             'extra-imports': ['rider', 'dispatcher', 'driver',
                               'location', 'monitor']})
@@ -0,0 +1,506 @@
+"""Compiled event files
+
+An event file in the text format read by event.create_event_list can be
+compiled into a binary file of fixed-width records. A compiled file is
+memory-mapped when it is opened, and each event is only created when it is
+needed, so a file that is replayed many times is only parsed once.
+
+A text event file can also be parsed by a pool of processes:
+read_records_parallel splits the file into chunks of whole lines, parses
+each chunk in a worker process, and returns the records in file order.
+
+To replay only a window of time of a text event file, read_window seeks to
+the window using a TimeIndex, a sparse index of the file kept in a sidecar
+file next to it, which is built in one pass the first time it is needed.
+
+Run this module to compile a text event file:
+
+    python eventfile.py events.txt events.bin
+
+=== Compiled format ===
+The file starts with a header of the magic bytes b"RSEV", the format
+version, the number of records and the offset of the identifier table. Each
+record holds a timestamp, an event type, the index of the rider or driver
+identifier in the identifier table, four coordinates (the location, or the
+origin and destination) and the speed or patience. The identifier table
+holds each distinct identifier once, separated by newlines.
+"""
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+from event import Event, event_from_record, iter_records, parse_line
+
+MAGIC = b"RSEV"
+VERSION = 1
+
+# The header: magic, version, number of records, identifier table offset.
+_HEADER = struct.Struct("<4sIQQ")
+# A record: timestamp, type, identifier index, row, column, destination row,
+# destination column, and speed or patience.
+_RECORD = struct.Struct("<qB3xIiiiii")
+# The event types, in the order of their codes.
+_TYPES = ("DriverRequest", "RiderRequest")
+# The number of records copied out of the memory map at a time when a
+# compiled file is iterated over.
+_ITER_RECORDS = 4096
+
+# The header of a time index: magic, version, lines per block, number of
+# blocks, and the size and modification time of the indexed file.
+_INDEX_HEADER = struct.Struct("<4sIQQQQ")
+_INDEX_MAGIC = b"RSTI"
+# The smallest and largest values of a timestamp in a time index.
+_EARLIEST = -(1 << 63)
+_LATEST = (1 << 63) - 1
+
+
+def compile_events(source: str, target: str) -> int:
+    """Compile the text event file <source> into the binary event file
+    <target>, and return the number of events.
+
+    Precondition: every coordinate, speed and patience in <source> fits in
+    a signed 32-bit integer.
+    """
+    identifiers = {}
+    count = 0
+    with open(target, "wb") as binary:
+        binary.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        for record in iter_records(source):
+            binary.write(_pack(record, identifiers))
+            count += 1
+
+        table_offset = binary.tell()
+        binary.write("\n".join(identifiers).encode("utf-8"))
+        binary.seek(0)
+        binary.write(_HEADER.pack(MAGIC, VERSION, count, table_offset))
+    return count
+
+
+def _pack(record: tuple, identifiers: Dict[str, int]) -> bytes:
+    """Return the binary form of <record>, as returned by
+    event.parse_record, adding its identifier to <identifiers> if it is
+    new.
+
+    """
+    identifier = identifiers.setdefault(record[2], len(identifiers))
+    if record[1] == "DriverRequest":
+        return _RECORD.pack(record[0], 0, identifier, record[3], record[4],
+                            0, 0, record[5])
+    return _RECORD.pack(record[0], 1, identifier, *record[3:])
+
+
+def chunk_offsets(filename: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """Return the start and end byte offsets of chunks of <filename> that
+    are about <chunk_size> bytes long and only hold whole lines.
+
+    Precondition: chunk_size > 0
+    """
+    size = os.path.getsize(filename)
+    boundaries = [0]
+    with open(filename, "rb") as file:
+        for offset in range(chunk_size, size, chunk_size):
+            if offset <= boundaries[-1]:
+                # The previous chunk ended on a line past this offset.
+                continue
+            # Move to the start of the line after the one holding the byte
+            # before <offset>, so a line starting at <offset> is kept whole.
+            file.seek(offset - 1)
+            file.readline()
+            if file.tell() >= size:
+                break
+            boundaries.append(file.tell())
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def read_records_parallel(filename: str, processes: Optional[int] = None,
+                          chunk_size: int = 1 << 24) -> List[tuple]:
+    """Return the records of the events in the text event file <filename>,
+    as returned by event.parse_record, in file order.
+
+    The file is split into chunks of about <chunk_size> bytes, which are
+    parsed by a pool of <processes> processes, or one per CPU if
+    <processes> is None. A file of a single chunk is parsed without a pool.
+    """
+    chunks = chunk_offsets(filename, chunk_size)
+    if processes == 1 or len(chunks) <= 1:
+        return [record for chunk in chunks
+                for record in _parse_chunk(filename, *chunk)]
+
+    with multiprocessing.Pool(processes) as pool:
+        parsed = pool.starmap(_parse_chunk,
+                              [(filename, start, end)
+                               for start, end in chunks], chunksize=1)
+    return [record for records in parsed for record in records]
+
+
+def create_event_list_parallel(filename: str,
+                               processes: Optional[int] = None,
+                               chunk_size: int = 1 << 24) -> List[Event]:
+    """Return the same events as event.create_event_list(<filename>), parsed
+    by a pool of <processes> processes as read_records_parallel does.
+
+    """
+    return [event_from_record(record) for record
+            in read_records_parallel(filename, processes, chunk_size)]
+
+
+def _parse_chunk(filename: str, start: int, end: int) -> List[tuple]:
+    """Return the records of the lines between the byte offsets <start> and
+    <end> of <filename>.
+
+    """
+    with open(filename, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    records = []
+    for line in data.split(b"\n"):
+        record = parse_line(line)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+class TimeIndex:
+    """A sparse index of the timestamps of a text event file.
+
+    The event lines of the file are split into blocks of <every> lines. For
+    each block the index keeps its byte offset in the file, the latest
+    timestamp of the lines before it, and the earliest timestamp in it, so
+    that a window of time can be read without reading the blocks that cannot
+    hold any of its events, even if the file is not sorted by timestamp.
+
+    === Attributes ===
+    every: The number of event lines in each block.
+    size: The size of the indexed file, in bytes.
+    modified: The modification time of the indexed file, in nanoseconds.
+    """
+
+    every: int
+    size: int
+    modified: int
+
+    # === Private Attributes ===
+    _offsets: array
+    #     The byte offset of the first line of each block.
+    _before: array
+    #     The latest timestamp of the lines before each block.
+    _suffix_minimums: array
+    #     The earliest timestamp of the lines in each block and the blocks
+    #     after it.
+
+    def __init__(self, every: int, size: int, modified: int,
+                 offsets: array, before: array, minimums: array) -> None:
+        """Initialize a TimeIndex of the blocks with the <offsets>, <before>
+        and <minimums> of each block.
+
+        """
+        self.every = every
+        self.size = size
+        self.modified = modified
+        self._offsets = offsets
+        self._before = before
+        self._suffix_minimums = array("q", minimums)
+        for i in range(len(minimums) - 2, -1, -1):
+            self._suffix_minimums[i] = min(self._suffix_minimums[i],
+                                           self._suffix_minimums[i + 1])
+
+    def __len__(self) -> int:
+        """Return the number of blocks.
+
+        """
+        return len(self._offsets)
+
+    @classmethod
+    def build(cls, filename: str, every: int = 1024) -> 'TimeIndex':
+        """Return the index of the text event file <filename>, with blocks
+        of <every> event lines, built in one pass over the file.
+
+        Precondition: every > 0
+        """
+        offsets = array("q")
+        before = array("q")
+        minimums = array("q")
+        latest = _EARLIEST
+        lines = 0
+        offset = 0
+        status = os.stat(filename)
+        with open(filename, "rb") as file:
+            for line in file:
+                record = parse_line(line)
+                if record is not None:
+                    if lines % every == 0:
+                        offsets.append(offset)
+                        before.append(latest)
+                        minimums.append(record[0])
+                    else:
+                        minimums[-1] = min(minimums[-1], record[0])
+                    latest = max(latest, record[0])
+                    lines += 1
+                offset += len(line)
+        return cls(every, status.st_size, status.st_mtime_ns, offsets,
+                   before, minimums)
+
+    @classmethod
+    def load(cls, filename: str) -> 'TimeIndex':
+        """Return the index saved to <filename>.
+
+        Raise ValueError if <filename> is not a saved time index.
+        """
+        with open(filename, "rb") as file:
+            header = file.read(_INDEX_HEADER.size)
+            if len(header) < _INDEX_HEADER.size:
+                raise ValueError(f"{filename} is not a time index")
+            magic, version, every, blocks, size, modified = \
+                _INDEX_HEADER.unpack(header)
+            if magic != _INDEX_MAGIC or version != VERSION:
+                raise ValueError(f"{filename} is not a time index of "
+                                 f"version {VERSION}")
+            columns = []
+            for _ in range(3):
+                column = array("q")
+                column.fromfile(file, blocks)
+                columns.append(column)
+        return cls(every, size, modified, *columns)
+
+    def save(self, filename: str) -> None:
+        """Save this index to <filename>.
+
+        """
+        minimums = array("q", self._suffix_minimums)
+        # Only the suffix minimums are kept, which give the same windows as
+        # the minimums of each block.
+        with open(filename, "wb") as file:
+            file.write(_INDEX_HEADER.pack(_INDEX_MAGIC, VERSION, self.every,
+                                          len(self._offsets), self.size,
+                                          self.modified))
+            self._offsets.tofile(file)
+            self._before.tofile(file)
+            minimums.tofile(file)
+
+    def is_current(self, filename: str) -> bool:
+        """Return True iff this index is an index of <filename> as it is
+        now, judging by its size and modification time.
+
+        """
+        status = os.stat(filename)
+        return status.st_size == self.size \
+            and status.st_mtime_ns == self.modified
+
+    def window(self, start: int, end: int) -> Tuple[int, Optional[int]]:
+        """Return the byte offsets between which every event line with a
+        timestamp from <start> up to but not including <end> is found, with
+        None as the end of the file.
+
+        >>> index = TimeIndex(2, 0, 0, array("q", [0, 40, 80]),
+        ...                   array("q", [_EARLIEST, 5, 9]),
+        ...                   array("q", [0, 6, 10]))
+        >>> index.window(3, 10), index.window(0, 100)
+        ((0, 80), (0, None))
+        >>> index.window(7, 10)
+        (40, 80)
+        >>> index.window(9, 10), index.window(10, 11)
+        ((40, 80), (80, None))
+        """
+        # The last block whose earlier lines are all before <start>.
+        first = max(0, bisect_left(self._before, start) - 1)
+        for block in range(first + 1, len(self._offsets)):
+            if self._suffix_minimums[block] >= end:
+                return self._offsets[first], self._offsets[block]
+        if not self._offsets:
+            return 0, None
+        return self._offsets[first], None
+
+
+def index_filename(filename: str) -> str:
+    """Return the name of the time index sidecar file of <filename>.
+
+    """
+    return filename + ".tidx"
+
+
+def load_time_index(filename: str, every: int = 1024) -> TimeIndex:
+    """Return the time index of the text event file <filename>, from its
+    sidecar file if it is current, or else built with blocks of <every>
+    event lines and saved to its sidecar file.
+
+    """
+    sidecar = index_filename(filename)
+    if os.path.exists(sidecar):
+        try:
+            index = TimeIndex.load(sidecar)
+            if index.is_current(filename):
+                return index
+        except (ValueError, EOFError):
+            # A damaged or old sidecar file is replaced.
+            pass
+    index = TimeIndex.build(filename, every)
+    index.save(sidecar)
+    return index
+
+
+def read_window(filename: str, start: int, end: int,
+                every: int = 1024) -> Iterator[Event]:
+    """Yield the events of the text event file <filename> with timestamps
+    from <start> up to but not including <end>, in file order.
+
+    Only the blocks of the file that can hold such events are read, using
+    the time index of the file, which is built with blocks of <every> event
+    lines if it has no current sidecar file.
+    """
+    first, last = load_time_index(filename, every).window(start, end)
+    with open(filename, "rb") as file:
+        file.seek(first)
+        offset = first
+        for line in file:
+            if last is not None and offset >= last:
+                break
+            offset += len(line)
+            record = parse_line(line)
+            if record is not None and start <= record[0] < end:
+                yield event_from_record(record)
+
+
+class CompiledEvents:
+    """The events of a compiled event file.
+
+    The file is memory-mapped, and the events are created, with new riders
+    and drivers, each time they are read. A CompiledEvents can be indexed,
+    iterated over, or passed to Simulation.run_stream.
+
+    === Attributes ===
+    filename: The name of the compiled event file.
+    """
+
+    filename: str
+
+    # === Private Attributes ===
+    _file: object
+    #     The open compiled event file.
+    _map: mmap.mmap
+    #     The memory map of the file.
+    _count: int
+    #     The number of records in the file.
+    _identifiers: List[str]
+    #     The identifiers, in the order of their indexes.
+
+    def __init__(self, filename: str) -> None:
+        """Open the compiled event file <filename>.
+
+        Raise ValueError if the file is not a compiled event file of this
+        version.
+        """
+        self.filename = filename
+        self._file = open(filename, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be memory-mapped.
+            self._file.close()
+            raise ValueError(f"{filename} is not a compiled event file")
+
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"{filename} is not a compiled event file")
+        magic, version, count, table_offset = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{filename} is not a compiled event file "
+                             f"of version {VERSION}")
+
+        self._count = count
+        table = self._map[table_offset:]
+        self._identifiers = table.decode("utf-8").split("\n") if table \
+            else []
+
+    def __enter__(self) -> 'CompiledEvents':
+        """Return this CompiledEvents, to be closed at the end of a with
+        statement.
+
+        """
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the file at the end of a with statement.
+
+        """
+        self.close()
+
+    def __len__(self) -> int:
+        """Return the number of events in the file.
+
+        """
+        return self._count
+
+    def __getitem__(self, index: int) -> Event:
+        """Return a new Event for the event at <index> in the file.
+
+        """
+        return event_from_record(self.record(index))
+
+    def __iter__(self) -> Iterator[Event]:
+        """Yield a new Event for each event in the file, in file order.
+
+        """
+        for record in self.records():
+            yield event_from_record(record)
+
+    def records(self) -> Iterator[tuple]:
+        """Yield the record of each event in the file, in file order, in the
+        form returned by event.parse_record.
+
+        """
+        start = _HEADER.size
+        for first in range(0, self._count, _ITER_RECORDS):
+            end = start + min(_ITER_RECORDS, self._count - first) \
+                * _RECORD.size
+            for fields in _RECORD.iter_unpack(self._map[start:end]):
+                yield self._record(fields)
+            start = end
+
+    def record(self, index: int) -> tuple:
+        """Return the record of the event at <index> in the file, in the
+        form returned by event.parse_record.
+
+        """
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("event index out of range")
+
+        return self._record(_RECORD.unpack_from(
+            self._map, _HEADER.size + index * _RECORD.size))
+
+    def _record(self, fields: tuple) -> tuple:
+        """Return the record, in the form returned by event.parse_record, of
+        the <fields> unpacked from a record of the file.
+
+        """
+        (timestamp, kind, identifier, row, column, to_row, to_column,
+         value) = fields
+        if kind == 0:
+            return (timestamp, _TYPES[0], self._identifiers[identifier], row,
+                    column, value)
+        return (timestamp, _TYPES[1], self._identifiers[identifier], row,
+                column, to_row, to_column, value)
+
+    def close(self) -> None:
+        """Close the file.
+
+        """
+        self._map.close()
+        self._file.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("source", help="the text event file to compile")
+    parser.add_argument("target", help="the compiled event file to write")
+    args = parser.parse_args()
+    print(f"compiled {compile_events(args.source, args.target)} events")
@@ -0,0 +1,138 @@
+"""Streaming histograms
+
+A Histogram counts non-negative integers in log-linear buckets: every value
+below 2 ** precision has its own bucket, and each larger power of two is
+split into 2 ** (precision - 1) buckets of equal width. The number of
+buckets only grows with the logarithm of the largest value, however many
+values are counted, and every quantile is within a relative error of
+2 ** (1 - precision) of the exact one.
+"""
+
+import math
+from typing import Dict, List, Tuple
+
+
+class Histogram:
+    """A log-linear histogram of non-negative integers.
+
+    === Attributes ===
+    precision: The number of significant bits kept of each value.
+    count: The number of values counted.
+    total: The sum of the values counted.
+    """
+
+    precision: int
+    count: int
+    total: int
+
+    # === Private Attributes ===
+    _buckets: Dict[Tuple[int, int], int]
+    #     The number of values in each bucket, keyed by the number of low
+    #     bits dropped from its values and the remaining high bits.
+
+    def __init__(self, precision: int = 5) -> None:
+        """Initialize an empty Histogram that keeps <precision> significant
+        bits of each value.
+
+        Precondition: precision > 0
+        """
+        self.precision = precision
+        self.count = 0
+        self.total = 0
+        self._buckets = {}
+
+    def __len__(self) -> int:
+        """Return the number of buckets in use.
+
+        """
+        return len(self._buckets)
+
+    def add(self, value: int) -> None:
+        """Count <value>.
+
+        Precondition: value >= 0
+        """
+        shift = max(0, value.bit_length() - self.precision)
+        key = (shift, value >> shift)
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+
+    def remove(self, value: int) -> None:
+        """Stop counting one <value>, e.g. when a running total counted
+        earlier has grown.
+
+        Precondition: <value> is counted by this histogram.
+
+        >>> histogram = Histogram()
+        >>> histogram.add(3)
+        >>> histogram.remove(3)
+        >>> histogram.count, len(histogram)
+        (0, 0)
+        """
+        shift = max(0, value.bit_length() - self.precision)
+        key = (shift, value >> shift)
+        if self._buckets[key] == 1:
+            del self._buckets[key]
+        else:
+            self._buckets[key] -= 1
+        self.count -= 1
+        self.total -= value
+
+    def merge(self, other: 'Histogram') -> None:
+        """Count the values counted by <other>.
+
+        Precondition: other.precision == self.precision
+        """
+        for key, count in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + count
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, fraction: float) -> float:
+        """Return the value below which <fraction> of the counted values
+        fall, i.e. the nearest-rank quantile, or 0.0 if no values were
+        counted.
+
+        A value that does not have its own bucket is estimated by the middle
+        of its bucket.
+
+        >>> histogram = Histogram()
+        >>> for value in range(1, 101):
+        ...     histogram.add(value)
+        >>> histogram.quantile(0.5), histogram.quantile(0.99)
+        (50.5, 97.5)
+        """
+        if self.count == 0:
+            return 0.0
+        # The rank of the quantile, counting from 1.
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for low, high, count in self.buckets():
+            seen += count
+            if seen >= rank:
+                return (low + high) / 2
+        return float(high)
+
+    def buckets(self) -> List[Tuple[int, int, int]]:
+        """Return the lowest value, highest value and count of each bucket
+        in use, from the lowest bucket to the highest.
+
+        >>> histogram = Histogram(2)
+        >>> for value in [0, 1, 5, 6, 7]:
+        ...     histogram.add(value)
+        >>> histogram.buckets()
+        [(0, 0, 1), (1, 1, 1), (4, 5, 1), (6, 7, 2)]
+        """
+        result = []
+        for shift, high_bits in sorted(self._buckets,
+                                       key=lambda key: key[1] << key[0]):
+            low = high_bits << shift
+            result.append((low, low + (1 << shift) - 1,
+                           self._buckets[(shift, high_bits)]))
+        return result
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={'extra-imports': ['math', 'typing']})
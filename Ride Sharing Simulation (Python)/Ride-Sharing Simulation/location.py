@@ -1,23 +1,68 @@
-"""Locations for the simulation"""
+"""Locations for the simulation
+
+Distances between locations are measured by the distance function, which
+uses the Manhattan distance unless a distance oracle, such as a
+RoadNetworkOracle, is set with set_distance_oracle. Every oracle must give
+distances that are at least the Manhattan distance, which the spatial
+indexes rely on to bound travel times.
+"""
 
 from __future__ import annotations
 
+import heapq
+import mmap
+import struct
+from array import array
+from collections import OrderedDict
+from operator import add
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
 
 class Location:
     """A two-dimensional location.
+
+    Locations are hashable and shared between riders, drivers and events, so
+    their attributes cannot be changed once they are initialized.
+
     === Attributes ===
     row: The vertical distance from the bottom of the grid
     column: The vertical distance from the left of the grid
     """
+    __slots__ = ('row', 'column')
+
     row: int
     column: int
 
     def __init__(self, row: int, column: int) -> None:
         """Initialize a location.
 
+        >>> location = Location(4, 7)
+        >>> location.row = 5
+        Traceback (most recent call last):
+        ...
+        AttributeError: Location is read-only
         """
-        self.row = row
-        self.column = column
+        object.__setattr__(self, "row", row)
+        object.__setattr__(self, "column", column)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Raise AttributeError, since locations cannot be changed.
+
+        """
+        raise AttributeError("Location is read-only")
+
+    def __delattr__(self, name: str) -> None:
+        """Raise AttributeError, since locations cannot be changed.
+
+        """
+        raise AttributeError("Location is read-only")
+
+    def __reduce__(self) -> Tuple[type, Tuple[int, int]]:
+        """Return how to pickle or copy this location, as a new Location
+        with the same row and column.
+
+        """
+        return Location, (self.row, self.column)
 
     def __str__(self) -> str:
         """Return a string representation.
@@ -47,6 +92,15 @@ class Location:
         result = self.row == other.row and self.column == other.column
         return result
 
+    def __hash__(self) -> int:
+        """Return a hash of this location, so that equal locations have
+        equal hashes.
+
+        >>> hash(Location(3, 4)) == hash(Location(3, 4))
+        True
+        """
+        return hash((self.row, self.column))
+
 
 def manhattan_distance(origin: Location, destination: Location) -> int:
     """Return the Manhattan distance between the origin and the destination.
@@ -66,19 +120,568 @@ def manhattan_distance(origin: Location, destination: Location) -> int:
     return v_distance + h_distance
 
 
+class ManhattanOracle:
+    """A distance oracle that gives the Manhattan distance.
+
+    """
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        return "ManhattanOracle"
+
+    def distance(self, origin: Location, destination: Location) -> int:
+        """Return the Manhattan distance between <origin> and <destination>.
+
+        >>> ManhattanOracle().distance(Location(9, 13), Location(5, 18))
+        9
+        """
+        return manhattan_distance(origin, destination)
+
+
+class RoadNetworkOracle:
+    """A distance oracle that gives the length of the shortest route between
+    two intersections of a road network.
+
+    The roads are undirected edges between intersections, each at least as
+    long as the Manhattan distance between its ends. The distances from an
+    intersection to every other one are found with Dijkstra's algorithm the
+    first time they are needed, and the most recently used max_rows of them
+    are kept.
+
+    Once precompute is called, or the oracle is loaded from a file written
+    by save, the distances are looked up in tables instead. The city is
+    split into square zones of zone_size by zone_size intersections, and
+    the border intersections of a zone are those with a road to another
+    zone. Each zone has a table of the distances between its intersections,
+    and one table holds the distances from every intersection to every
+    border intersection. A route between two zones enters the second zone
+    through one of its border intersections, so its length is the shortest
+    of the lengths through each of them. The tables grow with the number of
+    intersections times the size of a zone and the number of border
+    intersections, instead of with the square of the number of
+    intersections.
+
+    === Attributes ===
+    max_rows: The largest number of intersections whose distances are kept
+        before the tables are computed.
+    zone_size: The number of rows and columns of intersections in a zone.
+    """
+
+    max_rows: int
+    zone_size: int
+
+    # === Private Attributes ===
+    _nodes: Dict[Tuple[int, int], int]
+    #     The index of each intersection, keyed by its row and column.
+    _coordinates: List[Tuple[int, int]]
+    #     The row and column of each intersection, in order of their indexes.
+    _edges: List[Tuple[int, int, int]]
+    #     The roads, as the indexes of their ends and their length.
+    _adjacent: List[List[Tuple[int, int]]]
+    #     The other end and length of each road from each intersection.
+    _rows: OrderedDict
+    #     The distances from the intersections whose distances are kept to
+    #     every intersection, keyed by the index of the intersection, from
+    #     the least to the most recently used.
+    _zone: Optional[array]
+    #     The zone of each intersection, or None if the tables have not been
+    #     computed.
+    _local: Optional[array]
+    #     The index of each intersection within its zone, where the border
+    #     intersections of a zone come first.
+    _zone_sizes: List[int]
+    #     The number of intersections in each zone.
+    _zone_borders: List[int]
+    #     The number of border intersections of each zone.
+    _border_offsets: List[int]
+    #     The index of the first border intersection of each zone among all
+    #     the border intersections.
+    _zone_tables: List[Sequence[int]]
+    #     The distances between the intersections of each zone, with the
+    #     distance from i to j of a zone of n intersections at i * n + j.
+    _to_borders: Sequence[int]
+    #     The distances from every intersection to every border
+    #     intersection, with the distance from the intersection i to the
+    #     border intersection j at i * _border_count + j.
+    _border_count: int
+    #     The number of border intersections.
+    _map: Optional[mmap.mmap]
+    #     The memory map of the file the tables were loaded from, or None.
+
+    def __init__(self, roads: List[Tuple[Location, Location, int]],
+                 max_rows: int = 4096, zone_size: int = 16) -> None:
+        """Initialize a RoadNetworkOracle with <roads>, given as their ends
+        and length.
+
+        Raise ValueError if a road is shorter than the Manhattan distance
+        between its ends, or <zone_size> is not positive.
+        """
+        if zone_size < 1:
+            raise ValueError("the zone size must be positive")
+        self.max_rows = max_rows
+        self.zone_size = zone_size
+        self._nodes = {}
+        self._coordinates = []
+        self._edges = []
+        self._adjacent = []
+        self._rows = OrderedDict()
+        self._zone = None
+        self._local = None
+        self._zone_sizes = []
+        self._zone_borders = []
+        self._border_offsets = []
+        self._zone_tables = []
+        self._to_borders = array("i")
+        self._border_count = 0
+        self._map = None
+        for start, end, length in roads:
+            if length < manhattan_distance(start, end):
+                raise ValueError(f"the road from {start} to {end} is "
+                                 f"shorter than their Manhattan distance")
+            self._add_road(self._node((start.row, start.column)),
+                           self._node((end.row, end.column)), length)
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        return f"RoadNetworkOracle ({len(self._coordinates)} " \
+               f"intersections, {len(self._edges)} roads)"
+
+    @classmethod
+    def from_edge_list(cls, filename: str, max_rows: int = 4096,
+                       zone_size: int = 16) -> RoadNetworkOracle:
+        """Return the oracle of the roads in the edge list <filename>.
+
+        Each line of the file holds the two ends of a road, as 'row,col',
+        and its length, e.g. "0,0 0,1 3". Blank lines and lines that start
+        with # are skipped.
+        """
+        roads = []
+        with open(filename, "r") as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                start, end, length = line.split()
+                roads.append((deserialize_location(start),
+                              deserialize_location(end), int(length)))
+        return cls(roads, max_rows, zone_size)
+
+    @classmethod
+    def load(cls, filename: str) -> RoadNetworkOracle:
+        """Return the oracle saved to <filename> by save, with its tables.
+
+        The tables are memory-mapped rather than read, so they are only
+        paged in as they are used, and processes that load the same file
+        share them.
+        """
+        with open(filename, "rb") as file:
+            try:
+                map_ = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file cannot be memory-mapped.
+                raise ValueError(f"{filename} is not a saved road network")
+        if len(map_) < _ORACLE_HEADER.size:
+            map_.close()
+            raise ValueError(f"{filename} is not a saved road network")
+        magic, version, nodes, edges, zone_size, zones, border_count = \
+            _ORACLE_HEADER.unpack_from(map_)
+        if magic != _ORACLE_MAGIC or version != _ORACLE_VERSION:
+            map_.close()
+            raise ValueError(f"{filename} is not a saved road network "
+                             f"of version {_ORACLE_VERSION}")
+
+        view = memoryview(map_)[_ORACLE_HEADER.size:].cast("i")
+        position = 0
+
+        def take(count: int) -> Sequence[int]:
+            nonlocal position
+            position += count
+            return view[position - count:position]
+
+        coordinates = take(2 * nodes)
+        roads = take(3 * edges)
+        oracle = cls([], zone_size=zone_size)
+        for i in range(nodes):
+            oracle._node((coordinates[2 * i], coordinates[2 * i + 1]))
+        for i in range(edges):
+            oracle._add_road(roads[3 * i], roads[3 * i + 1],
+                             roads[3 * i + 2])
+
+        oracle._zone = array("i", take(nodes))
+        oracle._local = array("i", take(nodes))
+        oracle._zone_sizes = list(take(zones))
+        oracle._zone_borders = list(take(zones))
+        oracle._set_border_offsets()
+        oracle._zone_tables = [take(size * size)
+                               for size in oracle._zone_sizes]
+        oracle._border_count = border_count
+        oracle._to_borders = take(nodes * border_count)
+        oracle._map = map_
+        return oracle
+
+    def distance(self, origin: Location, destination: Location) -> int:
+        """Return the length of the shortest route from <origin> to
+        <destination>.
+
+        Raise ValueError if either location is not an intersection of the
+        road network, or there is no route between them.
+        """
+        start = self._nodes.get((origin.row, origin.column))
+        end = self._nodes.get((destination.row, destination.column))
+        if start is None or end is None:
+            # Raise the error for whichever is not an intersection.
+            self._index(origin)
+            self._index(destination)
+        if self._zone is not None:
+            length = self._table_distance(start, end)
+        else:
+            # Roads go both ways, so the distances from either end will do.
+            # Many drivers are measured to the same rider, so the distances
+            # from the destination are computed unless the origin's are kept.
+            if start in self._rows:
+                length = self._row(start)[end]
+            else:
+                length = self._row(end)[start]
+        if length >= _UNREACHABLE:
+            raise ValueError(f"there is no route from {origin} to "
+                             f"{destination}")
+        return length
+
+    def precompute(self) -> None:
+        """Compute and keep the tables of the distances within each zone and
+        from every intersection to every border intersection.
+
+        The tables take four bytes for each pair of intersections in the
+        same zone, and for each pair of an intersection and a border
+        intersection.
+        """
+        count = len(self._coordinates)
+        zones = {}
+        zone = array("i", [0]) * count
+        for node, (row, column) in enumerate(self._coordinates):
+            key = (row // self.zone_size, column // self.zone_size)
+            zone[node] = zones.setdefault(key, len(zones))
+
+        # The intersections of each zone, with its border intersections
+        # first.
+        members = [[] for _ in zones]
+        for node in range(count):
+            if self._is_border(node, zone):
+                members[zone[node]].append(node)
+        self._zone_borders = [len(nodes) for nodes in members]
+        borders = [node for nodes in members for node in nodes]
+        for node in range(count):
+            if not self._is_border(node, zone):
+                members[zone[node]].append(node)
+        local = array("i", [0]) * count
+        for nodes in members:
+            for i, node in enumerate(nodes):
+                local[node] = i
+
+        to_borders = array("i", [0]) * (count * len(borders))
+        for i, node in enumerate(borders):
+            to_borders[i::len(borders)] = self._dijkstra(node)
+
+        self._zone = zone
+        self._local = local
+        self._zone_sizes = [len(nodes) for nodes in members]
+        self._set_border_offsets()
+        self._border_count = len(borders)
+        self._to_borders = to_borders
+        self._zone_tables = []
+        for nodes in members:
+            table = array("i")
+            for node in nodes:
+                table.extend(self._zone_row(node, nodes))
+            self._zone_tables.append(table)
+        self._map = None
+        self._rows.clear()
+
+    def save(self, filename: str) -> None:
+        """Save the road network and its tables to <filename>, computing the
+        tables if they are not kept.
+
+        """
+        if self._zone is None:
+            self.precompute()
+        coordinates = array("i", [value for pair in self._coordinates
+                                  for value in pair])
+        roads = array("i", [value for road in self._edges
+                            for value in road])
+        with open(filename, "wb") as file:
+            file.write(_ORACLE_HEADER.pack(
+                _ORACLE_MAGIC, _ORACLE_VERSION, len(self._coordinates),
+                len(self._edges), self.zone_size, len(self._zone_sizes),
+                self._border_count))
+            for values in [coordinates, roads, self._zone, self._local,
+                           array("i", self._zone_sizes),
+                           array("i", self._zone_borders),
+                           *self._zone_tables, self._to_borders]:
+                file.write(values)
+
+    def _node(self, coordinates: Tuple[int, int]) -> int:
+        """Return the index of the intersection at <coordinates>, adding it
+        if it is new.
+
+        """
+        index = self._nodes.get(coordinates)
+        if index is None:
+            index = len(self._coordinates)
+            self._nodes[coordinates] = index
+            self._coordinates.append(coordinates)
+            self._adjacent.append([])
+        return index
+
+    def _add_road(self, start: int, end: int, length: int) -> None:
+        """Add a road of <length> between the intersections <start> and
+        <end>.
+
+        """
+        self._edges.append((start, end, length))
+        self._adjacent[start].append((end, length))
+        self._adjacent[end].append((start, length))
+
+    def _index(self, location: Location) -> int:
+        """Return the index of the intersection at <location>.
+
+        """
+        index = self._nodes.get((location.row, location.column))
+        if index is None:
+            raise ValueError(f"{location} is not an intersection of the "
+                             f"road network")
+        return index
+
+    def _is_border(self, node: int, zone: Sequence[int]) -> bool:
+        """Return whether the intersection <node> has a road to another
+        zone, where <zone> is the zone of each intersection.
+
+        """
+        return any(zone[other] != zone[node]
+                   for other, _ in self._adjacent[node])
+
+    def _set_border_offsets(self) -> None:
+        """Set the index of the first border intersection of each zone among
+        all the border intersections.
+
+        """
+        self._border_offsets = []
+        offset = 0
+        for borders in self._zone_borders:
+            self._border_offsets.append(offset)
+            offset += borders
+
+    def _table_distance(self, start: int, end: int) -> int:
+        """Return the length of the shortest route from the intersection
+        <start> to the intersection <end>, from the tables.
+
+        """
+        zone = self._zone[end]
+        size = self._zone_sizes[zone]
+        last = self._local[end] * size
+        if zone == self._zone[start]:
+            return self._zone_tables[zone][last + self._local[start]]
+
+        # The distances from <start> to the borders of the zone of <end>,
+        # and from those borders to <end>, since roads go both ways.
+        borders = self._zone_borders[zone]
+        if not borders:
+            return _UNREACHABLE
+        first = start * self._border_count + self._border_offsets[zone]
+        return min(map(add, self._to_borders[first:first + borders],
+                       self._zone_tables[zone][last:last + borders]))
+
+    def _row(self, start: int) -> array:
+        """Return the distances from the intersection <start> to every
+        intersection, computing them if they are not kept.
+
+        """
+        row = self._rows.get(start)
+        if row is not None:
+            self._rows.move_to_end(start)
+            return row
+        row = self._dijkstra(start)
+        self._rows[start] = row
+        if len(self._rows) > self.max_rows:
+            self._rows.popitem(last=False)
+        return row
+
+    def _dijkstra(self, start: int) -> array:
+        """Return the length of the shortest route from the intersection
+        <start> to every intersection, or _UNREACHABLE if there is none.
+
+        """
+        row = array("i", [_UNREACHABLE]) * len(self._coordinates)
+        row[start] = 0
+        done = bytearray(len(self._coordinates))
+        heap = [(0, start)]
+        while heap:
+            length, node = heapq.heappop(heap)
+            if done[node]:
+                continue
+            done[node] = 1
+            for other, road in self._adjacent[node]:
+                if length + road < row[other]:
+                    row[other] = length + road
+                    heapq.heappush(heap, (length + road, other))
+        return row
+
+    def _zone_row(self, start: int, nodes: List[int]) -> array:
+        """Return the length of the shortest route from the intersection
+        <start> to each intersection of <nodes>, the intersections of its
+        zone with the border intersections first, or _UNREACHABLE if there
+        is none.
+
+        Only the roads within the zone are searched. A route that leaves the
+        zone comes back through a border intersection, and the distances
+        from <start> to those are already in the table of distances to the
+        border intersections, so the search starts from them.
+        """
+        zone = self._zone[start]
+        borders = self._zone_borders[zone]
+        first = start * self._border_count + self._border_offsets[zone]
+        row = array("i", self._to_borders[first:first + borders]) \
+            + array("i", [_UNREACHABLE]) * (len(nodes) - borders)
+        row[self._local[start]] = 0
+        heap = [(length, i) for i, length in enumerate(row)
+                if length < _UNREACHABLE]
+        heapq.heapify(heap)
+        done = bytearray(len(nodes))
+        while heap:
+            length, i = heapq.heappop(heap)
+            if done[i]:
+                continue
+            done[i] = 1
+            for other, road in self._adjacent[nodes[i]]:
+                if self._zone[other] == zone:
+                    j = self._local[other]
+                    if length + road < row[j]:
+                        row[j] = length + road
+                        heapq.heappush(heap, (length + road, j))
+        return row
+
+
+# The distance given to intersections with no route between them.
+_UNREACHABLE = (1 << 31) - 1
+
+# The header of a saved road network: magic, version, intersections, roads,
+# zone size, zones and border intersections.
+_ORACLE_HEADER = struct.Struct("<4sIIIIII")
+_ORACLE_MAGIC = b"RSRN"
+_ORACLE_VERSION = 2
+
+# The distance oracle, or None to use the Manhattan distance.
+_ORACLE = None
+# The functions called when the distance oracle changes.
+_ORACLE_LISTENERS = []
+
+
+def distance(origin: Location, destination: Location) -> int:
+    """Return the distance between <origin> and <destination>, as measured
+    by the distance oracle.
+
+    >>> distance(Location(9, 13), Location(5, 18))
+    9
+    """
+    if _ORACLE is None:
+        return abs(origin.row - destination.row) \
+            + abs(origin.column - destination.column)
+    return _ORACLE.distance(origin, destination)
+
+
+def get_distance_oracle() -> Optional[object]:
+    """Return the distance oracle, or None if distances are Manhattan
+    distances.
+
+    """
+    return _ORACLE
+
+
+def set_distance_oracle(oracle: Optional[object]) -> None:
+    """Measure distances with <oracle> from now on, or with the Manhattan
+    distance if <oracle> is None or a ManhattanOracle.
+
+    Precondition: every distance given by <oracle> is at least the
+    Manhattan distance.
+    """
+    global _ORACLE
+    if isinstance(oracle, ManhattanOracle):
+        oracle = None
+    _ORACLE = oracle
+    for listener in _ORACLE_LISTENERS:
+        listener()
+
+
+def add_oracle_listener(listener: Callable[[], None]) -> None:
+    """Call <listener> whenever the distance oracle changes, e.g. to forget
+    distances computed with the previous oracle.
+
+    """
+    _ORACLE_LISTENERS.append(listener)
+
+
+# The largest number of locations kept by location_at.
+MAX_INTERNED_LOCATIONS = 1 << 16
+# The locations created by location_at, keyed by their row and column, from
+# the least to the most recently used.
+_LOCATIONS = OrderedDict()
+
+
+def location_at(row: int, column: int) -> Location:
+    """Return the Location at <row> and <column>.
+
+    Calls with the same <row> and <column> return the same Location object,
+    so the locations from an event file share one object per intersection.
+    Only the MAX_INTERNED_LOCATIONS most recently used locations are kept,
+    so the locations of earlier runs do not pile up in a long-lived process.
+
+    >>> location_at(3, 4) is location_at(3, 4)
+    True
+    """
+    key = (row, column)
+    location = _LOCATIONS.get(key)
+    if location is not None:
+        _LOCATIONS.move_to_end(key)
+        return location
+    location = Location(row, column)
+    _LOCATIONS[key] = location
+    if len(_LOCATIONS) > MAX_INTERNED_LOCATIONS:
+        _LOCATIONS.popitem(last=False)
+    return location
+
+
+def clear_locations() -> None:
+    """Forget the locations created by location_at, so that later calls
+    return new Location objects.
+
+    >>> first = location_at(3, 4)
+    >>> clear_locations()
+    >>> location_at(3, 4) is first
+    False
+    """
+    _LOCATIONS.clear()
+
+
 def deserialize_location(location_str: str) -> Location:
     """Deserialize a location.
 
+    The location is shared with the other calls for the same intersection,
+    as by location_at.
+
     location_str: A location in the format 'row,col'
 
+    >>> deserialize_location("3,4") is location_at(3, 4)
+    True
     """
     string_lst = location_str.split(",")
-    row = int(string_lst[0])
-    column = int(string_lst[1])
-    location = Location(row, column)
-    return location
+    return location_at(int(string_lst[0]), int(string_lst[1]))
 
 
 if __name__ == '__main__':
     import python_ta
-    python_ta.check_all()
+    python_ta.check_all(
+        config={'extra-imports': ['heapq', 'mmap', 'struct', 'array',
+                                  'collections', 'operator', 'typing']})
@@ -0,0 +1,108 @@
+"""Assignment of riders to drivers
+
+Each function takes a matrix of costs, where cost[i][j] is the cost of
+assigning rider i to driver j, and returns the assigned (rider, driver)
+pairs. As many pairs as possible are assigned, i.e. the smaller of the number
+of riders and the number of drivers, and no rider or driver is assigned
+twice.
+"""
+
+from typing import List, Tuple
+
+# The assignment methods, keyed by name.
+METHODS = ("greedy", "optimal")
+
+
+def greedy_assignment(cost: List[List[int]]) -> List[Tuple[int, int]]:
+    """Return the pairs chosen by repeatedly assigning the cheapest pair of
+    a rider and a driver who are both still unassigned.
+
+    Ties are resolved in favour of the lowest rider index, and then the
+    lowest driver index.
+
+    >>> greedy_assignment([[1, 5], [2, 9]])
+    [(0, 0), (1, 1)]
+    >>> greedy_assignment([[3], [1], [1]])
+    [(1, 0)]
+    """
+    pairs = sorted((value, rider, driver)
+                   for rider, row in enumerate(cost)
+                   for driver, value in enumerate(row))
+    riders = set()
+    drivers = set()
+    result = []
+    for _, rider, driver in pairs:
+        if rider not in riders and driver not in drivers:
+            riders.add(rider)
+            drivers.add(driver)
+            result.append((rider, driver))
+    return result
+
+
+def optimal_assignment(cost: List[List[int]]) -> List[Tuple[int, int]]:
+    """Return the pairs with the smallest total cost, using the Hungarian
+    algorithm, sorted by rider index.
+
+    >>> optimal_assignment([[1, 5], [2, 9]])
+    [(0, 1), (1, 0)]
+    >>> optimal_assignment([[3], [1], [1]])
+    [(1, 0)]
+    """
+    if not cost or not cost[0]:
+        return []
+    if len(cost) > len(cost[0]):
+        transposed = [list(column) for column in zip(*cost)]
+        return sorted((rider, driver) for driver, rider
+                      in optimal_assignment(transposed))
+
+    # The potentials of the rows and columns, and the row assigned to each
+    # column, with row and column 0 used as a sentinel.
+    rows = len(cost)
+    columns = len(cost[0])
+    row_potential = [0] * (rows + 1)
+    column_potential = [0] * (columns + 1)
+    assigned = [0] * (columns + 1)
+    previous = [0] * (columns + 1)
+
+    for row in range(1, rows + 1):
+        assigned[0] = row
+        column = 0
+        slack = [float("inf")] * (columns + 1)
+        used = [False] * (columns + 1)
+        while assigned[column] != 0:
+            used[column] = True
+            current_row = assigned[column]
+            delta = float("inf")
+            next_column = 0
+            for j in range(1, columns + 1):
+                if used[j]:
+                    continue
+                reduced = (cost[current_row - 1][j - 1]
+                           - row_potential[current_row] - column_potential[j])
+                if reduced < slack[j]:
+                    slack[j] = reduced
+                    previous[j] = column
+                if slack[j] < delta:
+                    delta = slack[j]
+                    next_column = j
+            for j in range(columns + 1):
+                if used[j]:
+                    row_potential[assigned[j]] += delta
+                    column_potential[j] -= delta
+                else:
+                    slack[j] -= delta
+            column = next_column
+
+        # Follow the augmenting path back to the sentinel column.
+        while column != 0:
+            previous_column = previous[column]
+            assigned[column] = assigned[previous_column]
+            column = previous_column
+
+    return sorted((assigned[j] - 1, j - 1) for j in range(1, columns + 1)
+                  if assigned[j] != 0)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={'extra-imports': ['typing']})
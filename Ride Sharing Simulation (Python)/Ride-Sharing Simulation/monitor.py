@@ -16,9 +16,11 @@ PICKUP: A constant used for the pickup activity description.
 DROPOFF: A constant used for the dropoff activity description.
 """
 
-from typing import Dict, List
+import copy
+from typing import Dict, List, Optional, Tuple
+from histogram import Histogram
 from location import Location
-from location import manhattan_distance
+from location import distance as measure_distance
 
 RIDER = "rider"
 DRIVER = "driver"
@@ -39,6 +41,7 @@ class Activity:
     identifier: An identifier for the person doing the activity.
     location: The location at which the activity occurred.
     """
+    __slots__ = ('time', 'description', 'id', 'location')
 
     time: int
     description: str
@@ -61,7 +64,7 @@ def total_distance(activities: List, distance: float) -> float:
     A helper function for total distance method
     """
     for activity in range(len(activities) - 1):
-        m_distance = manhattan_distance(
+        m_distance = measure_distance(
             activities[activity].location,
             activities[activity + 1].location)
         distance += m_distance
@@ -74,7 +77,7 @@ def ride_distance(activities: List, distance: float) -> float:
     """
     for activity in range(len(activities) - 1):
         if activities[activity].description == PICKUP:
-            m_distance = manhattan_distance(
+            m_distance = measure_distance(
                 activities[activity].location,
                 activities[activity + 1].location)
             distance += m_distance
@@ -136,6 +139,12 @@ class Monitor:
                 "driver_total_distance": self._average_total_distance(),
                 "driver_ride_distance": self._average_ride_distance()}
 
+    def has_sink(self) -> bool:
+        """Return True iff this monitor writes its activities to a sink.
+
+        """
+        return False
+
     def _average_wait_time(self) -> float:
         """Return the average wait time of riders that have either been picked
         up or have cancell
@@ -193,10 +202,279 @@ class Monitor:
             return distance / count
 
 
+class IncrementalMonitor(Monitor):
+    """A monitor that keeps running totals of the statistics it reports.
+
+    Each notification updates the totals in constant time, so the report can
+    be generated at any point of a simulation without going over the
+    activities again. The report is the same as that of a Monitor notified
+    of the same activities, except that the average wait time is 0.0 rather
+    than an error when no rider has finished waiting.
+
+    If activities are not retained, only the per-rider and per-driver state
+    needed for the totals is kept in memory. A sink, such as an
+    activitylog.CSVActivitySink, can be given to keep every activity on disk
+    instead. A Monitor takes no sink, since its report is computed from the
+    activities it keeps in memory.
+
+    If percentiles are kept, the wait times of riders, the distances of
+    rides and the total distances of drivers are also counted in
+    histogram.Histograms, whose memory does not grow with the number of
+    riders. The report then also has the 50th, 95th and 99th percentile wait
+    times, e.g. "rider_wait_time_p95", and histograms returns the buckets of
+    each histogram. As in the report, only the rides of drivers with more
+    than two activities are counted.
+    """
+
+    # === Private Attributes ===
+    _retain: bool
+    #     True iff the activities are also recorded in _activities.
+    _sink: Optional[object]
+    #     The sink every activity is written to, or None.
+    _rider_requests: Dict[str, Optional[int]]
+    #     The time of the first activity of each rider, or None for riders
+    #     who have finished waiting.
+    _wait_time: int
+    #     The total wait time of the riders who have finished waiting.
+    _riders_done: int
+    #     The number of riders who have finished waiting.
+    _drivers: Dict[str, list]
+    #     The state of each driver: the location and description of their
+    #     latest activity, their number of activities, the distance of a
+    #     ride that is not counted until they have more than two activities,
+    #     or None, and the total distance they have driven.
+    _total_distance: int
+    #     The total distance driven by all drivers.
+    _ride_distance: int
+    #     The total distance driven by all drivers on rides.
+    _wait_times: Optional[Histogram]
+    #     The wait times of the riders who have finished waiting, or None if
+    #     percentiles are not kept.
+    _ride_distances: Optional[Histogram]
+    #     The distance of each ride, or None if percentiles are not kept.
+    _driver_distances: Optional[Histogram]
+    #     The total distance of each driver in _drivers, or None if
+    #     percentiles are not kept.
+
+    def __init__(self, retain: bool = True,
+                 sink: Optional[object] = None,
+                 percentiles: bool = False) -> None:
+        """Initialize an IncrementalMonitor.
+
+        retain: True iff every activity should also be recorded, as it is by
+            a Monitor.
+        sink: An object with a write method taking the same arguments as
+            notify, and a flush method, that every activity is written to,
+            or None.
+        percentiles: True iff the report should also have the percentiles
+            and histograms of the wait times and distances.
+        """
+        Monitor.__init__(self)
+        self._retain = retain
+        self._sink = sink
+        self._rider_requests = {}
+        self._wait_time = 0
+        self._riders_done = 0
+        self._drivers = {}
+        self._total_distance = 0
+        self._ride_distance = 0
+        self._wait_times = None
+        self._ride_distances = None
+        self._driver_distances = None
+        if percentiles:
+            self._wait_times = Histogram()
+            self._ride_distances = Histogram()
+            self._driver_distances = Histogram()
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        return "IncrementalMonitor ({} drivers, {} riders)".format(
+            len(self._drivers), len(self._rider_requests))
+
+    def notify(self, timestamp: int, category: str, description: str,
+               identifier: str, location: Location) -> None:
+        """Notify the monitor of the activity, and update the totals.
+
+        timestamp: The time of the activity.
+        category: The category (DRIVER or RIDER) for the activity.
+        description: A description (REQUEST | CANCEL | PICKUP | DROP_OFF)
+            of the activity.
+        identifier: The identifier for the actor.
+        location: The location of the activity.
+        """
+        if self._retain:
+            Monitor.notify(self, timestamp, category, description,
+                           identifier, location)
+        if self._sink is not None:
+            self._sink.write(timestamp, category, description, identifier,
+                             location)
+
+        if category == RIDER:
+            if identifier not in self._rider_requests:
+                self._rider_requests[identifier] = timestamp
+            else:
+                requested = self._rider_requests[identifier]
+                if requested is not None:
+                    # The second activity is PICKUP or CANCEL.
+                    self._wait_time += timestamp - requested
+                    self._riders_done += 1
+                    if self._wait_times is not None:
+                        self._wait_times.add(timestamp - requested)
+                    self._rider_requests[identifier] = None
+            return
+
+        state = self._drivers.get(identifier)
+        if state is None:
+            self._drivers[identifier] = [location, description, 1, None, 0]
+            if self._driver_distances is not None:
+                self._driver_distances.add(0)
+            return
+
+        distance = measure_distance(state[0], location)
+        self._total_distance += distance
+        if self._driver_distances is not None:
+            self._driver_distances.remove(state[4])
+            self._driver_distances.add(state[4] + distance)
+        state[4] += distance
+        ride = distance if state[1] == PICKUP else None
+        state[0] = location
+        state[1] = description
+        state[2] += 1
+        if state[2] <= 2:
+            # As in Monitor, drivers with two or fewer activities have no
+            # rides, so the first one is held until the third activity.
+            state[3] = ride
+            return
+        if state[3] is not None:
+            self._add_ride(state[3])
+            state[3] = None
+        if ride is not None:
+            self._add_ride(ride)
+
+    def _add_ride(self, distance: int) -> None:
+        """Count a ride of <distance> in the totals.
+
+        """
+        self._ride_distance += distance
+        if self._ride_distances is not None:
+            self._ride_distances.add(distance)
+
+    def has_sink(self) -> bool:
+        """Return True iff this monitor writes its activities to a sink.
+
+        """
+        return self._sink is not None
+
+    def reopen_sink(self, filename: str) -> None:
+        """Write the activities to the new file <filename> from now on, with
+        a sink that has a reopen method, such as an
+        activitylog.CSVActivitySink.
+
+        This is meant for a monitor that was copied or unpickled, whose sink
+        is a detached copy. The sink is copied again first, so that a sink
+        that is still attached to its log, e.g. in a process forked from the
+        one that made it, leaves the log alone.
+
+        Raise ValueError if this monitor has no sink.
+        """
+        if self._sink is None:
+            raise ValueError("this monitor has no sink to reopen")
+        self._sink = copy.copy(self._sink)
+        self._sink.reopen(filename)
+
+    def pop_driver(self, identifier: str) -> Optional[list]:
+        """Remove and return the state of the driver <identifier>, or None if
+        there are no activities of that driver.
+
+        The driver's distances stay in the totals, so that the state can be
+        given to another IncrementalMonitor with add_driver, which continues
+        the driver's totals as if it had been notified of every activity.
+        """
+        state = self._drivers.pop(identifier, None)
+        if state is not None and self._driver_distances is not None:
+            self._driver_distances.remove(state[4])
+        return state
+
+    def add_driver(self, identifier: str, state: list) -> None:
+        """Add the <state> of the driver <identifier>, as returned by
+        pop_driver.
+
+        Precondition: this monitor has no state for <identifier>.
+        """
+        self._drivers[identifier] = state
+        if self._driver_distances is not None:
+            self._driver_distances.add(state[4])
+
+    def merge(self, other: 'IncrementalMonitor') -> None:
+        """Add the totals of <other> to the totals of this monitor, so that
+        the report is that of a monitor notified of the activities of both.
+
+        Only the totals and histograms are merged, not the retained
+        activities.
+
+        Precondition: no rider or driver has state in both monitors, and
+        both monitors keep percentiles or neither does.
+        """
+        self._rider_requests.update(other._rider_requests)
+        self._wait_time += other._wait_time
+        self._riders_done += other._riders_done
+        self._drivers.update(other._drivers)
+        self._total_distance += other._total_distance
+        self._ride_distance += other._ride_distance
+        if self._wait_times is not None:
+            self._wait_times.merge(other._wait_times)
+            self._ride_distances.merge(other._ride_distances)
+            self._driver_distances.merge(other._driver_distances)
+
+    def report(self) -> Dict[str, float]:
+        """Return a report of the activities that have occurred.
+
+        The activities written to the sink, if any, are flushed.
+        """
+        if self._sink is not None:
+            self._sink.flush()
+        if self._riders_done == 0:
+            wait_time = 0.0
+        else:
+            wait_time = self._wait_time / self._riders_done
+
+        if not self._drivers:
+            report = {"rider_wait_time": wait_time,
+                      "driver_total_distance": 0.0,
+                      "driver_ride_distance": 0.0}
+        else:
+            report = {"rider_wait_time": wait_time,
+                      "driver_total_distance":
+                          self._total_distance / len(self._drivers),
+                      "driver_ride_distance":
+                          self._ride_distance / len(self._drivers)}
+
+        if self._wait_times is not None:
+            for percentile in (50, 95, 99):
+                report[f"rider_wait_time_p{percentile}"] = \
+                    self._wait_times.quantile(percentile / 100)
+        return report
+
+    def histograms(self) -> Dict[str, List[Tuple[int, int, int]]]:
+        """Return the buckets of the histograms of the rider wait times, the
+        ride distances and the total distances of drivers, as (lowest value,
+        highest value, count) triples, or an empty dictionary if percentiles
+        are not kept.
+
+        """
+        if self._wait_times is None:
+            return {}
+        return {"rider_wait_time": self._wait_times.buckets(),
+                "ride_distance": self._ride_distances.buckets(),
+                "driver_total_distance": self._driver_distances.buckets()}
+
+
 if __name__ == "__main__":
     import python_ta
 
     python_ta.check_all(
         config={
             'max-args': 6,
-            'extra-imports': ['typing', 'location']})
+            'extra-imports': ['copy', 'typing', 'histogram', 'location']})
@@ -0,0 +1,180 @@
+"""Profiling of the simulation's event loop
+
+A SimulationProfile records where a simulation spends its time: how many
+events of each kind it did and how long their do() methods took, how large
+its event queue grew, and how long the dispatcher took to answer requests.
+A Simulation only keeps a profile when it is created with profile=True, so
+a simulation that is not profiled pays nothing for it.
+"""
+
+import time
+from typing import Dict, List, Optional
+from dispatcher import Dispatcher
+from driver import Driver
+from rider import Rider
+
+
+class SimulationProfile:
+    """The counts and timings of a profiled simulation.
+
+    === Attributes ===
+    events: The number of events of each class that were done, and the
+        total number of seconds spent in their do() methods, keyed by the
+        name of the class.
+    max_queue_size: The largest number of events that were in the event
+        queue at once.
+    dispatcher: The number of calls to each method of the dispatcher, and
+        the total number of seconds they took, keyed by the method name.
+    """
+
+    events: Dict[str, List[float]]
+    max_queue_size: int
+    dispatcher: Dict[str, List[float]]
+
+    def __init__(self) -> None:
+        """Initialize an empty SimulationProfile.
+
+        """
+        self.events = {}
+        self.max_queue_size = 0
+        self.dispatcher = {}
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        lines = [f"max queue size: {self.max_queue_size}"]
+        for name, (count, seconds) in sorted(self.events.items()):
+            lines.append(f"{name}: {count:.0f} events, {seconds:.6f}s")
+        for name, (count, seconds) in sorted(self.dispatcher.items()):
+            lines.append(f"{name}: {count:.0f} calls, {seconds:.6f}s")
+        return "\n".join(lines)
+
+    def record_event(self, name: str, seconds: float,
+                     queue_size: int) -> None:
+        """Record that an event of the class <name> took <seconds> to do,
+        and that the event queue then held <queue_size> events.
+
+        >>> profile = SimulationProfile()
+        >>> profile.record_event("Pickup", 0.5, 3)
+        >>> profile.record_event("Pickup", 0.25, 1)
+        >>> profile.events["Pickup"], profile.max_queue_size
+        ([2, 0.75], 3)
+        """
+        _add(self.events, name, seconds)
+        if queue_size > self.max_queue_size:
+            self.max_queue_size = queue_size
+
+    def record_call(self, name: str, seconds: float) -> None:
+        """Record that a call to the dispatcher method <name> took
+        <seconds>.
+
+        """
+        _add(self.dispatcher, name, seconds)
+
+    def summary(self) -> Dict[str, object]:
+        """Return the profile as a dictionary of plain values.
+
+        The "events" and "dispatcher" keys map each event class or
+        dispatcher method to its count and total and mean seconds.
+        """
+        return {"events": _summarize(self.events, "count"),
+                "max_queue_size": self.max_queue_size,
+                "dispatcher": _summarize(self.dispatcher, "calls")}
+
+
+class ProfiledDispatcher:
+    """A dispatcher that records how long the requests made to another
+    dispatcher take.
+
+    Every attribute other than the timed methods is looked up on the
+    wrapped dispatcher, so a ProfiledDispatcher can be used wherever the
+    wrapped dispatcher is.
+    """
+
+    # === Private Attributes ===
+    _dispatcher: Dispatcher
+    #     The dispatcher that fulfills the requests.
+    _profile: SimulationProfile
+    #     The profile in which the requests are recorded.
+
+    def __init__(self, dispatcher: Dispatcher,
+                 profile: SimulationProfile) -> None:
+        """Initialize a ProfiledDispatcher that wraps <dispatcher>.
+
+        """
+        self._dispatcher = dispatcher
+        self._profile = profile
+
+    def __getattr__(self, name: str) -> object:
+        """Return the attribute <name> of the wrapped dispatcher.
+
+        """
+        if name == "_dispatcher":
+            # Not set yet, e.g. while unpickling.
+            raise AttributeError(name)
+        return getattr(self._dispatcher, name)
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        return str(self._dispatcher)
+
+    def request_driver(self, rider: Rider) -> Optional[Driver]:
+        """Return a driver for the rider, or None if no driver is available.
+
+        """
+        start = time.perf_counter()
+        driver = self._dispatcher.request_driver(rider)
+        self._profile.record_call("request_driver",
+                                  time.perf_counter() - start)
+        return driver
+
+    def request_rider(self, driver: Driver) -> Optional[Rider]:
+        """Return a rider for the driver, or None if no rider is available.
+
+        """
+        start = time.perf_counter()
+        rider = self._dispatcher.request_rider(driver)
+        self._profile.record_call("request_rider",
+                                  time.perf_counter() - start)
+        return rider
+
+    def cancel_ride(self, rider: Rider) -> None:
+        """Cancel the ride for rider.
+
+        """
+        start = time.perf_counter()
+        self._dispatcher.cancel_ride(rider)
+        self._profile.record_call("cancel_ride", time.perf_counter() - start)
+
+
+def _add(totals: Dict[str, List[float]], name: str, seconds: float) -> None:
+    """Add one occurrence taking <seconds> to the totals for <name>.
+
+    """
+    total = totals.get(name)
+    if total is None:
+        totals[name] = [1, seconds]
+    else:
+        total[0] += 1
+        total[1] += seconds
+
+
+def _summarize(totals: Dict[str, List[float]],
+               count_name: str) -> Dict[str, Dict[str, float]]:
+    """Return the count, total seconds and mean seconds for each name in
+    <totals>, with the count under the key <count_name>.
+
+    """
+    return {name: {count_name: count, "seconds": seconds,
+                   "mean_seconds": seconds / count}
+            for name, (count, seconds) in totals.items()}
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['time', 'typing', 'dispatcher', 'driver',
+                                  'rider']})
@@ -0,0 +1,412 @@
+"""Run a simulation in real time from a live stream of requests
+
+A RealtimeRunner reads DriverRequest and RiderRequest lines, in the format
+of an event file, from an asyncio stream such as a socket or a pipe, and
+adds them to a Simulation as they arrive. Simulated time advances with a
+clock: one time unit per second of wall-clock time, <speedup> time units per
+second, or, without a speedup, as fast as the timestamps of the incoming
+lines allow: the events at a time are only done once a line with a later
+timestamp, or the end of the stream, shows that every line at that time has
+been read. The report is then that of Simulation.run on the same lines.
+
+The lines should arrive in order of their timestamps. A line that arrives
+after the simulation has passed its timestamp, or before that of the line
+read before it, is late: its event is done at the simulated time, or at the
+timestamp of that line, instead.
+
+At most max_pending lines are held between the stream and the simulation,
+and at most max_pending more are held by the simulation before their time.
+The simulation takes no more lines while it holds that many, or while the
+last line it took is still in the future; the lines then wait between the
+stream and the simulation, and once max_pending are waiting the runner stops
+reading the stream until the simulation catches up, so a sender that is too
+fast is slowed down by the socket or pipe instead of filling the memory.
+Without a speedup, the lines that share the latest timestamp are held until
+a later line is read, however many there are.
+
+A line that is not a valid request is skipped and counted as malformed. If
+reading the stream fails, the run fails with the same error.
+
+Every metrics_interval seconds the runner publishes the monitor's report,
+with the simulated time, the number of lines read, the number waiting, the
+number that arrived after their time had passed, and the rate at which
+lines were read since the last publication.
+
+Run this module to replay the lines written to its standard input, or sent
+to a TCP port, and print the metrics as JSON lines, e.g.
+
+    python realtime.py --speedup 60 < events.txt
+    python realtime.py --port 9000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+from dispatcher import Dispatcher
+from event import ENCODING, Event, event_from_line
+from monitor import IncrementalMonitor
+from simulation import Simulation
+
+
+class RealtimeRunner:
+    """A runner of a Simulation fed by a live stream of requests.
+
+    === Attributes ===
+    speedup: The number of simulated time units per second of wall-clock
+        time, or None to advance simulated time as fast as the stream allows.
+    max_pending: The largest number of lines read from the stream but not
+        yet added to the simulation, and the largest number added to the
+        simulation but not yet done.
+    metrics_interval: The number of seconds between publications of the
+        metrics.
+    ingested: The number of events read from the stream.
+    late: The number of events that arrived after the simulation had
+        passed their timestamp, or out of order, and were done late.
+    malformed: The number of lines read from the stream that were skipped
+        because they were not valid requests.
+    """
+
+    speedup: Optional[float]
+    max_pending: int
+    metrics_interval: float
+    ingested: int
+    late: int
+    malformed: int
+
+    # === Private Attributes ===
+    _simulation: Simulation
+    #     The simulation.
+    _monitor: IncrementalMonitor
+    #     The monitor of the simulation.
+    _publish: Optional[Callable[[Dict[str, object]], None]]
+    #     The function the metrics are published to, or None.
+    _horizon: Optional[int]
+    #     The events with timestamps before the horizon may be done, or all
+    #     events if it is None.
+    _start: Optional[float]
+    #     The wall-clock time at which the first event arrived, from
+    #     time.monotonic, or None before then.
+    _start_timestamp: int
+    #     The timestamp of the first event.
+    _latest: int
+    #     The timestamp of the latest event read.
+    _last_metrics: float
+    #     The wall-clock time of the last publication of the metrics.
+    _last_ingested: int
+    #     The number of events read at the last publication of the metrics.
+    _initial: Deque[Event]
+    #     The events read and added to the simulation but not yet done, in
+    #     order of their timestamps.
+    _incoming: Optional[asyncio.Queue]
+    #     The events read but not yet added to the simulation, or None if
+    #     the runner is not running.
+
+    def __init__(self, dispatcher: Optional[Dispatcher] = None,
+                 monitor: Optional[IncrementalMonitor] = None,
+                 speedup: Optional[float] = 1.0, max_pending: int = 1024,
+                 metrics_interval: float = 1.0,
+                 publish: Optional[Callable[[Dict[str, object]], None]]
+                 = None) -> None:
+        """Initialize a RealtimeRunner.
+
+        dispatcher: The dispatcher of the simulation, or None for a new
+            Dispatcher.
+        monitor: The monitor of the simulation, or None for a new
+            IncrementalMonitor that does not retain its activities.
+        speedup: The number of simulated time units per second, or None to
+            advance as fast as the stream allows.
+        max_pending: The largest number of lines waiting to be added to the
+            simulation before the stream is no longer read.
+        metrics_interval: The number of seconds between publications of the
+            metrics.
+        publish: The function the metrics are published to, or None.
+        """
+        if speedup is not None and speedup <= 0:
+            raise ValueError("the speedup must be positive")
+        if monitor is None:
+            monitor = IncrementalMonitor(retain=False)
+        self.speedup = speedup
+        self.max_pending = max_pending
+        self.metrics_interval = metrics_interval
+        self.ingested = 0
+        self.late = 0
+        self.malformed = 0
+        self._simulation = Simulation(dispatcher, monitor)
+        self._monitor = monitor
+        self._publish = publish
+        self._horizon = None
+        self._start = None
+        self._start_timestamp = 0
+        self._latest = 0
+        self._last_metrics = time.monotonic()
+        self._last_ingested = 0
+        self._initial = deque()
+        self._incoming = None
+
+    async def run(self, reader: asyncio.StreamReader) -> Dict[str, float]:
+        """Run the simulation on the lines read from <reader> until the end
+        of the stream, and until every event has been done.
+
+        Return the report of the monitor.
+        """
+        self._incoming = asyncio.Queue(self.max_pending)
+        reading = asyncio.ensure_future(self._read(reader, self._incoming))
+        try:
+            await self._simulate(self._incoming, reading)
+        finally:
+            reading.cancel()
+        self.publish_metrics()
+        self._incoming = None
+        return self._monitor.report()
+
+    def metrics(self) -> Dict[str, object]:
+        """Return the report of the monitor so far, with the simulated time,
+        the counts of the events read, waiting and late, and the rate at
+        which events were read since the metrics were last published.
+
+        """
+        now = time.monotonic()
+        elapsed = now - self._last_metrics
+        metrics = dict(self._monitor.report())
+        metrics["simulated_time"] = self._simulated_time()
+        metrics["ingested"] = self.ingested
+        metrics["pending"] = 0 if self._incoming is None \
+            else self._incoming.qsize()
+        metrics["late"] = self.late
+        metrics["malformed"] = self.malformed
+        metrics["ingest_rate"] = (self.ingested - self._last_ingested) \
+            / elapsed if elapsed > 0 else 0.0
+        return metrics
+
+    def publish_metrics(self) -> None:
+        """Publish the metrics, if there is a function to publish them to,
+        and start a new interval of the ingest rate.
+
+        """
+        if self._publish is not None:
+            self._publish(self.metrics())
+        self._last_metrics = time.monotonic()
+        self._last_ingested = self.ingested
+
+    async def _read(self, reader: asyncio.StreamReader,
+                    incoming: asyncio.Queue) -> None:
+        """Put the events of the lines read from <reader> on <incoming>,
+        followed by None at the end of the stream.
+
+        Reading waits while <incoming> is full. A line that is not a valid
+        request is counted in malformed and skipped.
+        """
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                event = event_from_line(line.decode(ENCODING))
+            except (ValueError, IndexError):
+                self.malformed += 1
+                continue
+            if event is not None:
+                await incoming.put(event)
+        await incoming.put(None)
+
+    async def _simulate(self, incoming: asyncio.Queue,
+                        reading: asyncio.Future) -> None:
+        """Add the events on <incoming> to the simulation, and do the events
+        of the simulation as simulated time passes, until None is taken
+        from <incoming> and no events are left.
+
+        If <reading>, the task that puts the events on <incoming>, fails
+        before then, raise its error.
+        """
+        ended = False
+        while True:
+            if self.speedup is not None and self._start is not None:
+                self._horizon = math.floor(self._simulated_time()) + 1
+            next_time = self._simulation.run_stream_until(self._initial,
+                                                          self._horizon)
+            if time.monotonic() - self._last_metrics >= self.metrics_interval:
+                self.publish_metrics()
+
+            if ended:
+                if next_time is None:
+                    return
+                # Wait for the next event of the simulation.
+                await asyncio.sleep(self._delay(next_time))
+                continue
+
+            timeout = None
+            if self.speedup is not None and next_time is not None:
+                timeout = self._delay(next_time)
+            timeout = _shortest(timeout, self.metrics_interval)
+            if not self._wants_events():
+                # Leave the events on <incoming>, so that reading waits
+                # once it is full.
+                await asyncio.sleep(timeout)
+                continue
+            event = await _get(incoming, reading, timeout)
+            if event is _TIMEOUT:
+                continue
+
+            # Take the events that have already arrived, while they can be
+            # held.
+            while True:
+                if event is None:
+                    ended = True
+                    if self.speedup is None:
+                        self._horizon = None
+                    break
+                self._ingest(event)
+                if incoming.empty() or not self._wants_events():
+                    break
+                event = incoming.get_nowait()
+
+    def _wants_events(self) -> bool:
+        """Return whether the simulation can take more events.
+
+        It cannot while it holds max_pending events that are not done, or
+        while the last event it took is not yet due. Without a speedup, the
+        events it holds can only be done once a later event is read, so it
+        can always take one more.
+        """
+        if self.speedup is None or self._start is None:
+            return True
+        if len(self._initial) >= self.max_pending:
+            return False
+        return not self._initial or self._initial[-1].timestamp \
+            <= math.floor(self._simulated_time())
+
+    def _ingest(self, event: Event) -> None:
+        """Count the new <event> and add it to the initial events, starting
+        the clock if it is the first.
+
+        A late event is moved to the current simulated time, or to the time
+        of the event read before it, whichever is later, since the events
+        before then may have been done.
+        """
+        if self._start is None:
+            self._start = time.monotonic()
+            self._start_timestamp = event.timestamp
+            self._latest = event.timestamp
+        self.ingested += 1
+        earliest = max(math.floor(self._simulated_time()), self._latest)
+        if event.timestamp < earliest:
+            self.late += 1
+            event.timestamp = earliest
+        self._latest = event.timestamp
+        self._initial.append(event)
+        if self.speedup is None:
+            # Later lines have the same or later timestamps, so the events
+            # before this one can be done.
+            self._horizon = event.timestamp
+
+    def _simulated_time(self) -> float:
+        """Return the current simulated time.
+
+        """
+        if self._start is None:
+            return 0.0
+        if self.speedup is None:
+            return float(self._latest)
+        return self._start_timestamp \
+            + (time.monotonic() - self._start) * self.speedup
+
+    def _delay(self, timestamp: int) -> float:
+        """Return the number of seconds until simulated time reaches
+        <timestamp>.
+
+        """
+        if self.speedup is None:
+            return 0.0
+        return max(0.0, (timestamp - self._simulated_time()) / self.speedup)
+
+
+# Returned by _get when no event arrives in time.
+_TIMEOUT = object()
+
+
+async def _get(incoming: asyncio.Queue, reading: asyncio.Future,
+               timeout: float) -> object:
+    """Return the next item taken from <incoming>, or _TIMEOUT if none is
+    taken within <timeout> seconds.
+
+    Raise the error of <reading>, the task that puts the items on
+    <incoming>, if it fails first.
+    """
+    getter = asyncio.ensure_future(incoming.get())
+    await asyncio.wait({getter, reading}, timeout=timeout,
+                       return_when=asyncio.FIRST_COMPLETED)
+    if getter.done():
+        return getter.result()
+    getter.cancel()
+    if reading.done():
+        # Raises the error of reading, if it failed.
+        reading.result()
+    return _TIMEOUT
+
+
+def _shortest(timeout: Optional[float], interval: float) -> float:
+    """Return the shorter of <timeout>, which is None if there is no
+    timeout, and <interval>.
+
+    """
+    if timeout is None:
+        return interval
+    return min(timeout, interval)
+
+
+async def _replay(args: argparse.Namespace) -> None:
+    """Replay the lines of standard input, or of the first connection to
+    the port in <args>, printing the metrics as they are published.
+
+    """
+    runner = RealtimeRunner(
+        speedup=args.speedup, max_pending=args.max_pending,
+        metrics_interval=args.interval,
+        publish=lambda metrics: print(json.dumps(metrics), flush=True))
+
+    if args.port is None:
+        reader = asyncio.StreamReader()
+        await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        await runner.run(reader)
+        return
+
+    done = asyncio.get_running_loop().create_future()
+
+    async def handle(reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        # Only the first connection that finishes ends the replay; the
+        # connection is closed whether or not its run failed.
+        try:
+            await runner.run(reader)
+        except Exception as exc:
+            if not done.done():
+                done.set_exception(exc)
+        else:
+            if not done.done():
+                done.set_result(None)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, args.host, args.port)
+    async with server:
+        await done
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--speedup", type=float,
+                        help="simulated time units per second, or as fast "
+                             "as possible if omitted")
+    parser.add_argument("--max-pending", type=int, default=1024)
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between published metrics")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int,
+                        help="the TCP port to read from, instead of stdin")
+    asyncio.run(_replay(parser.parse_args()))
@@ -20,6 +20,8 @@ class Rider:
     """A rider for a ride-sharing service.
 
     """
+    __slots__ = ('id', 'patience', 'origin', 'destination', 'status')
+
     id: str
     patience: int
     origin: Location
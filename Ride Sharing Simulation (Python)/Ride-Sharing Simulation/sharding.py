@@ -0,0 +1,403 @@
+"""Run a simulation in zones, in parallel
+
+The grid is split into zones: strips of rows of about the same height. Each
+zone has its own Simulation, with its own dispatcher and monitor, in its own
+process. A rider is in the zone of their origin, and a driver is in the zone
+of their location when they request a rider, so riders are only assigned to
+drivers in the same zone.
+
+The zones advance together in windows of time. During a window each zone
+does its events independently. A driver who is dropped off in another zone
+is handed off at the end of the window: the driver requests a rider in the
+new zone at the start of the next window, and the driver's monitor state
+moves with them. Riders never cross zones, since they are picked up in the
+zone of their origin.
+
+At the end of the run the monitors of the zones are merged into one report.
+If percentiles are kept, the histograms of the zones are merged as well.
+
+A sharded run approximates a Simulation of the whole grid; it does not
+reproduce it. A rider is never matched with a driver in another zone, even
+one who is closer or the only one idle, and a driver who crosses into
+another zone is idle until the end of the window. So the report depends on
+the number of zones and the window length, not only on the events. It is
+the report of a Simulation with a spatial.GridIndex when there is a single
+zone, or when the zones are independent: no rider waits while a driver in
+another zone is idle, and no driver is dropped off in another zone. Longer
+windows need fewer rounds of handoffs, but hold the drivers who cross zones
+for longer.
+"""
+
+import multiprocessing
+from typing import Callable, Dict, List, Optional, Tuple
+from batch import read_records
+from dispatcher import Dispatcher
+from driver import Driver
+from event import Event, Pickup, event_from_record
+from location import Location
+from monitor import IncrementalMonitor
+from rider import Rider
+from simulation import Simulation
+from spatial import GridIndex
+
+
+class ZonePartition:
+    """A partition of the grid into strips of rows.
+
+    Rows below the first strip are in the first zone, and rows above the
+    last strip are in the last zone.
+
+    === Attributes ===
+    low: The first row of the first zone.
+    high: The last row of the last zone.
+    zones: The number of zones.
+    """
+
+    low: int
+    high: int
+    zones: int
+
+    def __init__(self, low: int, high: int, zones: int) -> None:
+        """Initialize a ZonePartition of the rows from <low> to <high> into
+        <zones> zones.
+
+        Precondition: low <= high and zones > 0
+        """
+        self.low = low
+        self.high = high
+        self.zones = zones
+
+    def __str__(self) -> str:
+        """Return a string representation.
+
+        """
+        return f"{self.zones} zones of rows {self.low} to {self.high}"
+
+    def zone_of(self, location: Location) -> int:
+        """Return the zone of <location>.
+
+        >>> partition = ZonePartition(0, 9, 2)
+        >>> partition.zone_of(Location(4, 7))
+        0
+        >>> partition.zone_of(Location(5, 0))
+        1
+        >>> partition.zone_of(Location(99, 0))
+        1
+        """
+        zone = (location.row - self.low) * self.zones \
+            // (self.high - self.low + 1)
+        return min(self.zones - 1, max(0, zone))
+
+
+def partition_records(records: List[tuple], zones: int) -> ZonePartition:
+    """Return a partition into <zones> zones of the rows of the locations
+    in <records>, as returned by event.parse_record.
+
+    Precondition: records is not empty, and zones > 0
+    """
+    rows = []
+    for record in records:
+        rows.append(record[3])
+        if record[1] == "RiderRequest":
+            rows.append(record[5])
+    return ZonePartition(min(rows), max(rows), zones)
+
+
+class ZoneDispatcher(Dispatcher):
+    """A dispatcher for the riders and drivers of one zone.
+
+    A driver who requests a rider from outside the zone is not registered,
+    but kept to be handed off to the zone they are in.
+
+    === Attributes ===
+    partition: The partition of the grid into zones.
+    zone: The zone of this dispatcher.
+    handoffs: The drivers who requested a rider from outside the zone and
+        have not been handed off yet.
+    """
+
+    partition: ZonePartition
+    zone: int
+    handoffs: List[Driver]
+
+    def __init__(self, partition: ZonePartition, zone: int) -> None:
+        """Initialize a ZoneDispatcher for <zone> of <partition>.
+
+        """
+        Dispatcher.__init__(self, GridIndex())
+        self.partition = partition
+        self.zone = zone
+        self.handoffs = []
+
+    def request_rider(self, driver: Driver) -> Optional[Rider]:
+        """Return a rider for the driver, or None if no rider is available.
+
+        If the driver is outside the zone, keep them to be handed off and
+        return None.
+        """
+        if self.partition.zone_of(driver.location) != self.zone:
+            self.handoffs.append(driver)
+            return None
+        return Dispatcher.request_rider(self, driver)
+
+
+class Handoff(Event):
+    """A driver who was handed off from another zone requests a rider.
+
+    The monitor was notified of the request in the zone the driver left, so
+    it is not notified again.
+
+    === Attributes ===
+    driver: The driver.
+    """
+    __slots__ = ('driver',)
+
+    driver: Driver
+
+    def __init__(self, timestamp: int, driver: Driver) -> None:
+        """Initialize a Handoff event.
+
+        """
+        super().__init__(timestamp)
+        self.driver = driver
+
+    def __str__(self) -> str:
+        """Return a string representation of this event.
+
+        """
+        return "{} -- {}: Handed off".format(self.timestamp, self.driver)
+
+    def do(self, dispatcher: Dispatcher,
+           monitor: IncrementalMonitor) -> List[Event]:
+        """Assign a rider to the driver, if one is available, and return a
+        Pickup event if so.
+
+        """
+        rider = dispatcher.request_rider(self.driver)
+        if rider is None:
+            return []
+        travel_time = self.driver.start_drive(rider.origin)
+        return [Pickup(self.timestamp + travel_time, rider, self.driver)]
+
+
+class _Zone:
+    """The simulation of one zone.
+
+    === Attributes ===
+    monitor: The monitor of the zone.
+    """
+
+    monitor: IncrementalMonitor
+
+    # === Private Attributes ===
+    _dispatcher: ZoneDispatcher
+    #     The dispatcher of the zone.
+    _simulation: Simulation
+    #     The simulation of the zone.
+    _initial: List[Event]
+    #     The initial events, until they are added to the simulation.
+
+    def __init__(self, partition: ZonePartition, zone: int,
+                 records: List[tuple], percentiles: bool = False) -> None:
+        """Initialize the simulation of <zone> of <partition>, with the
+        initial events of the <records> in the zone, keeping percentiles in
+        its monitor iff <percentiles> is True.
+
+        """
+        self.monitor = IncrementalMonitor(retain=False,
+                                          percentiles=percentiles)
+        self._dispatcher = ZoneDispatcher(partition, zone)
+        self._simulation = Simulation(self._dispatcher, self.monitor)
+        self._initial = [event_from_record(record) for record in records]
+
+    def step(self, until: int,
+             arrivals: List[Tuple[int, Driver, list]]
+             ) -> Tuple[List[Tuple[Driver, list]], Optional[int]]:
+        """Add the drivers handed off to this zone, given as the time,
+        driver and monitor state of each, and do the events before <until>.
+
+        Return the drivers to hand off to other zones, with their monitor
+        state, and the timestamp of the next event of this zone, or None if
+        there are none.
+        """
+        events = self._initial
+        self._initial = []
+        for timestamp, driver, state in arrivals:
+            self.monitor.add_driver(driver.id, state)
+            events.append(Handoff(timestamp, driver))
+
+        next_time = self._simulation.run_until(events, until)
+
+        departures = [(driver, self.monitor.pop_driver(driver.id))
+                      for driver in self._dispatcher.handoffs]
+        self._dispatcher.handoffs = []
+        return departures, next_time
+
+
+def _serve(connection: object, partition: ZonePartition, zone: int,
+           records: List[tuple], percentiles: bool) -> None:
+    """Run the simulation of <zone> of <partition> in a worker process,
+    doing each step received on <connection> and sending back its result,
+    and sending the monitor once None is received.
+
+    """
+    simulation = _Zone(partition, zone, records, percentiles)
+    message = connection.recv()
+    while message is not None:
+        connection.send(simulation.step(*message))
+        message = connection.recv()
+    connection.send(simulation.monitor)
+    connection.close()
+
+
+def run_sharded(filename: str, zones: int, window: int,
+                parallel: bool = True,
+                percentiles: bool = False) -> Dict[str, float]:
+    """Return the report of a simulation of the events in <filename> split
+    into <zones> zones, which are synchronized every <window> time units.
+
+    Each zone is run in its own process if <parallel> is True, or all of
+    them in this process otherwise; the report is the same either way. It
+    is only the report of a Simulation of the whole grid if no rider or
+    driver would have been matched, or driven, across zones. The report
+    has the percentiles of the wait times iff <percentiles> is True.
+
+    Precondition: zones > 0 and window > 0
+    """
+    return sharded_monitor(filename, zones, window, parallel,
+                           percentiles).report()
+
+
+def sharded_monitor(filename: str, zones: int, window: int,
+                    parallel: bool = True,
+                    percentiles: bool = False) -> IncrementalMonitor:
+    """Return the merged monitor of the zones of a simulation run as by
+    run_sharded, e.g. to get its histograms.
+
+    Precondition: zones > 0 and window > 0
+    """
+    records = read_records(filename)
+    if not records:
+        return IncrementalMonitor(retain=False, percentiles=percentiles)
+
+    partition = partition_records(records, zones)
+    zone_records = [[] for _ in range(zones)]
+    for record in records:
+        zone = partition.zone_of(Location(record[3], record[4]))
+        zone_records[zone].append(record)
+
+    if parallel:
+        monitors = _run_processes(partition, zone_records, window,
+                                  percentiles)
+    else:
+        simulations = [_Zone(partition, zone, zone_records[zone],
+                             percentiles)
+                       for zone in range(zones)]
+        _synchronize(partition, zone_records, window,
+                     lambda steps: [simulations[zone].step(until, arrivals)
+                                    for zone, until, arrivals in steps])
+        monitors = [simulation.monitor for simulation in simulations]
+
+    monitor = IncrementalMonitor(retain=False, percentiles=percentiles)
+    for zone_monitor in monitors:
+        monitor.merge(zone_monitor)
+    return monitor
+
+
+def _run_processes(partition: ZonePartition, zone_records: List[List[tuple]],
+                   window: int, percentiles: bool
+                   ) -> List[IncrementalMonitor]:
+    """Run the simulation of each zone of <partition>, with the initial
+    events of its <zone_records>, in its own process, synchronized every
+    <window> time units, and return the monitors of the zones, which keep
+    percentiles iff <percentiles> is True.
+
+    The processes are always joined before returning, and are terminated
+    first if anything goes wrong.
+    """
+    connections = []
+    processes = []
+    try:
+        for zone, records in enumerate(zone_records):
+            connection, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve, daemon=True,
+                args=(child, partition, zone, records, percentiles))
+            process.start()
+            # Only the process uses its end, so that recv raises EOFError
+            # if the process dies.
+            child.close()
+            connections.append(connection)
+            processes.append(process)
+
+        def take_steps(steps: List[Tuple[int, int, list]]) -> list:
+            for zone, until, arrivals in steps:
+                connections[zone].send((until, arrivals))
+            return [connections[zone].recv() for zone, _, _ in steps]
+
+        _synchronize(partition, zone_records, window, take_steps)
+        monitors = []
+        for connection in connections:
+            connection.send(None)
+            monitors.append(connection.recv())
+        return monitors
+    except BaseException:
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for connection in connections:
+            connection.close()
+        for process in processes:
+            process.join()
+
+
+def _synchronize(partition: ZonePartition, zone_records: List[List[tuple]],
+                 window: int,
+                 take_steps: Callable[[List[Tuple[int, int, list]]], list]
+                 ) -> None:
+    """Advance the zones of <partition>, whose initial events are the
+    <zone_records>, in windows of <window> time units until every zone has
+    done all of its events.
+
+    <take_steps> is given the zone, end of the window and arriving drivers
+    of each zone that takes a step, and returns the result of _Zone.step
+    for each of them.
+    """
+    zones = partition.zones
+    next_times = [min((record[0] for record in zone_records[zone]),
+                      default=None) for zone in range(zones)]
+    arrivals = [[] for _ in range(zones)]
+    start = min(time for time in next_times if time is not None)
+    until = (start // window + 1) * window
+    while True:
+        # Only the zones with something to do before <until> take a step.
+        active = [zone for zone in range(zones) if arrivals[zone] or (
+            next_times[zone] is not None and next_times[zone] < until)]
+        if not active:
+            break
+        results = take_steps([(zone, until, arrivals[zone])
+                              for zone in active])
+
+        arrivals = [[] for _ in range(zones)]
+        for zone, (departures, next_time) in zip(active, results):
+            next_times[zone] = next_time
+            for driver, state in departures:
+                arrivals[partition.zone_of(driver.location)].append(
+                    (until, driver, state))
+
+        pending = [time for time in next_times if time is not None]
+        if any(arrivals):
+            pending.append(until)
+        if not pending:
+            break
+        until = (min(pending) // window + 1) * window
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['multiprocessing', 'typing', 'batch',
+                                  'dispatcher', 'driver', 'event', 'location',
+                                  'monitor', 'rider', 'simulation',
+                                  'spatial']})
@@ -1,10 +1,25 @@
 """Starting point for simulation"""
 
-from typing import List, Dict
-from container import PriorityQueue
+import os
+import pickle
+import time
+import zlib
+from typing import Deque, Iterable, List, Dict, Optional
+from container import (Container, BucketQueue, HeapPriorityQueue,
+                       PriorityQueue)
 from dispatcher import Dispatcher
-from event import Event, create_event_list
+from event import Cancellation, Event, Pickup, create_event_list
 from monitor import Monitor
+from profiler import ProfiledDispatcher, SimulationProfile
+from rider import Rider
+
+# The kinds of event queue a Simulation can use, keyed by name.
+QUEUES = {"list": PriorityQueue,
+          "heap": HeapPriorityQueue,
+          "bucket": BucketQueue}
+# The smallest number of invalidated events that are dropped from the queue
+# at once, before they are reached.
+MIN_COMPACTION = 64
 
 
 class Simulation:
@@ -13,34 +28,156 @@ class Simulation:
     This is the class that is responsible for setting up and running a
     simulation.
 
-    The API is given to you: your main task is to implement the run
-    method below according to its docstring.
-
-    Of course, you may add whatever private attributes and methods you want.
-    But because you should not change the interface, you may not add any public
-    attributes or methods.
-
-    This is the entry point into your program, and in particular is used for
-    auto-testing purposes. This makes it ESSENTIAL that you do not change the
-    interface in any way!
+    run is the entry point into the program, and in particular is used for
+    auto-testing purposes, so its interface must not change. The other
+    public methods build on it:
+    - run_stream takes the initial events one at a time instead of as a list
+    - run_until and run_stream_until stop at a given time, so that a run can
+      be split into windows of time
+    - save_checkpoint and resume save the state of a run and pick it up
+      again
+    - logs_activities and reopen_activity_log move the activity log of a
+      copied run to a new file
+    - profile_summary reports where a profiled run spent its time, and
+      elided_events how many invalidated events any run skipped
     """
 
     # === Private Attributes ===
-    _events: PriorityQueue
+    _events: Container
     #     A sequence of events arranged in priority determined by the event
     #     sorting order.
     _dispatcher: Dispatcher
     #     The dispatcher associated with the simulation.
     _monitor: Monitor
     #     The monitor associated with the simulation.
+    _profile: Optional[SimulationProfile]
+    #     The profile of the simulation, or None if it is not profiled.
+    _elided: int
+    #     The number of invalidated events that were skipped.
+    _cancellations: Dict[Rider, Event]
+    #     The queued Cancellation of each rider who has neither been picked
+    #     up nor cancelled yet.
+    _dead: int
+    #     The number of invalidated events in the queue.
+    _checkpoint: Optional[str]
+    #     The file the state of the simulation is saved to while it runs, or
+    #     None if it is not saved.
+    _checkpoint_events: Optional[int]
+    #     The number of events between saves, or None.
+    _checkpoint_seconds: Optional[float]
+    #     The number of seconds between saves, or None.
+    _since_checkpoint: int
+    #     The number of events done since the last save.
+    _checkpoint_time: float
+    #     The time of the last save, from time.perf_counter.
+    _stream_position: int
+    #     The number of initial events that run_stream has taken.
 
-    def __init__(self) -> None:
+    def __init__(self, dispatcher: Optional[Dispatcher] = None,
+                 monitor: Optional[Monitor] = None,
+                 profile: bool = False, queue: str = "heap",
+                 checkpoint: Optional[str] = None,
+                 checkpoint_events: Optional[int] = None,
+                 checkpoint_seconds: Optional[float] = None) -> None:
         """Initialize a Simulation.
 
+        dispatcher: The dispatcher to use, e.g. one with a spatial index of
+            the waiting drivers. A new Dispatcher is used if None.
+        monitor: The monitor to use, e.g. a columnar.ColumnarMonitor. A new
+            Monitor is used if None.
+        profile: True iff the events and dispatcher calls should be counted
+            and timed, for profile_summary.
+        queue: The name of the kind of event queue to use, from QUEUES.
+            Every kind does the events in the same order.
+        checkpoint: The file to save the state of the simulation to while
+            it runs, so that it can be resumed, or None to never save it.
+        checkpoint_events: Save the state after every <checkpoint_events>
+            events, if not None.
+        checkpoint_seconds: Save the state once at least
+            <checkpoint_seconds> seconds have passed since the last save, if
+            not None.
+        """
+        if queue not in QUEUES:
+            raise ValueError(f"unknown queue {queue!r}, expected one of "
+                             f"{sorted(QUEUES)}")
+        if checkpoint is not None and checkpoint_events is None \
+                and checkpoint_seconds is None:
+            raise ValueError("a checkpoint needs checkpoint_events or "
+                             "checkpoint_seconds")
+        self._events = QUEUES[queue]()
+        if dispatcher is None:
+            dispatcher = Dispatcher()
+        if monitor is None:
+            monitor = Monitor()
+        self._monitor = monitor
+        self._profile = None
+        self._elided = 0
+        self._cancellations = {}
+        self._dead = 0
+        if profile:
+            self._profile = SimulationProfile()
+            dispatcher = ProfiledDispatcher(dispatcher, self._profile)
+        self._dispatcher = dispatcher
+        self._checkpoint = checkpoint
+        self._checkpoint_events = checkpoint_events
+        self._checkpoint_seconds = checkpoint_seconds
+        self._since_checkpoint = 0
+        self._checkpoint_time = time.perf_counter()
+        self._stream_position = 0
+
+    @classmethod
+    def resume(cls, filename: str,
+               activity_log: Optional[str] = None) -> 'Simulation':
+        """Return the Simulation whose state was saved to <filename>.
+
+        To finish the run, call run([]) on the result if the state was
+        saved by run, or call run_stream with the same initial events if it
+        was saved by run_stream; the initial events that were already taken
+        are skipped. Either way, the report is the same as if the run had
+        not been interrupted.
+
+        If the monitor writes its activities to a sink, such as an
+        activitylog.CSVActivitySink, the resumed simulation writes them to
+        the new log <activity_log>, which starts with the activities logged
+        before the state was saved. The sink cannot write until then.
+        """
+        with open(filename, "rb") as file:
+            simulation = pickle.loads(zlib.decompress(file.read()))
+        simulation._checkpoint_time = time.perf_counter()
+        if activity_log is not None:
+            simulation.reopen_activity_log(activity_log)
+        return simulation
+
+    def logs_activities(self) -> bool:
+        """Return True iff the monitor writes its activities to a sink.
+
+        """
+        return self._monitor.has_sink()
+
+    def reopen_activity_log(self, filename: str) -> None:
+        """Write the activities of the monitor to the new log <filename> from
+        now on, which starts with the activities logged so far, leaving the
+        current log alone.
+
+        Raise ValueError if the monitor has no sink.
+        """
+        self._monitor.reopen_sink(filename)
+
+    def save_checkpoint(self, filename: str) -> None:
+        """Save the state of this simulation to <filename>, replacing the
+        file only once the new state has been written in full and flushed to
+        the disk, so that a crash leaves either the old or the new state.
+
         """
-        self._events = PriorityQueue()
-        self._dispatcher = Dispatcher()
-        self._monitor = Monitor()
+        data = zlib.compress(pickle.dumps(self, pickle.HIGHEST_PROTOCOL))
+        temporary = filename + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, filename)
+        self._since_checkpoint = 0
+        self._checkpoint_time = time.perf_counter()
 
     def run(self, initial_events: List[Event]) -> Dict[str, float]:
         """Run the simulation on the list of events in <initial_events>.
@@ -50,16 +187,194 @@ class Simulation:
 
         initial_events: An initial list of events.
         """
-        for event in initial_events:
-            self._events.add(event)
+        self.run_until(initial_events)
+        return self._monitor.report()
+
+    def run_until(self, events: Iterable[Event],
+                  until: Optional[int] = None) -> Optional[int]:
+        """Add <events> to the queue, and do the queued events whose
+        timestamps are before <until>, or all of them if <until> is None.
+
+        Return the timestamp of the next event left in the queue, or None if
+        the queue is empty. The events left in the queue are done by a later
+        call, so a run can be split into windows of time.
+        """
+        for event in events:
+            self._add(event)
+
+        while self._peek() is not None:
+            if until is not None and self._events.peek().timestamp >= until:
+                return self._events.peek().timestamp
+            self._do(self._events.remove())
+            if self._checkpoint is not None:
+                self._check_checkpoint()
+        return None
+
+    def run_stream_until(self, initial_events: Deque[Event],
+                         until: Optional[int] = None) -> Optional[int]:
+        """Do the events of <initial_events> and of the queue whose
+        timestamps are before <until>, or all of them if <until> is None,
+        removing the initial events from <initial_events> as they are done.
+
+        As in run_stream, an initial event goes before queued events with
+        the same timestamp, so the initial events can be appended to
+        <initial_events> between calls as they become known.
+
+        Return the timestamp of the next event left, initial or queued, or
+        None if there are none.
+
+        Precondition: <initial_events> is sorted by timestamp.
+        """
+        while initial_events or self._peek() is not None:
+            head = self._peek()
+            if initial_events and (head is None
+                                   or not head < initial_events[0]):
+                this_event = initial_events[0]
+            else:
+                this_event = head
+            if until is not None and this_event.timestamp >= until:
+                return this_event.timestamp
+            if this_event is head:
+                self._events.remove()
+            else:
+                initial_events.popleft()
+            self._do(this_event)
+            if self._checkpoint is not None:
+                self._check_checkpoint()
+        return None
+
+    def run_stream(self, initial_events: Iterable[Event]) -> Dict[str, float]:
+        """Run the simulation on the events in <initial_events>, taking each
+        initial event only once the simulation reaches its timestamp.
+
+        Return the same dictionary of statistics as run. Only the events
+        that are in progress are held in the queue, so <initial_events> can
+        be a generator such as event.iter_events.
 
+        Precondition: <initial_events> is sorted by timestamp, and this
+        simulation has not run before, unless it was resumed.
+
+        initial_events: An initial sequence of events.
+        """
+        pending = iter(initial_events)
+        # Skip the initial events taken before the state was resumed.
+        for _ in range(self._stream_position):
+            next(pending, None)
+        next_event = next(pending, None)
+
+        while next_event is not None or self._peek() is not None:
+            # An initial event goes before queued events with the same
+            # timestamp, just as it would if it had been queued first.
+            head = self._peek()
+            if next_event is not None and (
+                    head is None or not head < next_event):
+                this_event = next_event
+                next_event = next(pending, None)
+                self._stream_position += 1
+            else:
+                this_event = self._events.remove()
+            self._do(this_event)
+            if self._checkpoint is not None:
+                self._check_checkpoint()
+
+        return self._monitor.report()
+
+    @property
+    def elided_events(self) -> int:
+        """The number of invalidated events that were skipped, whether or not
+        the simulation is profiled.
+
+        """
+        return self._elided
+
+    def profile_summary(self) -> Optional[Dict[str, object]]:
+        """Return a summary of where the simulation has spent its time, or
+        None if the simulation is not profiled.
+
+        The summary has the number of events of each class that were done
+        and the time spent doing them, the largest size of the event queue,
+        the number and duration of the calls to the dispatcher, and the
+        number of invalidated events that were skipped.
+        """
+        if self._profile is None:
+            return None
+        summary = self._profile.summary()
+        summary["elided_events"] = self.elided_events
+        return summary
+
+    def _check_checkpoint(self) -> None:
+        """Count one more event done, and save the state of the simulation
+        if it is time to.
+
+        """
+        self._since_checkpoint += 1
+        if (self._checkpoint_events is not None
+                and self._since_checkpoint >= self._checkpoint_events) or (
+                    self._checkpoint_seconds is not None
+                    and time.perf_counter() - self._checkpoint_time
+                    >= self._checkpoint_seconds):
+            self.save_checkpoint(self._checkpoint)
+
+    def _add(self, event: Event) -> None:
+        """Add <event> to the queue, and keep it if it is a Cancellation, so
+        that it can be invalidated if its rider is picked up first.
+
+        """
+        self._events.add(event)
+        if isinstance(event, Cancellation):
+            self._cancellations[event.rider] = event
+
+    def _peek(self) -> Optional[Event]:
+        """Return the next event in the queue, or None if the queue is empty,
+        dropping the invalidated events at the front of the queue.
+
+        """
         while not self._events.is_empty():
-            this_event = self._events.remove()
+            event = self._events.peek()
+            if not event.invalidated:
+                return event
+            self._events.remove()
+            self._dead -= 1
+            self._elided += 1
+        return None
+
+    def _invalidate(self, event: Event) -> None:
+        """Invalidate the queued <event>, and drop the invalidated events
+        from the queue once they make up most of it.
+
+        """
+        event.invalidate()
+        self._dead += 1
+        if self._dead >= MIN_COMPACTION and 2 * self._dead > len(self._events):
+            self._elided += self._events.compact(
+                lambda queued: not queued.invalidated)
+            self._dead = 0
+
+    def _do(self, this_event: Event) -> None:
+        """Do <this_event>, and add the events it spawns to the queue.
+
+        Once a rider is picked up or cancels, their queued Cancellation is
+        no longer needed, so it is forgotten, and invalidated if it has not
+        happened yet.
+        """
+        if self._profile is None:
+            for elements in this_event.do(self._dispatcher, self._monitor):
+                self._add(elements)
+        else:
+            start = time.perf_counter()
             ev = this_event.do(self._dispatcher, self._monitor)
+            seconds = time.perf_counter() - start
             for elements in ev:
-                self._events.add(elements)
+                self._add(elements)
+            self._profile.record_event(type(this_event).__name__, seconds,
+                                       len(self._events))
 
-        return self._monitor.report()
+        if isinstance(this_event, Pickup):
+            cancellation = self._cancellations.pop(this_event.rider, None)
+            if cancellation is not None:
+                self._invalidate(cancellation)
+        elif isinstance(this_event, Cancellation):
+            self._cancellations.pop(this_event.rider, None)
 
 
 if __name__ == "__main__":
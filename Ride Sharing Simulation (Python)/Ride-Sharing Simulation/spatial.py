@@ -0,0 +1,205 @@
+"""Spatial indexes of idle drivers for the dispatcher
+
+An index holds the drivers that are waiting for a rider, and finds the driver
+that can reach a location the fastest. Ties are resolved in FIFO order: the
+driver that was added to the index *earliest* is chosen, which is the same
+driver that Dispatcher picks when it scans its list of waiting drivers.
+
+Every index has the methods of DriverIndex, such as GridIndex here and
+vectorized.ArrayIndex.
+"""
+
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple
+from driver import Driver
+from location import Location
+
+
+class DriverIndex(Protocol):
+    """The methods a Dispatcher uses on an index of idle drivers.
+
+    """
+
+    def __len__(self) -> int:
+        """Return the number of drivers in this index.
+
+        """
+
+    def drivers(self) -> List[Driver]:
+        """Return the drivers in this index, in the order they were added.
+
+        """
+
+    def add(self, driver: Driver) -> None:
+        """Add <driver> at its current location to this index.
+
+        """
+
+    def pop_nearest(self, location: Location) -> Optional[Driver]:
+        """Remove and return the driver that can arrive at <location> the
+        fastest, or None if this index is empty.
+
+        """
+
+
+class GridIndex:
+    """An index of idle drivers bucketed by grid cell.
+
+    The city grid is divided into square cells of <cell_size> by <cell_size>
+    intersections. To find the fastest driver for a location, the cells are
+    searched in rings of increasing distance around the location's cell. The
+    search stops once no driver in the remaining rings can arrive sooner than
+    the best driver found so far, so only the drivers near the location have
+    their travel time computed.
+
+    The search relies on the Manhattan distance to bound the travel time of
+    the drivers in the rings that have not been searched yet, so it also
+    finds the fastest driver when a distance oracle is set, since no oracle
+    gives less than the Manhattan distance.
+    """
+
+    # === Private Attributes ===
+    _cell_size: int
+    #     The number of rows (and columns) covered by each cell.
+    _cells: Dict[Tuple[int, int], Dict[int, Driver]]
+    #     A dictionary whose key is a cell and value is another dictionary.
+    #     The key of the second dictionary is the sequence number of a
+    #     driver in the cell and its value is the driver.
+    _drivers: Dict[int, Tuple[Tuple[int, int], Driver]]
+    #     The cell and driver for each sequence number, in the order the
+    #     drivers were added to the index.
+    _speeds: Dict[int, int]
+    #     The number of drivers in the index with each speed.
+    _counter: int
+    #     The sequence number given to the next driver added to the index.
+    _bounds: Optional[List[int]]
+    #     The smallest row, largest row, smallest column and largest column
+    #     of any cell that has ever held a driver, or None if no driver has
+    #     been added yet.
+
+    def __init__(self, cell_size: int = 8) -> None:
+        """Initialize an empty GridIndex with cells of <cell_size>.
+
+        Precondition: cell_size > 0
+        """
+        self._cell_size = cell_size
+        self._cells = {}
+        self._drivers = {}
+        self._speeds = {}
+        self._counter = 0
+        self._bounds = None
+
+    def __len__(self) -> int:
+        """Return the number of drivers in this index.
+
+        """
+        return len(self._drivers)
+
+    def drivers(self) -> List[Driver]:
+        """Return the drivers in this index, in the order they were added.
+
+        """
+        return [driver for _, driver in self._drivers.values()]
+
+    def add(self, driver: Driver) -> None:
+        """Add <driver> at its current location to this index.
+
+        Precondition: <driver> is not already in this index, and its location
+        does not change while it is in this index.
+        """
+        cell = self._cell(driver.location)
+        sequence = self._counter
+        self._counter += 1
+
+        if cell not in self._cells:
+            self._cells[cell] = {}
+        self._cells[cell][sequence] = driver
+        self._drivers[sequence] = (cell, driver)
+        self._speeds[driver.speed] = self._speeds.get(driver.speed, 0) + 1
+
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            self._bounds[0] = min(self._bounds[0], cell[0])
+            self._bounds[1] = max(self._bounds[1], cell[0])
+            self._bounds[2] = min(self._bounds[2], cell[1])
+            self._bounds[3] = max(self._bounds[3], cell[1])
+
+    def pop_nearest(self, location: Location) -> Optional[Driver]:
+        """Remove and return the driver that can arrive at <location> the
+        fastest, or None if this index is empty.
+
+        Ties are resolved in favour of the driver added earliest.
+        """
+        if not self._drivers:
+            return None
+
+        max_speed = max(self._speeds)
+        row, column = self._cell(location)
+        last_ring = max(row - self._bounds[0], self._bounds[1] - row,
+                        column - self._bounds[2], self._bounds[3] - column)
+
+        best = None
+        for ring in range(last_ring + 1):
+            if best is not None and ring > 0:
+                # Every driver in this ring or beyond is at least this far
+                # away, so none of them can arrive sooner than <best>.
+                closest = (ring - 1) * self._cell_size + 1
+                if round(closest / max_speed) > best[0]:
+                    break
+            for cell in self._ring(row, column, ring):
+                bucket = self._cells.get(cell)
+                if bucket is None:
+                    continue
+                for sequence, driver in bucket.items():
+                    key = (driver.get_travel_time(location), sequence)
+                    if best is None or key < best:
+                        best = key
+
+        sequence = best[1]
+        cell, driver = self._drivers.pop(sequence)
+        bucket = self._cells[cell]
+        del bucket[sequence]
+        if not bucket:
+            del self._cells[cell]
+        self._speeds[driver.speed] -= 1
+        if self._speeds[driver.speed] == 0:
+            del self._speeds[driver.speed]
+        return driver
+
+    def _cell(self, location: Location) -> Tuple[int, int]:
+        """Return the cell that contains <location>.
+
+        """
+        return (location.row // self._cell_size,
+                location.column // self._cell_size)
+
+    def _ring(self, row: int, column: int,
+              ring: int) -> Iterator[Tuple[int, int]]:
+        """Yield the cells that are exactly <ring> cells away from the cell
+        (<row>, <column>), skipping cells that have never held a driver.
+
+        """
+        if ring == 0:
+            yield row, column
+            return
+
+        low_row, high_row, low_col, high_col = self._bounds
+        first_col = max(column - ring, low_col)
+        last_col = min(column + ring, high_col)
+        for edge_row in (row - ring, row + ring):
+            if low_row <= edge_row <= high_row:
+                for cell_col in range(first_col, last_col + 1):
+                    yield edge_row, cell_col
+
+        first_row = max(row - ring + 1, low_row)
+        last_row = min(row + ring - 1, high_row)
+        for edge_col in (column - ring, column + ring):
+            if low_col <= edge_col <= high_col:
+                for cell_row in range(first_row, last_row + 1):
+                    yield cell_row, edge_col
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['typing', 'driver', 'location']})
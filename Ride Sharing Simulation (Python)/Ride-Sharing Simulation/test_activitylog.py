@@ -0,0 +1,125 @@
+import copy as copy_module
+import csv
+import pickle
+import pytest
+from activitylog import COLUMNS, CSVActivitySink, report_from_file
+from benchmark import generate_events
+from event import ENCODING, create_event_list, iter_events
+from location import Location
+from monitor import IncrementalMonitor
+from simulation import Simulation
+
+
+def test_sink(tmp_path):
+    filename = str(tmp_path / "activities.csv")
+    sink = CSVActivitySink(filename, flush_rows=2)
+    sink.write(0, "rider", "request", "A", Location(1, 2))
+    with open(filename) as file:
+        assert len(file.readlines()) == 1
+    sink.write(3, "rider", "cancel", "A", Location(1, 2))
+    with open(filename) as file:
+        assert len(file.readlines()) == 3
+    sink.write(4, "driver", "request", "B", Location(0, 0))
+    sink.close()
+
+    with open(filename, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows == [list(COLUMNS),
+                    ["0", "rider", "request", "A", "1", "2"],
+                    ["3", "rider", "cancel", "A", "1", "2"],
+                    ["4", "driver", "request", "B", "0", "0"]]
+
+
+def test_log_encoding(tmp_path):
+    filename = str(tmp_path / "activities.csv")
+    sink = CSVActivitySink(filename)
+    sink.write(0, "rider", "request", "Zoë", Location(1, 2))
+    sink.write(5, "rider", "cancel", "Zoë", Location(1, 2))
+    copy = pickle.loads(pickle.dumps(sink))
+    sink.close()
+    with open(filename, "rb") as file:
+        assert "Zoë".encode(ENCODING) in file.read()
+
+    copied_log = str(tmp_path / "copy.csv")
+    copy.reopen(copied_log)
+    copy.close()
+    assert report_from_file(copied_log) == report_from_file(filename)
+
+
+def test_report_from_file(tmp_path):
+    filename = str(tmp_path / "activities.csv")
+    for events in ["events.txt"] + [f"event{i}.txt" for i in range(1, 9)]:
+        sink = CSVActivitySink(filename, flush_rows=5)
+        monitor = IncrementalMonitor(retain=False, sink=sink)
+        report = Simulation(monitor=monitor).run(create_event_list(events))
+        sink.close()
+        assert monitor._activities == {"rider": {}, "driver": {}}
+        assert report_from_file(filename) == report
+
+
+def test_checkpoint_sink(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    log = str(tmp_path / "activities.csv")
+    checkpoint = str(tmp_path / "simulation.checkpoint")
+    generate_events(filename, 10, 100, grid_size=10, seed=4)
+
+    sink = CSVActivitySink(log, flush_rows=7)
+    simulation = Simulation(monitor=IncrementalMonitor(retain=False,
+                                                       sink=sink),
+                            checkpoint=checkpoint, checkpoint_events=100)
+    report = simulation.run_stream(iter_events(filename))
+    sink.close()
+    with open(log) as file:
+        expected = file.read()
+
+    # The resumed log starts with the activities logged before the
+    # checkpoint, and the later ones are written again.
+    resumed_log = str(tmp_path / "resumed.csv")
+    resumed = Simulation.resume(checkpoint, activity_log=resumed_log)
+    assert resumed.run_stream(iter_events(filename)) == report
+    resumed._monitor._sink.close()
+    with open(resumed_log) as file:
+        assert file.read() == expected
+    with open(log) as file:
+        assert file.read() == expected
+    assert report_from_file(resumed_log) == report
+
+    # A resumed sink needs a new log before it can write. The resumed
+    # simulation saved its own checkpoints, whose log is <resumed_log>.
+    resumed = Simulation.resume(checkpoint)
+    with pytest.raises(ValueError):
+        resumed.run_stream(iter_events(filename))
+    with pytest.raises(ValueError):
+        Simulation.resume(checkpoint, activity_log=resumed_log)
+
+
+def test_copies_do_not_touch_the_log(tmp_path):
+    log = str(tmp_path / "activities.csv")
+    sink = CSVActivitySink(log, flush_rows=2)
+    monitor = IncrementalMonitor(retain=False, sink=sink)
+    monitor.notify(0, "rider", "request", "A", Location(1, 2))
+    monitor.notify(1, "rider", "pickup", "A", Location(1, 2))
+    monitor.notify(2, "driver", "request", "B", Location(0, 0))
+    with open(log) as file:
+        logged = file.read()
+
+    copy = pickle.loads(pickle.dumps(monitor))
+    other = copy_module.deepcopy(monitor)
+    with open(log) as file:
+        assert file.read() == logged
+    with pytest.raises(ValueError):
+        other.report()
+    with pytest.raises(ValueError):
+        copy.reopen_sink(log)
+
+    copied_log = str(tmp_path / "copy.csv")
+    copy.reopen_sink(copied_log)
+    copy.notify(3, "driver", "pickup", "B", Location(1, 2))
+    monitor.notify(3, "driver", "pickup", "B", Location(2, 2))
+    assert copy.report() == report_from_file(copied_log)
+    assert monitor.report() == report_from_file(log)
+    assert report_from_file(copied_log) != report_from_file(log)
+    with pytest.raises(ValueError):
+        sink.reopen(copied_log)
+    with pytest.raises(ValueError):
+        IncrementalMonitor().reopen_sink(copied_log)
@@ -0,0 +1,34 @@
+from batch import Scenario, read_records, run_scenarios
+from benchmark import generate_events
+from event import create_event_list, event_from_record
+from simulation import Simulation
+
+
+def test_read_records():
+    records = read_records("events.txt")
+    events = create_event_list("events.txt")
+    assert len(records) == len(events)
+    for record, event in zip(records, events):
+        rebuilt = event_from_record(record)
+        assert type(rebuilt) is type(event)
+        assert rebuilt.timestamp == event.timestamp
+
+
+def test_run_scenarios(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    generate_events(filename, 20, 200, grid_size=20, seed=2)
+    scenarios = [Scenario("all"), Scenario("few drivers", drivers=5),
+                 Scenario("patient", patience=40),
+                 Scenario("impatient", drivers=10, patience=1)]
+
+    table = run_scenarios(filename, scenarios, processes=2)
+    assert [row["scenario"] for row in table] == \
+        ["all", "few drivers", "patient", "impatient"]
+    assert run_scenarios(filename, scenarios, processes=1) == table
+
+    records = read_records(filename)
+    for scenario, row in zip(scenarios, table):
+        events = [event_from_record(record)
+                  for record in scenario.apply(records)]
+        expected = Simulation().run(events)
+        assert {key: row[key] for key in expected} == expected
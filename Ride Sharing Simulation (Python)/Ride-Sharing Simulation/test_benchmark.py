@@ -0,0 +1,53 @@
+from benchmark import compare_batching, generate_events, \
+    generate_road_network, object_memory, time_distance_oracle, \
+    time_loading, time_parsing, time_queues, time_request_driver, \
+    time_simulation, time_travel_time_cache
+from event import DriverRequest, RiderRequest, create_event_list
+from spatial import GridIndex
+
+
+def test_generate_events(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    generate_events(filename, 5, 40, grid_size=10, speeds=(2, 3),
+                    patience=(4, 6), arrival_rate=2.0, seed=1)
+    events = create_event_list(filename)
+    assert len(events) == 45
+
+    drivers = [e for e in events if isinstance(e, DriverRequest)]
+    riders = [e for e in events if isinstance(e, RiderRequest)]
+    assert len(drivers) == 5 and len(riders) == 40
+    assert [e.timestamp for e in events] == \
+        sorted(e.timestamp for e in events)
+    assert all(2 <= e.driver.speed <= 3 for e in drivers)
+    assert all(4 <= e.rider.patience <= 6 for e in riders)
+    assert all(0 <= e.rider.origin.row < 10 for e in riders)
+
+    batching = compare_batching(filename, [3], "optimal")
+    assert [result["batch_window"] for result in batching] == [None, 3]
+
+    timings = time_simulation(filename)
+    assert set(timings) == {"parse", "run", "report"}
+    assert set(time_loading(filename)) == {"parse", "compile", "load"}
+    assert set(time_parsing(filename, 2, 100)) == {"sequential", "parallel"}
+    cache = time_travel_time_cache(filename)
+    assert set(cache) == {"uncached", "cached", "hit_rate"}
+    assert 0 < cache["hit_rate"] < 1
+
+    roads = str(tmp_path / "roads.txt")
+    generate_road_network(roads, 10, seed=1)
+    assert set(time_distance_oracle(filename, roads)) == {
+        "manhattan", "road_network_load", "road_network",
+        "road_network_precompute", "road_network_table"}
+    assert time_request_driver(20, 5, index=GridIndex()) >= 0
+
+
+def test_time_queues():
+    assert set(time_queues(100, 10)) == {"heap", "bucket"}
+
+
+def test_object_memory():
+    sizes = object_memory(1000)
+    assert set(sizes) == {"rider", "driver", "activity", "pickup"}
+    for size in sizes.values():
+        assert 0 < size["bytes"] < size["baseline_bytes"]
+        assert 0 < size["reduction"] < 1
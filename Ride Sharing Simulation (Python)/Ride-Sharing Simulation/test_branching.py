@@ -0,0 +1,76 @@
+import pytest
+from activitylog import CSVActivitySink, report_from_file
+from batch import read_records
+from benchmark import generate_events
+from branching import Branch, fork_branches, run_branches
+from dispatcher import Dispatcher
+from event import create_event_list, event_from_record
+from monitor import IncrementalMonitor
+from simulation import Simulation
+from spatial import GridIndex
+
+
+def test_run_branches(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    generate_events(filename, 10, 200, grid_size=20, seed=8)
+    records = read_records(filename)
+    branch_time = records[len(records) // 2][0]
+    extra = [(branch_time + i, "DriverRequest", f"extra{i}", i, i, 3)
+             for i in range(10)]
+    branches = [Branch("baseline"), Branch("more drivers", extra),
+                Branch("fewer extra drivers", extra[:3])]
+
+    def events():
+        return [event_from_record(record) for record in records]
+
+    table = run_branches(events(), branch_time, branches, processes=2)
+    assert [row["branch"] for row in table] == \
+        ["baseline", "more drivers", "fewer extra drivers"]
+    assert run_branches(events(), branch_time, branches,
+                        processes=1) == table
+
+    baseline = Simulation().run(events())
+    assert {key: table[0][key] for key in baseline} == baseline
+    assert table[1]["rider_wait_time"] <= baseline["rider_wait_time"]
+    assert table[1] != table[0]
+
+
+def test_fork_branches_leaves_simulation():
+    records = read_records("events.txt")
+    simulation = Simulation(Dispatcher(GridIndex()), IncrementalMonitor())
+    simulation.run_until([event_from_record(r) for r in records], 5)
+    branches = [Branch("a"), Branch("b", [(6, "RiderRequest", "late",
+                                           1, 1, 2, 2, 5)])]
+    for processes in (1, 2):
+        table = fork_branches(simulation, branches, processes)
+        assert table[0]["branch"] == "a" and table[1]["branch"] == "b"
+
+    expected = Simulation().run(create_event_list("events.txt"))
+    assert simulation.run([]) == expected
+
+
+def test_branches_with_activity_logs(tmp_path):
+    records = read_records("events.txt")
+    log = str(tmp_path / "activities.csv")
+    sink = CSVActivitySink(log, flush_rows=3)
+    simulation = Simulation(monitor=IncrementalMonitor(retain=False,
+                                                       sink=sink))
+    simulation.run_until([event_from_record(r) for r in records], 5)
+    sink.flush()
+    with open(log) as file:
+        logged = file.read()
+
+    with pytest.raises(ValueError):
+        fork_branches(simulation, [Branch("a")], 1)
+    for processes in (1, 2):
+        branches = [Branch(name, extra, str(tmp_path / f"{name}{processes}"))
+                    for name, extra in
+                    (("a", []), ("b", [(6, "RiderRequest", "late",
+                                        1, 1, 2, 2, 5)]))]
+        table = fork_branches(simulation, branches, processes)
+        for branch, row in zip(branches, table):
+            report = report_from_file(branch.activity_log)
+            assert {key: row[key] for key in report} == report
+        assert table[0] != table[1]
+    with open(log) as file:
+        assert file.read() == logged
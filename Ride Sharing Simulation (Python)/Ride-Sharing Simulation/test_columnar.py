@@ -0,0 +1,54 @@
+import random
+
+from columnar import ColumnarMonitor
+from event import create_event_list
+from location import Location
+from monitor import Monitor, RIDER, DRIVER, REQUEST, CANCEL, PICKUP, DROPOFF
+from simulation import Simulation
+
+
+def test_columnar_monitor():
+    monitor = ColumnarMonitor()
+    monitor.notify(3, DRIVER, REQUEST, "a", Location(17, 9))
+    monitor.notify(3, DRIVER, REQUEST, "b", Location(23, 12))
+    monitor.notify(4, DRIVER, REQUEST, "c", Location(31, 34))
+    monitor.notify(5, RIDER, REQUEST, "A", Location(4, 10))
+    monitor.notify(10, DRIVER, PICKUP, "a", Location(4, 10))
+    monitor.notify(10, RIDER, PICKUP, "A", Location(4, 10))
+    monitor.notify(12, DRIVER, DROPOFF, "a", Location(31, 9))
+
+    assert len(monitor) == 7
+    assert not hasattr(monitor, "_activities")
+    assert monitor.report() == {"rider_wait_time": 5.0,
+                                "driver_total_distance": 14.0,
+                                "driver_ride_distance": 9.3333333333333333}
+
+
+def test_columnar_monitor_empty():
+    assert ColumnarMonitor().report() == {"rider_wait_time": 0.0,
+                                          "driver_total_distance": 0.0,
+                                          "driver_ride_distance": 0.0}
+
+
+def test_columnar_monitor_matches_monitor():
+    rand = random.Random(6)
+    monitor = Monitor()
+    columnar = ColumnarMonitor()
+    monitor.notify(0, RIDER, REQUEST, "first", Location(0, 0))
+    columnar.notify(0, RIDER, REQUEST, "first", Location(0, 0))
+    for time in range(1, 2000):
+        category = rand.choice([RIDER, DRIVER])
+        description = rand.choice([REQUEST, CANCEL, PICKUP, DROPOFF])
+        identifier = str(rand.randrange(40))
+        location = Location(rand.randrange(30), rand.randrange(30))
+        monitor.notify(time, category, description, identifier, location)
+        columnar.notify(time, category, description, identifier, location)
+
+    assert columnar.report() == monitor.report()
+
+
+def test_simulation_with_columnar_monitor():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        expected = Simulation().run(create_event_list(filename))
+        simulation = Simulation(monitor=ColumnarMonitor())
+        assert simulation.run(create_event_list(filename)) == expected
@@ -1,4 +1,6 @@
-from container import PriorityQueue
+import random
+
+from container import PriorityQueue, HeapPriorityQueue, BucketQueue
 
 
 class Num:
@@ -78,9 +80,112 @@ def test_priority_queue():
     assert lst3 == ["d", "e", "c", "f", "a", "b",'g']
 
 
+def test_heap_priority_queue():
+    queue = HeapPriorityQueue()
+    for value in [7, 9, 3, 0, 5]:
+        queue.add(value)
+    assert len(queue) == 5
+
+    lst = []
+    while not queue.is_empty():
+        lst.append(queue.remove())
+
+    assert lst == [0, 3, 5, 7, 9]
+
+    queue1 = HeapPriorityQueue()
+    queue1.add(Num("a", 10))
+    queue1.add(Num("b", 15))
+    queue1.add(Num("c", 0))
+    queue1.add(Num("d", -15))
+    queue1.add(Num("e", -10))
+    queue1.add(Num("g", 15))
+    queue1.add(Num("f", 0))
+    lst1 = []
 
+    while not queue1.is_empty():
+        lst1.append(queue1.remove().id)
 
+    assert lst1 == ["d", "e", "c", "f", "a", "b", "g"]
 
 
+def test_heap_priority_queue_matches_priority_queue():
+    values = [(i * 7919) % 13 for i in range(200)]
+    queue = PriorityQueue()
+    heap_queue = HeapPriorityQueue()
+    for i, value in enumerate(values):
+        queue.add(Num(i, value))
+        heap_queue.add(Num(i, value))
 
+    while not queue.is_empty():
+        assert queue.remove().id == heap_queue.remove().id
+    assert heap_queue.is_empty()
+
+
+class Timed:
+    def __init__(self, id_, timestamp):
+        self.id = id_
+        self.timestamp = timestamp
 
+    def __lt__(self, other):
+        return self.timestamp < other.timestamp
+
+    def __le__(self, other):
+        return self.timestamp <= other.timestamp
+
+    def __gt__(self, other):
+        return self.timestamp > other.timestamp
+
+    def __eq__(self, other):
+        return self.timestamp == other.timestamp
+
+
+def test_bucket_queue():
+    queue = BucketQueue()
+    assert queue.is_empty()
+    for id_, timestamp in [("a", 10), ("b", 15), ("c", 0), ("d", 10),
+                           ("e", 0), ("f", 3)]:
+        queue.add(Timed(id_, timestamp))
+    assert len(queue) == 6
+    assert queue.peek().id == "c"
+
+    lst = []
+    while not queue.is_empty():
+        lst.append(queue.remove().id)
+    assert lst == ["c", "e", "f", "a", "d", "b"]
+    assert len(queue) == 0
+
+
+def test_bucket_queue_matches_heap_priority_queue():
+    rand = random.Random(12)
+    queue = BucketQueue()
+    heap_queue = HeapPriorityQueue()
+    now = 0
+    for i in range(2000):
+        if rand.random() < 0.6 or queue.is_empty():
+            item = Timed(i, now + rand.randrange(20))
+            queue.add(item)
+            heap_queue.add(item)
+        else:
+            item = queue.remove()
+            assert item is heap_queue.remove()
+            now = item.timestamp
+    while not queue.is_empty():
+        assert queue.remove() is heap_queue.remove()
+    assert heap_queue.is_empty()
+
+
+def test_compact_keeps_order():
+    rand = random.Random(5)
+    items = [Timed(i, rand.randrange(30)) for i in range(300)]
+    for queue in (PriorityQueue(), HeapPriorityQueue(), BucketQueue()):
+        for item in items:
+            queue.add(item)
+        assert queue.compact(lambda item: item.id % 3 != 0) == 100
+        assert len(queue) == 200
+        assert queue.compact(lambda item: True) == 0
+
+        lst = []
+        while not queue.is_empty():
+            lst.append(queue.remove())
+        assert lst == sorted((item for item in items if item.id % 3 != 0),
+                             key=lambda item: (item.timestamp, item.id))
@@ -1,7 +1,11 @@
+import pickle
+import pytest
+
 from dispatcher import Dispatcher
 from driver import Driver
 from rider import Rider
 from location import Location
+from spatial import GridIndex
 
 
 def test_request_rider():
@@ -235,5 +239,74 @@ def test_dispatcher_cancel():
     dispatcher.cancel_ride(rider4)
     dispatcher.cancel_ride(rider1)
     dispatcher.cancel_ride(rider3)
-    assert dispatcher._rider_lst == [rider2]
+    assert list(dispatcher._rider_lst.values()) == [rider2]
+
+
+def test_cancellations_keep_fifo_order():
+    dispatcher = Dispatcher()
+    riders = [Rider(str(i), 5, Location(i, i), Location(0, 0))
+              for i in range(200)]
+    for rider in riders:
+        assert dispatcher.request_driver(rider) is None
+
+    for rider in riders:
+        if int(rider.id) % 3 != 0:
+            dispatcher.cancel_ride(rider)
+    dispatcher.cancel_ride(riders[0])
+    assert len(dispatcher._rider_lst) == 66
+
+    for rider in riders[3::3]:
+        driver = Driver("d" + rider.id, Location(0, 0), 1)
+        assert dispatcher.request_rider(driver) is rider
+    assert dispatcher.request_rider(Driver("x", Location(0, 0), 1)) is None
+    assert len(dispatcher._rider_lst) == 0
+    assert dispatcher._registered_driver == {"x"}
+
+
+def test_batch_dispatcher():
+    dispatcher = Dispatcher(batch_window=10, batch_method="optimal")
+    driver1 = Driver("a", Location(0, 0), 1)
+    driver2 = Driver("b", Location(0, 10), 1)
+    rider1 = Rider("A", 50, Location(0, 4), Location(9, 9))
+    rider2 = Rider("B", 50, Location(0, 6), Location(9, 9))
+    rider3 = Rider("C", 50, Location(5, 5), Location(9, 9))
+
+    assert dispatcher.request_rider(driver1) is None
+    assert dispatcher.schedule_batch(3) == 10
+    assert dispatcher.request_driver(rider1) is None
+    assert dispatcher.schedule_batch(4) is None
+    assert dispatcher.request_driver(rider2) is None
+    assert dispatcher.request_rider(driver2) is None
+    assert dispatcher.request_driver(rider3) is None
+    dispatcher.cancel_ride(rider3)
 
+    assert dispatcher.match_batch() == [(rider1, driver1), (rider2, driver2)]
+    assert dispatcher.match_batch() == []
+    assert dispatcher.schedule_batch(12) == 20
+    assert len(dispatcher._rider_lst) == 0 and dispatcher._driver_lst == []
+
+    with pytest.raises(ValueError):
+        Dispatcher(GridIndex(), batch_window=5)
+    with pytest.raises(ValueError):
+        Dispatcher(batch_window=5, batch_method="auction")
+
+
+def test_duplicate_rider_ids():
+    dispatcher = Dispatcher()
+    first = Rider("A", 5, Location(0, 0), Location(1, 1))
+    second = Rider("A", 5, Location(2, 2), Location(1, 1))
+    third = Rider("A", 5, Location(3, 3), Location(1, 1))
+    for rider in (first, second, third):
+        assert dispatcher.request_driver(rider) is None
+    assert str(dispatcher) == "(['A', 'A', 'A'], [])"
+
+    dispatcher.cancel_ride(second)
+    assert list(dispatcher._rider_lst.values()) == [first, third]
+
+    copy = pickle.loads(pickle.dumps(dispatcher))
+    copy.cancel_ride(copy._rider_queue[0])
+    assert [rider.origin for rider in copy._rider_lst.values()] == \
+        [third.origin]
+    assert dispatcher.request_rider(Driver("a", Location(0, 0), 1)) is first
+    assert dispatcher.request_rider(Driver("b", Location(0, 0), 1)) is third
+    assert dispatcher.request_rider(Driver("c", Location(0, 0), 1)) is None
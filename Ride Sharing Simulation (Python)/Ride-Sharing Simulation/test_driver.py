@@ -1,4 +1,4 @@
-from driver import Driver
+from driver import Driver, TRAVEL_TIMES, TravelTimeCache
 from rider import Rider
 from location import Location
 
@@ -79,3 +79,55 @@ def test_drive():
     assert rider.status == "satisfied"
     assert driver.destination is None
     assert driver.location == rider.destination
+
+
+def test_travel_time_cache():
+    cache = TravelTimeCache(2)
+    origin = Location(0, 0)
+    assert cache.travel_time(origin, Location(3, 4), 2) == 4
+    assert cache.travel_time(origin, Location(1, 1), 1) == 2
+    assert cache.travel_time(Location(0, 0), Location(3, 4), 2) == 4
+    assert (cache.hits, cache.misses, len(cache)) == (1, 2, 2)
+
+    # The least recently used travel time is forgotten.
+    assert cache.travel_time(origin, Location(5, 5), 1) == 10
+    assert cache.travel_time(origin, Location(1, 1), 1) == 2
+    assert (cache.hits, cache.misses, len(cache)) == (1, 4, 2)
+
+    cache.resize(1)
+    assert len(cache) == 1
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+    disabled = TravelTimeCache(0)
+    assert disabled.travel_time(origin, Location(3, 4), 2) == 4
+    assert (disabled.hits, disabled.misses, len(disabled)) == (0, 0, 0)
+
+
+def test_shared_cache():
+    TRAVEL_TIMES.resize(10)
+    try:
+        driver = Driver("Nizar", Location(50, 100), 5)
+        rider = Rider("Alice", 5, Location(40, 70), Location(50, 100))
+        assert driver.get_travel_time(rider.origin) == 8
+        assert driver.start_drive(rider.origin) == 8
+        driver.end_drive()
+        assert driver.start_ride(rider) == 8
+        assert TRAVEL_TIMES.hits == 1 and TRAVEL_TIMES.misses == 2
+    finally:
+        TRAVEL_TIMES.clear()
+        TRAVEL_TIMES.resize(0)
+
+
+def test_disabled_cache_is_not_called(monkeypatch):
+    def travel_time(*args):
+        raise AssertionError("the disabled cache was called")
+
+    monkeypatch.setattr(TRAVEL_TIMES, "travel_time", travel_time)
+    assert TRAVEL_TIMES.size == 0
+    driver = Driver("Nizar", Location(50, 100), 5)
+    rider = Rider("Alice", 5, Location(40, 70), Location(50, 100))
+    assert driver.get_travel_time(rider.origin) == 8
+    assert driver.start_drive(rider.origin) == 8
+    driver.end_drive()
+    assert driver.start_ride(rider) == 8
@@ -0,0 +1,41 @@
+from event import create_event_list, event_from_line, iter_events
+from event import Cancellation, DriverRequest, Dropoff, Pickup, RiderRequest
+from monitor import Activity
+
+
+def test_event_from_line():
+    event = event_from_line("0 DriverRequest Bob 1,1 2\n")
+    assert isinstance(event, DriverRequest)
+    assert event.timestamp == 0
+    assert event.driver.id == "Bob"
+    assert event.driver.speed == 2
+    assert str(event.driver.location) == "(1, 1)"
+
+    event = event_from_line("5 RiderRequest Alice 1,2 3,4 10")
+    assert isinstance(event, RiderRequest)
+    assert event.rider.patience == 10
+    assert str(event.rider.destination) == "(3, 4)"
+
+    assert event_from_line("") is None
+    assert event_from_line("   ") is None
+    assert event_from_line("# 5 RiderRequest Alice 1,2 3,4 10") is None
+
+
+def test_iter_events():
+    events = iter_events("events.txt")
+    assert iter(events) is events
+    streamed = [(type(event), event.timestamp) for event in events]
+    assert streamed == [(type(event), event.timestamp)
+                        for event in create_event_list("events.txt")]
+
+
+def test_objects_have_no_dict():
+    request = event_from_line("5 RiderRequest Alice 1,2 3,4 10")
+    rider = request.rider
+    driver = event_from_line("0 DriverRequest Bob 1,1 2").driver
+    objects = [request, rider, driver, rider.origin,
+               Activity(5, "pickup", "Bob", rider.origin),
+               Cancellation(15, rider), Pickup(6, rider, driver),
+               Dropoff(9, rider, driver)]
+    for thing in objects:
+        assert not hasattr(thing, "__dict__"), type(thing).__name__
@@ -0,0 +1,162 @@
+import os
+import random
+import shutil
+import pytest
+from event import create_event_list, parse_record
+from eventfile import CompiledEvents, TimeIndex, chunk_offsets, \
+    compile_events, create_event_list_parallel, index_filename, \
+    load_time_index, read_records_parallel, read_window
+from simulation import Simulation
+
+
+def _records(filename):
+    with open(filename) as file:
+        return [record for record in map(parse_record, file)
+                if record is not None]
+
+
+@pytest.mark.parametrize("filename", ["events.txt", "event7.txt",
+                                      "event8.txt"])
+def test_compile_events(tmp_path, filename):
+    compiled = str(tmp_path / "events.bin")
+    records = _records(filename)
+    assert compile_events(filename, compiled) == len(records)
+
+    with CompiledEvents(compiled) as events:
+        assert len(events) == len(records)
+        assert [events.record(i) for i in range(len(events))] == records
+        assert list(events.records()) == records
+        assert events.record(-1) == records[-1]
+        with pytest.raises(IndexError):
+            events.record(len(records))
+        assert events[0] is not events[0]
+        assert [(type(e), e.timestamp) for e in events] == \
+            [(type(e), e.timestamp) for e in create_event_list(filename)]
+
+
+def test_compiled_simulation(tmp_path):
+    compiled = str(tmp_path / "events.bin")
+    compile_events("events.txt", compiled)
+    with CompiledEvents(compiled) as events:
+        assert Simulation().run(list(events)) == \
+            Simulation().run(create_event_list("events.txt"))
+        # The events are created again, so the file can be replayed.
+        assert Simulation().run(list(events)) == \
+            Simulation().run(create_event_list("events.txt"))
+
+
+def test_not_compiled(tmp_path):
+    empty = tmp_path / "empty.bin"
+    empty.write_bytes(b"")
+    with pytest.raises(ValueError):
+        CompiledEvents(str(empty))
+    with pytest.raises(ValueError):
+        CompiledEvents("events.txt")
+
+
+def test_chunk_offsets():
+    chunks = chunk_offsets("events.txt", 10)
+    with open("events.txt", "rb") as file:
+        data = file.read()
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(data)
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert end == start and data[start - 1:start] == b"\n"
+    assert chunk_offsets("events.txt", len(data) + 1) == [(0, len(data))]
+
+
+@pytest.mark.parametrize("filename", ["events.txt", "event8.txt"])
+def test_read_records_parallel(filename):
+    records = _records(filename)
+    assert read_records_parallel(filename, 1, 7) == records
+    assert read_records_parallel(filename, 2, 7) == records
+    assert [(type(e), e.timestamp) for e in
+            create_event_list_parallel(filename, 2, 7)] == \
+        [(type(e), e.timestamp) for e in create_event_list(filename)]
+
+
+def test_parallel_line_breaks(tmp_path):
+    # Only newlines end lines in an event file, so these separators are
+    # part of the comments.
+    filename = str(tmp_path / "events.txt")
+    with open(filename, "w") as file:
+        for separator in ["\x0b", "\x1c", "\u2028", "\x85"]:
+            file.write(f"# note{separator}1 DriverRequest Ghost 1,1 1\n")
+        file.write("2 DriverRequest Bob 1,1 2\r\n")
+    records = _records(filename)
+    assert records == [(2, "DriverRequest", "Bob", 1, 1, 2)]
+    assert read_records_parallel(filename, 1, 16) == records
+
+
+def test_readers_share_encoding(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    with open(filename, "w", encoding="utf-8") as file:
+        file.write("1 DriverRequest Zoë 1,1 2\n3 RiderRequest Åsa 1,2 3,4 5\n")
+    names = ["Zoë", "Åsa"]
+    assert [_summary(e)[2] for e in create_event_list(filename)] == names
+    assert [r[2] for r in read_records_parallel(filename, 1, 16)] == names
+    assert [_summary(e)[2] for e in read_window(filename, 0, 10, 1)] == names
+    compiled = str(tmp_path / "events.bin")
+    compile_events(filename, compiled)
+    with CompiledEvents(compiled) as events:
+        assert [_summary(e)[2] for e in events] == names
+
+
+def _summary(event):
+    person = event.rider if hasattr(event, "rider") else event.driver
+    return type(event), event.timestamp, person.id
+
+
+def _copy(tmp_path, filename):
+    copy = str(tmp_path / os.path.basename(filename))
+    shutil.copyfile(filename, copy)
+    return copy
+
+
+@pytest.mark.parametrize("filename", ["events.txt", "event4.txt",
+                                      "event7.txt", "event8.txt"])
+def test_read_window(tmp_path, filename):
+    filename = _copy(tmp_path, filename)
+    records = _records(filename)
+    times = sorted({record[0] for record in records})
+    for start in times + [times[-1] + 1]:
+        for end in [start, start + 1, start + 5, times[-1] + 1]:
+            assert [_summary(e) for e in
+                    read_window(filename, start, end, every=2)] == \
+                [_summary(e) for e in create_event_list(filename)
+                 if start <= e.timestamp < end]
+    assert os.path.exists(index_filename(filename))
+
+
+def test_window_skips_blocks(tmp_path):
+    random.seed(0)
+    filename = str(tmp_path / "events.txt")
+    with open(filename, "w") as file:
+        for timestamp in range(1000):
+            file.write(f"{timestamp} RiderRequest R{timestamp} 1,1 2,2 "
+                       f"{random.randint(1, 20)}\n")
+    index = TimeIndex.build(filename, 100)
+    assert len(index) == 10
+    start, end = index.window(450, 460)
+    assert 0 < start < end < os.path.getsize(filename)
+    assert [e.timestamp for e in read_window(filename, 450, 460, 100)] == \
+        list(range(450, 460))
+
+
+def test_stale_index(tmp_path):
+    filename = _copy(tmp_path, "events.txt")
+    load_time_index(filename, 2)
+    index = TimeIndex.load(index_filename(filename))
+    assert index.is_current(filename) and index.every == 2
+    assert load_time_index(filename, 3).every == 2
+
+    with open(filename, "a") as file:
+        file.write("100 DriverRequest Late 1,1 1\n")
+    assert not index.is_current(filename)
+    assert [e.timestamp for e in read_window(filename, 100, 101, 3)] == [100]
+    assert TimeIndex.load(index_filename(filename)).every == 3
+
+    with open(index_filename(filename), "wb") as file:
+        file.write(b"damaged")
+    with pytest.raises(ValueError):
+        TimeIndex.load(index_filename(filename))
+    assert load_time_index(filename).is_current(filename)
@@ -0,0 +1,39 @@
+import math
+import random
+from histogram import Histogram
+
+
+def test_exact_small_values():
+    histogram = Histogram(precision=5)
+    values = [3, 0, 7, 7, 31, 12]
+    for value in values:
+        histogram.add(value)
+    assert (histogram.count, histogram.total) == (6, sum(values))
+    assert [histogram.quantile(q) for q in (0, 0.5, 0.8, 1)] == \
+        [0.0, 7.0, 12.0, 31.0]
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_relative_error():
+    rand = random.Random(5)
+    values = [int(rand.expovariate(1 / 5000)) for _ in range(20000)]
+    histogram = Histogram(precision=6)
+    for value in values:
+        histogram.add(value)
+    values.sort()
+    for fraction in (0.01, 0.5, 0.95, 0.99, 1):
+        exact = values[max(1, math.ceil(fraction * len(values))) - 1]
+        assert abs(histogram.quantile(fraction) - exact) <= \
+            exact * 2 ** -5 + 0.5
+    # The memory depends on the range of values, not how many there are.
+    assert len(histogram) < 20 * 2 ** 5
+
+
+def test_merge():
+    first, second, both = Histogram(), Histogram(), Histogram()
+    for value in range(200):
+        (first if value % 3 else second).add(value)
+        both.add(value)
+    first.merge(second)
+    assert first.buckets() == both.buckets()
+    assert (first.count, first.total) == (both.count, both.total)
@@ -1,4 +1,11 @@
+import copy
+import pickle
+import random
+from collections import OrderedDict
+import location as location_module
 from location import Location, manhattan_distance, deserialize_location
+from location import ManhattanOracle, RoadNetworkOracle, distance, \
+    get_distance_oracle, set_distance_oracle
 import pytest
 
 from hypothesis import given
@@ -101,3 +108,136 @@ def test_deserialize():
 def test_des(n1: int, n2: int):
     assert isinstance(deserialize_location(f"{n1},{n2}"), Location)
 
+
+def test_locations_are_hashable_and_interned():
+    assert hash(Location(3, 4)) == hash(Location(3, 4))
+    assert len({Location(3, 4), Location(3, 4), Location(4, 3)}) == 2
+    assert deserialize_location("7,9") is deserialize_location("7,9")
+    assert deserialize_location("7,9") == Location(7, 9)
+
+
+def test_locations_are_compact_and_read_only():
+    location = Location(3, 4)
+    assert not hasattr(location, "__dict__")
+    with pytest.raises(AttributeError):
+        location.row = 5
+    with pytest.raises(AttributeError):
+        del location.column
+    with pytest.raises(AttributeError):
+        location.other = 1
+    assert (location.row, location.column) == (3, 4)
+    assert pickle.loads(pickle.dumps(location)) == location
+    assert copy.deepcopy(location) == location
+
+
+def test_interned_locations_are_bounded(monkeypatch):
+    monkeypatch.setattr(location_module, "MAX_INTERNED_LOCATIONS", 4)
+    monkeypatch.setattr(location_module, "_LOCATIONS", OrderedDict())
+    first = deserialize_location("0,0")
+    for i in range(1, 4):
+        deserialize_location(f"{i},0")
+    assert deserialize_location("0,0") is first
+    for i in range(4, 8):
+        deserialize_location(f"{i},0")
+    assert len(location_module._LOCATIONS) == 4
+    assert deserialize_location("0,0") is not first
+    location_module.clear_locations()
+    assert len(location_module._LOCATIONS) == 0
+
+
+def _roads():
+    # A 3 by 3 grid whose middle column of roads is slow.
+    roads = []
+    for row in range(3):
+        for column in range(3):
+            if row < 2:
+                roads.append((Location(row, column),
+                              Location(row + 1, column),
+                              5 if column == 1 else 1))
+            if column < 2:
+                roads.append((Location(row, column),
+                              Location(row, column + 1), 1))
+    return roads
+
+
+def test_road_network_oracle(tmp_path):
+    oracle = RoadNetworkOracle(_roads(), max_rows=2)
+    assert oracle.distance(Location(0, 1), Location(2, 1)) == 4
+    assert oracle.distance(Location(2, 1), Location(0, 1)) == 4
+    assert oracle.distance(Location(0, 0), Location(2, 2)) == 4
+    assert oracle.distance(Location(1, 1), Location(1, 1)) == 0
+    for start in range(3):
+        for end in range(3):
+            assert oracle.distance(Location(start, 0), Location(end, 2)) >= \
+                manhattan_distance(Location(start, 0), Location(end, 2))
+    assert len(oracle._rows) <= 2
+    with pytest.raises(ValueError):
+        oracle.distance(Location(0, 0), Location(7, 7))
+
+    filename = str(tmp_path / "roads.bin")
+    oracle.save(filename)
+    loaded = RoadNetworkOracle.load(filename)
+    for first in [Location(r, c) for r in range(3) for c in range(3)]:
+        for second in [Location(r, c) for r in range(3) for c in range(3)]:
+            assert loaded.distance(first, second) == \
+                oracle.distance(first, second)
+
+
+def test_road_network_zones(tmp_path):
+    rand = random.Random(3)
+    roads = []
+    for row in range(9):
+        for column in range(9):
+            if row < 8:
+                roads.append((Location(row, column), Location(row + 1, column),
+                              rand.randint(1, 6)))
+            if column < 8 and (row, column) != (4, 4):
+                roads.append((Location(row, column), Location(row, column + 1),
+                              rand.randint(1, 6)))
+    # An island of two intersections, in a zone of its own.
+    roads.append((Location(20, 20), Location(20, 21), 1))
+    expected = RoadNetworkOracle(roads)
+    locations = [Location(r, c) for r in range(9) for c in range(9)]
+    filename = str(tmp_path / "roads.bin")
+    for zone_size in (1, 2, 4, 9):
+        oracle = RoadNetworkOracle(roads, zone_size=zone_size)
+        oracle.precompute()
+        oracle.save(filename)
+        loaded = RoadNetworkOracle.load(filename)
+        for first in locations:
+            for second in locations:
+                length = expected.distance(first, second)
+                assert oracle.distance(first, second) == length
+                assert loaded.distance(first, second) == length
+        assert loaded.distance(Location(20, 21), Location(20, 20)) == 1
+        with pytest.raises(ValueError):
+            loaded.distance(Location(0, 0), Location(20, 20))
+    with pytest.raises(ValueError):
+        RoadNetworkOracle(roads, zone_size=0)
+
+
+def test_road_network_validation(tmp_path):
+    with pytest.raises(ValueError):
+        RoadNetworkOracle([(Location(0, 0), Location(0, 2), 1)])
+
+    filename = tmp_path / "roads.txt"
+    filename.write_text("# roads\n0,0 0,1 2\n\n0,1 1,1 1\n5,5 5,6 1\n")
+    oracle = RoadNetworkOracle.from_edge_list(str(filename))
+    assert oracle.distance(Location(0, 0), Location(1, 1)) == 3
+    with pytest.raises(ValueError):
+        oracle.distance(Location(0, 0), Location(5, 5))
+    with pytest.raises(ValueError):
+        RoadNetworkOracle.load(str(filename))
+
+
+def test_set_distance_oracle():
+    oracle = RoadNetworkOracle(_roads())
+    try:
+        set_distance_oracle(oracle)
+        assert get_distance_oracle() is oracle
+        assert distance(Location(0, 1), Location(2, 1)) == 4
+        set_distance_oracle(ManhattanOracle())
+        assert get_distance_oracle() is None
+        assert distance(Location(0, 1), Location(2, 1)) == 2
+    finally:
+        set_distance_oracle(None)
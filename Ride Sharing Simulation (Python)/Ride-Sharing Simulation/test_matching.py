@@ -0,0 +1,32 @@
+import itertools
+import random
+
+from matching import greedy_assignment, optimal_assignment
+
+
+def test_greedy_assignment():
+    assert greedy_assignment([]) == []
+    assert greedy_assignment([[4, 2, 7], [2, 1, 9]]) == [(1, 1), (0, 0)]
+    # Ties go to the earliest rider, then the earliest driver.
+    assert greedy_assignment([[1, 1], [1, 1]]) == [(0, 0), (1, 1)]
+
+
+def test_optimal_assignment_is_optimal():
+    rand = random.Random(14)
+    for _ in range(200):
+        riders = rand.randint(1, 5)
+        drivers = rand.randint(1, 5)
+        cost = [[rand.randint(0, 20) for _ in range(drivers)]
+                for _ in range(riders)]
+        pairs = optimal_assignment(cost)
+        assert len(pairs) == min(riders, drivers)
+        assert len({rider for rider, _ in pairs}) == len(pairs)
+        assert len({driver for _, driver in pairs}) == len(pairs)
+
+        best = min(sum(cost[rider][driver] for rider, driver
+                       in zip(rider_order, driver_order))
+                   for rider_order in itertools.permutations(range(riders))
+                   for driver_order in itertools.permutations(range(drivers)))
+        assert sum(cost[rider][driver] for rider, driver in pairs) == best
+        assert sum(cost[rider][driver]
+                   for rider, driver in greedy_assignment(cost)) >= best
@@ -1,10 +1,15 @@
+import math
+import random
+
 from dispatcher import Dispatcher
 from driver import Driver
 from rider import Rider
 from location import Location
 from dispatcher import Dispatcher
 from monitor import Activity
-from monitor import Monitor
+from monitor import Monitor, IncrementalMonitor
+from event import create_event_list
+from simulation import Simulation
 
 
 def test_monitor():
@@ -51,3 +56,89 @@ def test_monitor():
     da2 = Activity(4, "request", "b", l2)
     da3 = Activity(5, "request", "c", l3)
     da1 = Activity(6, "request", "d", l4)
+
+
+def test_incremental_monitor():
+    rand = random.Random(7)
+    monitor = Monitor()
+    incremental = IncrementalMonitor()
+    lean = IncrementalMonitor(retain=False)
+    monitor.notify(0, "rider", "request", "first", Location(0, 0))
+    incremental.notify(0, "rider", "request", "first", Location(0, 0))
+    lean.notify(0, "rider", "request", "first", Location(0, 0))
+    for time in range(1, 2000):
+        category = rand.choice(["rider", "driver"])
+        description = rand.choice(["request", "cancel", "pickup", "dropoff"])
+        identifier = str(rand.randrange(40))
+        location = Location(rand.randrange(30), rand.randrange(30))
+        for m in (monitor, incremental, lean):
+            m.notify(time, category, description, identifier, location)
+        if time % 100 == 0:
+            assert incremental.report() == monitor.report()
+
+    assert incremental.report() == monitor.report()
+    assert lean.report() == monitor.report()
+    for category in ("rider", "driver"):
+        assert incremental._activities[category].keys() == \
+            monitor._activities[category].keys()
+    assert lean._activities == {"rider": {}, "driver": {}}
+
+    assert IncrementalMonitor().report() == {"rider_wait_time": 0.0,
+                                             "driver_total_distance": 0.0,
+                                             "driver_ride_distance": 0.0}
+
+
+def test_simulation_with_incremental_monitor():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        expected = Simulation().run(create_event_list(filename))
+        simulation = Simulation(monitor=IncrementalMonitor(retain=False))
+        assert simulation.run(create_event_list(filename)) == expected
+
+
+def test_percentiles():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(1, 9)]:
+        exact = Monitor()
+        monitor = IncrementalMonitor(percentiles=True)
+        Simulation(monitor=exact).run(create_event_list(filename))
+        report = Simulation(monitor=monitor).run(create_event_list(filename))
+        assert report["rider_wait_time"] == exact.report()["rider_wait_time"]
+
+        waits = sorted(activities[1].time - activities[0].time
+                       for activities in exact._activities["rider"].values()
+                       if len(activities) >= 2)
+        for percentile in (50, 95, 99):
+            rank = max(1, math.ceil(percentile / 100 * len(waits)))
+            # Small wait times are counted exactly.
+            assert report[f"rider_wait_time_p{percentile}"] == \
+                waits[rank - 1]
+        histograms = monitor.histograms()
+        assert sum(count for _, _, count
+                   in histograms["rider_wait_time"]) == len(waits)
+        drivers = exact._activities["driver"].values()
+        assert sum(count for _, _, count
+                   in histograms["driver_total_distance"]) == len(drivers)
+        # Drivers with two or fewer activities have no rides.
+        rides = sum(1 for activities in drivers if len(activities) > 2
+                    for activity in activities[:-1]
+                    if activity.description == "pickup")
+        assert sum(count for _, _, count
+                   in histograms["ride_distance"]) == rides
+        assert all(isinstance(value, float) for value in report.values())
+
+
+def test_histograms_follow_drivers():
+    monitor = IncrementalMonitor(percentiles=True)
+    assert IncrementalMonitor().histograms() == {}
+    monitor.notify(1, "driver", "pickup", "D", Location(0, 2))
+    monitor.notify(3, "driver", "dropoff", "D", Location(0, 5))
+    # The ride is held until the driver has more than two activities.
+    assert monitor.histograms()["ride_distance"] == []
+    assert monitor.report()["driver_ride_distance"] == 0.0
+    assert monitor.histograms()["driver_total_distance"] == [(3, 3, 1)]
+    monitor.notify(3, "driver", "request", "D", Location(0, 5))
+    assert monitor.histograms()["ride_distance"] == [(3, 3, 1)]
+    other = IncrementalMonitor(percentiles=True)
+    other.add_driver("D", monitor.pop_driver("D"))
+    assert monitor.histograms()["driver_total_distance"] == []
+    other.notify(4, "driver", "pickup", "D", Location(0, 6))
+    assert other.histograms()["driver_total_distance"] == [(4, 4, 1)]
@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+from benchmark import generate_events
+from event import create_event_list, event_from_line
+from monitor import IncrementalMonitor
+from realtime import RealtimeRunner
+from simulation import Simulation
+
+
+def _reader(filename):
+    reader = asyncio.StreamReader()
+    with open(filename, "rb") as file:
+        reader.feed_data(file.read())
+    reader.feed_eof()
+    return reader
+
+
+def _replay(runner, filename):
+    async def replay():
+        return await runner.run(_reader(filename))
+    return asyncio.run(replay())
+
+
+def _sorted_copy(filename, tmp_path):
+    # The lines of a stream arrive in order of their timestamps; the sort is
+    # stable, so the events at the same time keep their order.
+    with open(filename) as file:
+        lines = [line.rstrip("\n") + "\n" for line in file
+                 if event_from_line(line) is not None]
+    lines.sort(key=lambda line: event_from_line(line).timestamp)
+    copy = str(tmp_path / "sorted.txt")
+    with open(copy, "w") as file:
+        file.writelines(lines)
+    return copy
+
+
+def test_as_fast_as_possible(tmp_path):
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        events = create_event_list(filename)
+        expected = Simulation(monitor=IncrementalMonitor()).run(events)
+        for max_pending in (1, 2, 1024):
+            published = []
+            runner = RealtimeRunner(speedup=None, max_pending=max_pending,
+                                    publish=published.append)
+            report = _replay(runner, _sorted_copy(filename, tmp_path))
+            assert report == expected
+            assert runner.ingested == len(events) and runner.late == 0
+            assert published[-1]["ingested"] == len(events)
+            assert published[-1]["simulated_time"] == \
+                max(e.timestamp for e in events)
+
+
+def test_generated_workloads(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    for seed in range(30):
+        generate_events(filename, 5, 40, grid_size=10, seed=seed)
+        expected = Simulation(monitor=IncrementalMonitor()).run(
+            create_event_list(filename))
+        for max_pending in (1, 2):
+            runner = RealtimeRunner(speedup=None, max_pending=max_pending)
+            assert _replay(runner, filename) == expected
+
+
+def test_late_events():
+    async def replay(speedup, lines, pause):
+        reader = asyncio.StreamReader()
+        monitor = IncrementalMonitor()
+        runner = RealtimeRunner(monitor=monitor, speedup=speedup)
+        running = asyncio.ensure_future(runner.run(reader))
+        reader.feed_data(lines[0].encode())
+        await asyncio.sleep(pause)
+        for line in lines[1:]:
+            reader.feed_data(line.encode())
+        reader.feed_eof()
+        await running
+        return runner, monitor._activities["rider"]["R"][0].time
+
+    # The rider's line arrives long after simulated time 3 has passed.
+    runner, requested = asyncio.run(replay(
+        1000, ["0 DriverRequest D 0,0 1\n",
+               "3 RiderRequest R 1,1 2,2 100\n"], 0.05))
+    assert runner.late == 1 and requested >= 20
+
+    # A line before the line read before it is done at that line's time.
+    runner, requested = asyncio.run(replay(
+        None, ["5 DriverRequest D 0,0 1\n",
+               "3 RiderRequest R 1,1 2,2 100\n"], 0))
+    assert runner.late == 1 and requested == 5
+
+
+def test_accelerated_clock():
+    published = []
+    runner = RealtimeRunner(speedup=2000, metrics_interval=0.001,
+                            publish=published.append)
+    report = _replay(runner, "events.txt")
+    assert set(report) == {"rider_wait_time", "driver_total_distance",
+                           "driver_ride_distance"}
+    assert runner.ingested == len(create_event_list("events.txt"))
+    assert published and {"simulated_time", "ingested", "pending", "late",
+                          "ingest_rate"} <= set(published[-1])
+
+    with pytest.raises(ValueError):
+        RealtimeRunner(speedup=0)
+
+
+def test_backpressure():
+    async def replay():
+        reader = asyncio.StreamReader()
+        runner = RealtimeRunner(speedup=1, max_pending=4)
+        for i in range(200):
+            reader.feed_data(f"{1000 + i} DriverRequest D{i} 0,0 1\n"
+                             .encode())
+        running = asyncio.ensure_future(runner.run(reader))
+        await asyncio.sleep(0.1)
+        metrics = runner.metrics()
+        running.cancel()
+        return runner, metrics
+
+    # The clock starts at the first line; the second is not due for a
+    # second, so the simulation holds it, and only max_pending lines are
+    # read after it.
+    runner, metrics = asyncio.run(replay())
+    assert runner.ingested == 2 and metrics["pending"] == 4
+
+
+def test_malformed_lines_and_failed_stream():
+    async def replay(lines, error=None):
+        reader = asyncio.StreamReader()
+        runner = RealtimeRunner(speedup=None)
+        reader.feed_data("".join(lines).encode())
+        if error is None:
+            reader.feed_eof()
+        else:
+            reader.set_exception(error)
+        return runner, await asyncio.wait_for(runner.run(reader), 5)
+
+    runner, report = asyncio.run(replay(
+        ["0 DriverRequest D 0,0 1\n", "garbage line\n",
+         "1 RiderRequest R 1,1\n", "2 RiderRequest R 1,1 2,2 100\n"]))
+    assert runner.malformed == 2 and runner.ingested == 2
+    assert report["rider_wait_time"] == 2
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(replay(["0 DriverRequest D 0,0 1\n"],
+                           ConnectionResetError()))
@@ -0,0 +1,158 @@
+import random
+import pytest
+import sharding
+from benchmark import generate_events
+from dispatcher import Dispatcher
+from event import create_event_list, parse_record
+from location import Location
+from monitor import IncrementalMonitor
+from sharding import ZonePartition, partition_records, run_sharded, \
+    sharded_monitor
+from simulation import Simulation
+from spatial import GridIndex
+
+
+def test_zone_partition():
+    partition = ZonePartition(0, 9, 3)
+    assert [partition.zone_of(Location(row, 0)) for row in range(-1, 11)] == \
+        [0, 0, 0, 0, 0, 1, 1, 1, 2, 2, 2, 2]
+
+    records = [parse_record("0 DriverRequest A 2,4 1"),
+               parse_record("1 RiderRequest B 5,5 8,1 3")]
+    partition = partition_records(records, 2)
+    assert (partition.low, partition.high, partition.zones) == (2, 8, 2)
+
+
+def test_single_zone():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        expected = Simulation(Dispatcher(GridIndex()),
+                              IncrementalMonitor()).run(
+            create_event_list(filename))
+        for window in (1, 7):
+            assert run_sharded(filename, 1, window, parallel=False) == \
+                expected
+
+
+def _write_districts(filename, seed=0):
+    # Two districts far apart, each with enough drivers for its riders.
+    rand = random.Random(seed)
+    lines = []
+    for district in (0, 100):
+        def location():
+            return f"{district + rand.randrange(10)},{rand.randrange(10)}"
+        for i in range(15):
+            lines.append(f"0 DriverRequest d{district}_{i} {location()} "
+                         f"{rand.randint(1, 4)}")
+        for i in range(60):
+            lines.append(f"{3 * i + 1} RiderRequest r{district}_{i} "
+                         f"{location()} {location()} {rand.randint(5, 30)}")
+    with open(filename, "w") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def test_independent_zones(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    _write_districts(filename)
+    expected = Simulation(Dispatcher(GridIndex()), IncrementalMonitor()).run(
+        create_event_list(filename))
+    for zones in (2, 4):
+        for window in (1, 5, 50):
+            assert run_sharded(filename, zones, window, parallel=False) == \
+                expected
+    assert run_sharded(filename, 2, 5) == expected
+
+
+def test_handoffs_wait_for_the_window(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    with open(filename, "w") as file:
+        file.write("0 DriverRequest D 0,0 1\n"
+                   "0 RiderRequest A 0,0 9,0 50\n"
+                   "10 RiderRequest B 9,0 9,1 50\n")
+    expected = Simulation().run(create_event_list(filename))
+    assert expected["rider_wait_time"] == 0.0
+    # D is dropped off in the other zone at 9, and only handed off to it at
+    # the end of the window, so B waits from 10 until then.
+    assert run_sharded(filename, 2, 1, parallel=False) == expected
+    assert run_sharded(filename, 2, 20, parallel=False)["rider_wait_time"] \
+        == (0 + 10) / 2
+    assert run_sharded(filename, 2, 40, parallel=False)["rider_wait_time"] \
+        == (0 + 30) / 2
+
+
+def test_processes_are_joined(tmp_path, monkeypatch):
+    filename = str(tmp_path / "events.txt")
+    generate_events(filename, 5, 20, grid_size=10, seed=4)
+    started = []
+    process_class = sharding.multiprocessing.Process
+
+    def process(*args, **kwargs):
+        started.append(process_class(*args, **kwargs))
+        return started[-1]
+
+    def fail(*args):
+        raise RuntimeError("the zones could not be synchronized")
+
+    monkeypatch.setattr(sharding.multiprocessing, "Process", process)
+    monkeypatch.setattr(sharding, "_synchronize", fail)
+    with pytest.raises(RuntimeError):
+        run_sharded(filename, 3, 5)
+    assert len(started) == 3
+    assert all(not process.is_alive() for process in started)
+
+
+def test_zones(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    generate_events(filename, 20, 200, grid_size=20, seed=3)
+    report = run_sharded(filename, 4, 5, parallel=False)
+    assert run_sharded(filename, 4, 5) == report
+    assert set(report) == {"rider_wait_time", "driver_total_distance",
+                           "driver_ride_distance"}
+    assert report["driver_ride_distance"] > 0
+    assert report["driver_ride_distance"] <= report["driver_total_distance"]
+
+
+def test_zones_merge_histograms(tmp_path):
+    filename = str(tmp_path / "events.txt")
+    generate_events(filename, 20, 200, grid_size=20, seed=3)
+    single = IncrementalMonitor(percentiles=True)
+    Simulation(Dispatcher(GridIndex()), single).run(
+        create_event_list(filename))
+    monitor = sharded_monitor(filename, 1, 5, parallel=False,
+                              percentiles=True)
+    assert monitor.histograms() == single.histograms()
+
+    monitor = sharded_monitor(filename, 4, 5, parallel=False,
+                              percentiles=True)
+    assert sharded_monitor(filename, 4, 5, percentiles=True).histograms() \
+        == monitor.histograms()
+    report = monitor.report()
+    assert report == run_sharded(filename, 4, 5, percentiles=True)
+    assert report["rider_wait_time_p50"] <= report["rider_wait_time_p99"]
+    histograms = monitor.histograms()
+    # Every driver who moved between zones is counted once, and every ride
+    # and wait time counted by a zone is in the merged histograms.
+    assert sum(count for _, _, count
+               in histograms["driver_total_distance"]) == 20
+    assert sum(count for _, _, count
+               in histograms["rider_wait_time"]) == monitor._riders_done
+    assert monitor._driver_distances.total == monitor._total_distance
+    assert monitor._ride_distances.total == monitor._ride_distance
+
+
+def test_merge():
+    first = IncrementalMonitor()
+    second = IncrementalMonitor()
+    first.notify(0, "rider", "request", "R", Location(0, 0))
+    first.notify(2, "rider", "pickup", "R", Location(0, 0))
+    first.notify(0, "driver", "request", "D", Location(0, 3))
+    first.notify(1, "driver", "pickup", "D", Location(0, 0))
+    first.notify(3, "driver", "dropoff", "D", Location(4, 0))
+    first.notify(3, "driver", "request", "D", Location(4, 0))
+    second.add_driver("D", first.pop_driver("D"))
+    second.notify(4, "driver", "pickup", "D", Location(5, 0))
+    second.notify(5, "driver", "dropoff", "D", Location(9, 0))
+    second.notify(0, "driver", "request", "E", Location(1, 1))
+    first.merge(second)
+    assert first.report() == {"rider_wait_time": 2.0,
+                              "driver_total_distance": 6.0,
+                              "driver_ride_distance": 4.0}
@@ -1,10 +1,13 @@
+import pytest
 from typing import List, Dict
 from container import PriorityQueue
 from dispatcher import Dispatcher
-from event import Event, create_event_list
-from monitor import Monitor
-from simulation import Simulation
+from event import Event, create_event_list, event_from_line, iter_events
+from monitor import IncrementalMonitor, Monitor
+from simulation import MIN_COMPACTION, Simulation
 from location import Location
+from benchmark import generate_events
+from spatial import GridIndex
 from event import RiderRequest, DriverRequest
 
 
@@ -365,3 +368,214 @@ def test_1driver_2rider():
     assert a_activity[6].time == 21
 
 
+def test_run_stream_matches_run():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        simulation = Simulation()
+        expected = simulation.run(create_event_list(filename))
+        # Not every fixture is sorted by timestamp, as run_stream requires.
+        streamed = Simulation()
+        if filename in ("event4.txt", "event6.txt", "event7.txt",
+                        "event8.txt"):
+            initial_events = sorted(create_event_list(filename))
+        else:
+            initial_events = iter_events(filename)
+        assert streamed.run_stream(initial_events) == expected
+
+        for category in ("rider", "driver"):
+            activities = simulation._monitor._activities[category]
+            streamed_activities = streamed._monitor._activities[category]
+            assert activities.keys() == streamed_activities.keys()
+            for key in activities:
+                assert [(a.time, a.description) for a in activities[key]] == \
+                    [(a.time, a.description)
+                     for a in streamed_activities[key]]
+
+
+def test_profile_summary():
+    assert Simulation().profile_summary() is None
+
+    simulation = Simulation(profile=True)
+    expected = Simulation().run(create_event_list("events.txt"))
+    initial_events = create_event_list("events.txt")
+    riders = len([e for e in initial_events if isinstance(e, RiderRequest)])
+    assert simulation.run(initial_events) == expected
+
+    summary = simulation.profile_summary()
+    events = summary["events"]
+    assert events["DriverRequest"]["count"] >= len(initial_events) - riders
+    assert events["RiderRequest"]["count"] == riders
+    # Riders who were picked up have their Cancellation skipped.
+    assert events["Cancellation"]["count"] + summary["elided_events"] == \
+        riders
+    assert summary["elided_events"] > 0
+    assert all(entry["seconds"] >= 0 for entry in events.values())
+    assert summary["max_queue_size"] >= 1
+
+    dispatcher = summary["dispatcher"]
+    assert dispatcher["request_driver"]["calls"] == riders
+    assert dispatcher["request_rider"]["calls"] == \
+        events["DriverRequest"]["count"]
+    assert "cancel_ride" in dispatcher
+
+
+def test_cancellations_are_elided():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        simulation = Simulation()
+        events = create_event_list(filename)
+        simulation.run(events)
+
+        satisfied = [e for e in events if isinstance(e, RiderRequest)
+                     and e.rider.status == "satisfied"]
+        assert simulation.elided_events == len(satisfied)
+        assert simulation._cancellations == {}
+        assert simulation._dead == 0
+
+
+@pytest.mark.parametrize("queue", ["list", "heap", "bucket"])
+def test_dead_cancellations_are_compacted(queue):
+    def events():
+        drivers = [event_from_line(f"0 DriverRequest d{i} 0,0 1")
+                   for i in range(200)]
+        riders = [event_from_line(f"{i} RiderRequest r{i} 0,1 0,2 1000")
+                  for i in range(1, 201)]
+        return drivers + riders
+
+    simulation = Simulation(queue=queue)
+    assert simulation.run_until(events(), 150) == 150
+    # The Cancellations of the riders picked up so far are all due after
+    # time 1000, so the ones that were dropped were dropped by compaction.
+    live = len(simulation._events) - simulation._dead
+    assert simulation._elided >= MIN_COMPACTION
+    assert simulation._dead <= live
+    assert simulation.run_until([]) is None
+    assert simulation._elided == 200 and simulation._dead == 0
+    assert simulation._monitor.report() == Simulation().run(events())
+
+
+def test_queue_engines():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        expected = Simulation(queue="list").run(create_event_list(filename))
+        for queue in ("heap", "bucket"):
+            simulation = Simulation(queue=queue)
+            assert simulation.run(create_event_list(filename)) == expected
+
+    with pytest.raises(ValueError):
+        Simulation(queue="calendar")
+
+
+def test_batch_simulation():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        for method in ("greedy", "optimal"):
+            events = create_event_list(filename)
+            dispatcher = Dispatcher(batch_window=1, batch_method=method)
+            report = Simulation(dispatcher).run(events)
+            assert set(report) == {"rider_wait_time",
+                                   "driver_total_distance",
+                                   "driver_ride_distance"}
+            for event in events:
+                if isinstance(event, RiderRequest):
+                    assert event.rider.status in ("satisfied", "cancelled")
+
+
+@pytest.fixture
+def snapshots(monkeypatch):
+    """Keep a copy of every state a Simulation saves."""
+    saved = []
+    save_checkpoint = Simulation.save_checkpoint
+
+    def recording_save_checkpoint(self, filename):
+        save_checkpoint(self, filename)
+        with open(filename, "rb") as file:
+            saved.append(file.read())
+
+    monkeypatch.setattr(Simulation, "save_checkpoint",
+                        recording_save_checkpoint)
+    return saved
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("make", [
+    lambda: (None, None),
+    lambda: (Dispatcher(GridIndex()), IncrementalMonitor()),
+    lambda: (Dispatcher(batch_window=3), IncrementalMonitor(retain=False))])
+def test_checkpoint_resume(tmp_path, snapshots, stream, make):
+    filename = str(tmp_path / "events.txt")
+    checkpoint = str(tmp_path / "simulation.checkpoint")
+    generate_events(filename, 10, 100, grid_size=10, seed=2)
+    expected = Simulation(*make()).run(create_event_list(filename))
+
+    simulation = Simulation(*make(), checkpoint=checkpoint,
+                            checkpoint_events=25)
+    if stream:
+        assert simulation.run_stream(iter_events(filename)) == expected
+    else:
+        assert simulation.run(create_event_list(filename)) == expected
+    assert len(snapshots) > 3
+
+    for snapshot in snapshots[:-1]:
+        with open(checkpoint, "wb") as file:
+            file.write(snapshot)
+        resumed = Simulation.resume(checkpoint)
+        if stream:
+            assert resumed.run_stream(iter_events(filename)) == expected
+        else:
+            assert resumed.run([]) == expected
+
+
+def test_checkpoint_seconds(tmp_path):
+    checkpoint = str(tmp_path / "simulation.checkpoint")
+    simulation = Simulation(checkpoint=checkpoint, checkpoint_seconds=0)
+    expected = Simulation().run(create_event_list("events.txt"))
+    assert simulation.run(create_event_list("events.txt")) == expected
+    assert Simulation.resume(checkpoint).run([]) == expected
+
+    with pytest.raises(ValueError):
+        Simulation(checkpoint=checkpoint)
+
+
+def test_road_network_simulation(tmp_path):
+    from columnar import ColumnarMonitor
+    from driver import TRAVEL_TIMES
+    from location import RoadNetworkOracle, set_distance_oracle
+    from benchmark import generate_road_network
+    from vectorized import ArrayIndex
+
+    events = str(tmp_path / "events.txt")
+    roads = str(tmp_path / "roads.txt")
+    generate_events(events, 10, 150, grid_size=12, seed=6)
+    generate_road_network(roads, 12, detour=2.0, seed=6)
+    manhattan = Simulation().run(create_event_list(events))
+
+    # Roads of length 1 give the Manhattan distance.
+    generate_road_network(str(tmp_path / "grid.txt"), 12, detour=0)
+    set_distance_oracle(RoadNetworkOracle.from_edge_list(
+        str(tmp_path / "grid.txt")))
+    try:
+        assert Simulation().run(create_event_list(events)) == manhattan
+
+        TRAVEL_TIMES.resize(1000)
+        assert len(TRAVEL_TIMES) == 0
+        oracle = RoadNetworkOracle.from_edge_list(roads)
+        Simulation().run(create_event_list(events))
+        assert len(TRAVEL_TIMES) > 0
+        set_distance_oracle(oracle)
+        # Changing the oracle forgets the cached travel times.
+        assert len(TRAVEL_TIMES) == 0
+
+        expected = Simulation().run(create_event_list(events))
+        assert expected != manhattan
+        assert expected["driver_total_distance"] >= \
+            manhattan["driver_total_distance"]
+        for dispatcher in (Dispatcher(GridIndex(4)), Dispatcher(ArrayIndex())):
+            assert Simulation(dispatcher).run(
+                create_event_list(events)) == expected
+        assert Simulation(monitor=ColumnarMonitor()).run(
+            create_event_list(events)) == expected
+        assert Simulation(monitor=IncrementalMonitor()).run(
+            create_event_list(events)) == expected
+
+        oracle.precompute()
+        assert Simulation().run(create_event_list(events)) == expected
+    finally:
+        set_distance_oracle(None)
+        TRAVEL_TIMES.resize(0)
@@ -595,7 +595,7 @@ def test_multiple_riders_multiple_drivers_p2():
 
     assert lst == ["Zabi", "James", "Ted", "John", "Ali"]
 
-    assert simulation._dispatcher._rider_lst == []
+    assert len(simulation._dispatcher._rider_lst) == 0
 
     l1 = Location(20, 1)
     l2 = Location(4, 3)
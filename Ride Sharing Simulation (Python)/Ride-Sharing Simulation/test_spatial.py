@@ -0,0 +1,71 @@
+import random
+
+from dispatcher import Dispatcher
+from driver import Driver
+from event import create_event_list
+from location import Location
+from rider import Rider
+from simulation import Simulation
+from spatial import GridIndex
+
+
+def test_grid_index_nearest():
+    index = GridIndex(4)
+    driver1 = Driver("a", Location(1, 1), 1)
+    driver2 = Driver("b", Location(20, 20), 10)
+    driver3 = Driver("c", Location(3, 2), 1)
+    for driver in (driver1, driver2, driver3):
+        index.add(driver)
+    assert len(index) == 3
+
+    # "b" is far away, but fast enough to arrive first.
+    assert index.pop_nearest(Location(2, 2)) is driver3
+    assert index.pop_nearest(Location(19, 19)) is driver2
+    assert index.drivers() == [driver1]
+    assert index.pop_nearest(Location(40, 40)) is driver1
+    assert index.pop_nearest(Location(0, 0)) is None
+
+
+def test_grid_index_ties_are_fifo():
+    index = GridIndex(2)
+    driver1 = Driver("a", Location(10, 6), 2)
+    driver2 = Driver("b", Location(6, 10), 2)
+    driver3 = Driver("c", Location(8, 8), 4)
+    for driver in (driver1, driver2, driver3):
+        index.add(driver)
+
+    assert index.pop_nearest(Location(8, 8)) is driver3
+    assert index.pop_nearest(Location(8, 8)) is driver1
+    assert index.pop_nearest(Location(8, 8)) is driver2
+
+
+def test_grid_index_matches_dispatcher():
+    rand = random.Random(3)
+    for cell_size in (1, 3, 10):
+        dispatcher = Dispatcher()
+        indexed = Dispatcher(GridIndex(cell_size))
+        for i in range(300):
+            if rand.random() < 0.5:
+                location = Location(rand.randint(0, 40), rand.randint(0, 40))
+                speed = rand.randint(1, 5)
+                driver = Driver(str(i), location, speed)
+                assert dispatcher.request_rider(driver) is None
+                indexed.request_rider(Driver(str(i), location, speed))
+            else:
+                origin = Location(rand.randint(0, 40), rand.randint(0, 40))
+                rider = Rider(str(i), 5, origin, origin)
+                expected = dispatcher.request_driver(rider)
+                actual = indexed.request_driver(rider)
+                if expected is None:
+                    assert actual is None
+                    dispatcher.cancel_ride(rider)
+                    indexed.cancel_ride(rider)
+                else:
+                    assert actual.id == expected.id
+
+
+def test_simulation_with_grid_index():
+    for filename in ["events.txt"] + [f"event{i}.txt" for i in range(9)]:
+        expected = Simulation().run(create_event_list(filename))
+        simulation = Simulation(Dispatcher(GridIndex(2)))
+        assert simulation.run(create_event_list(filename)) == expected
@@ -0,0 +1,142 @@
+"""A vectorized index of idle drivers
+
+The ArrayIndex keeps the rows, columns and speeds of the idle drivers in
+NumPy arrays, and computes the travel time of every idle driver to a rider's
+origin in one vectorized expression. It can be given to a Dispatcher in
+place of a spatial.GridIndex, and requires NumPy, unlike the rest of the
+simulation.
+"""
+
+from typing import List, Optional
+import numpy as np
+from driver import Driver
+from location import Location, distance, get_distance_oracle
+
+
+class ArrayIndex:
+    """An index of idle drivers held in parallel arrays.
+
+    The fastest driver for a location is chosen as Driver.get_travel_time
+    would choose it: the distance divided by the speed, rounded half to even,
+    with ties resolved in favour of the driver added earliest. Manhattan
+    distances are computed for all drivers at once, but the distances of a
+    distance oracle are measured one driver at a time.
+    A driver is removed by moving the last driver into its place, so the
+    arrays never have gaps.
+    """
+
+    # === Private Attributes ===
+    _rows: np.ndarray
+    #     The row of each driver's location.
+    _columns: np.ndarray
+    #     The column of each driver's location.
+    _speeds: np.ndarray
+    #     The speed of each driver.
+    _sequences: np.ndarray
+    #     The order in which each driver was added to the index.
+    _drivers: List[Driver]
+    #     The drivers, at the same positions as their entries in the arrays.
+    _counter: int
+    #     The sequence number given to the next driver added to the index.
+    #
+    # === Representation Invariants ===
+    # The first len(_drivers) entries of each array describe the drivers in
+    # _drivers, and the arrays all have the same length.
+
+    def __init__(self, capacity: int = 64) -> None:
+        """Initialize an empty ArrayIndex with room for <capacity> drivers
+        before its arrays have to grow.
+
+        Precondition: capacity > 0
+        """
+        self._rows = np.empty(capacity, dtype=np.int64)
+        self._columns = np.empty(capacity, dtype=np.int64)
+        self._speeds = np.empty(capacity, dtype=np.int64)
+        self._sequences = np.empty(capacity, dtype=np.int64)
+        self._drivers = []
+        self._counter = 0
+
+    def __len__(self) -> int:
+        """Return the number of drivers in this index.
+
+        """
+        return len(self._drivers)
+
+    def drivers(self) -> List[Driver]:
+        """Return the drivers in this index, in the order they were added.
+
+        """
+        count = len(self._drivers)
+        order = np.argsort(self._sequences[:count])
+        return [self._drivers[i] for i in order]
+
+    def add(self, driver: Driver) -> None:
+        """Add <driver> at its current location to this index.
+
+        Precondition: <driver> is not already in this index, and its location
+        does not change while it is in this index.
+        """
+        position = len(self._drivers)
+        if position == len(self._rows):
+            self._grow()
+
+        self._rows[position] = driver.location.row
+        self._columns[position] = driver.location.column
+        self._speeds[position] = driver.speed
+        self._sequences[position] = self._counter
+        self._drivers.append(driver)
+        self._counter += 1
+
+    def pop_nearest(self, location: Location) -> Optional[Driver]:
+        """Remove and return the driver that can arrive at <location> the
+        fastest, or None if this index is empty.
+
+        Ties are resolved in favour of the driver added earliest.
+        """
+        count = len(self._drivers)
+        if count == 0:
+            return None
+
+        if get_distance_oracle() is None:
+            lengths = (np.abs(self._rows[:count] - location.row)
+                       + np.abs(self._columns[:count] - location.column))
+        else:
+            lengths = np.array([distance(driver.location, location)
+                                for driver in self._drivers])
+        travel_time = np.round(lengths / self._speeds[:count])
+        fastest = np.flatnonzero(travel_time == travel_time.min())
+        position = fastest[np.argmin(self._sequences[fastest])]
+        return self._remove(int(position))
+
+    def _remove(self, position: int) -> Driver:
+        """Remove and return the driver at <position>, moving the last
+        driver into its place.
+
+        """
+        driver = self._drivers[position]
+        last = len(self._drivers) - 1
+        if position != last:
+            self._rows[position] = self._rows[last]
+            self._columns[position] = self._columns[last]
+            self._speeds[position] = self._speeds[last]
+            self._sequences[position] = self._sequences[last]
+            self._drivers[position] = self._drivers[last]
+        self._drivers.pop()
+        return driver
+
+    def _grow(self) -> None:
+        """Double the capacity of the arrays.
+
+        """
+        capacity = 2 * len(self._rows)
+        for name in ("_rows", "_columns", "_speeds", "_sequences"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=np.int64)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['typing', 'numpy', 'driver', 'location']})